@@ -1,70 +1,143 @@
 # url=
-import os, json, random, time
+import os, json, random, time, copy, hmac, mimetypes
 from pathlib import Path
 from functools import wraps
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import (Flask, Response, render_template, request, jsonify, session, redirect, url_for, g, abort,
+                   has_request_context, send_from_directory)
 from flask_cors import CORS
-# NEW: Import math functions for distance calculation
-from math import radians, sin, cos, sqrt, atan2
 
 # NEW: Import database connection/cursor functions
-from connect import get_db_cursor, close_db_cursor, execute_query
+from geo import batch_distances, SpatialIndex
+from catalog import AirportCatalog
+from events import EventEngine
+from badges import BadgeEngine, snapshot as badge_snapshot, changed_fields
+from gamestate import GameState, encode_save, decode_save
+import engine
+from planner import DistanceMatrix, plan_within_budget, route_length, clear_plan_cache
+from connect import (get_db_cursor, close_db_cursor, execute_query, execute_rowcount, execute_many, get_pool,
+                     set_unit_provider, UnitOfWork, after_commit, detached)
+from passwords import hash_password, verify_password, PasswordPoolBusy, HASH_RETRY_AFTER, get_hash_pool
+from leaderboard import Leaderboard
+import journal
+from journal import EventJournal
+from writebehind import WriteBehindBuffer
+from usercache import TTLCache
+from sessions import make_session_interface
+import metrics
+from profiler import SamplingProfiler, install_signal_handler
+from assets import AssetManifest, IMMUTABLE_CACHE_CONTROL
+from responsecache import ResponseCache, fast_jsonify
 
 # --- Configuration and Setup ---
 BASE = Path(__file__).parent
 # USERS_FILE = BASE / 'users.json' # REMOVED
-# AIRPORTS_FILE = BASE / 'airport-data.json' # REMOVED
+# The shipped airport list now only seeds the catalog on a first boot without a snapshot
+AIRPORTS_FILE = BASE / 'airport-data.json'
 
 app = Flask(__name__, template_folder="templates", static_folder="static")
 CORS(app)
 # NOTE: Use a secure secret key in production; environment variable recommended
 app.secret_key = os.environ.get('CHRONOSECRET', 'dev-secret-please-change')
 
+# --- Session Configuration ---
+# 'cookie' is Flask's signed-cookie session (whole state in the cookie; works with any number
+# of workers), 'sqlite' a local file shared by all workers on the host, 'memory' this process
+# only (opt-in for single-process runs: other workers never see it and restarts drop it)
+SESSION_BACKEND = os.environ.get('CHRONO_SESSION_BACKEND', 'cookie')
+# Seconds a server-side session survives without activity
+SESSION_TTL = float(os.environ.get('CHRONO_SESSION_TTL', '86400'))
+SESSION_MAX = int(os.environ.get('CHRONO_SESSION_MAX', '10000'))
+SESSION_DB = os.environ.get('CHRONO_SESSION_DB', str(BASE / '.cache' / 'sessions.sqlite3'))
+if SESSION_BACKEND != 'cookie':
+    app.session_interface = make_session_interface(SESSION_BACKEND, SESSION_TTL, SESSION_MAX, SESSION_DB)
+
 # --- Constants for Distance Calculation ---
 # Coordinates for Helsinki-Vantaa Airport (EFHK)
 EFHK_LAT = 60.317222
 EFHK_LON = 24.963333
-R = 6371  # Earth radius in kilometers
-
-BADGE_DATA = {
-    "FIRST_WIN": {"name": "Time Traveler", "desc": "Achieved your first ChronoQuest victory."},
-    "FIRST_LOSS": {"name": "Temporal Blip", "desc": "Experienced your first journey ending in defeat."},
-    "FLUX_MASTER": {"name": "Fluxfire Collector", "desc": "Reached 20 Fluxfire in a single game."},
-    "CREDIT_KING": {"name": "Credit King", "desc": "Reached 5000 Credits in a single game."},
-    "FULL_SHARDS": {"name": "Shard Hoarder", "desc": "Collected all 5 ChronoShards."},
-}
-
-
-# --- Haversine Distance Helper ---
-
-def calculate_distance(lat2, lon2):
-    """Return the great-circle distance (km) from EFHK to the given lat/lon using the Haversine formula."""
-    lat1 = radians(EFHK_LAT)
-    lon1 = radians(EFHK_LON)
-    lat2 = radians(lat2)
-    lon2 = radians(lon2)
-
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-
-    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
 
-    # Return distance rounded down to the nearest whole kilometer
-    distance = int(R * c)
-    return distance
+# --- Save Persistence Configuration ---
+# Maximum seconds an in-progress game state may sit in memory before it is written to the
+# users table. Set to 0 to write through on every move (the old behaviour).
+SAVE_MAX_STALENESS = float(os.environ.get('CHRONO_SAVE_MAX_STALENESS', '2'))
+SAVE_BATCH_SIZE = int(os.environ.get('CHRONO_SAVE_BATCH_SIZE', '100'))
+
+# --- User Cache Configuration ---
+# Process-wide LRU of user records in front of find_user (0 disables it)
+USER_CACHE_SIZE = int(os.environ.get('CHRONO_USER_CACHE_SIZE', '10000'))
+# Seconds a cached user record may be served; also bounds staleness across worker processes
+USER_CACHE_TTL = float(os.environ.get('CHRONO_USER_CACHE_TTL', '30'))
+# username -> id never changes for an existing account, so it can be cached much longer
+USER_ID_CACHE_TTL = 3600
+
+# --- Airport Catalog Configuration ---
+# Local snapshot the catalog boots from (no DB access at import time)
+CATALOG_SNAPSHOT = os.environ.get('CHRONO_CATALOG_SNAPSHOT', str(BASE / '.cache' / 'airport-catalog.pickle'))
+# Seconds between background refreshes from the airports table (0 = refresh once per process)
+CATALOG_REFRESH_INTERVAL = float(os.environ.get('CHRONO_CATALOG_REFRESH_INTERVAL', '300'))
+# Upper bound on results returned by the nearby-airports API
+NEARBY_MAX_RESULTS = 100
+# Upper bound on the page size of the filtered airport list API
+AIRPORTS_MAX_PAGE_SIZE = 1000
+# users.username is VARCHAR(255); longer names are rejected rather than truncated
+USERNAME_MAX_LENGTH = 255
+
+# --- Travel Cost Configuration ---
+# 'random' charges 20-200 energy per hop (classic); 'distance' charges by great-circle km
+TRAVEL_COST_MODE = os.environ.get('CHRONO_TRAVEL_COST_MODE', 'random')
+ENERGY_PER_KM = float(os.environ.get('CHRONO_ENERGY_PER_KM', str(engine.DEFAULT_ENERGY_PER_KM)))
+# Upper bound on stops accepted by the route planner (bounds planner latency)
+PLAN_MAX_STOPS = 25
+# Upper bound on hops applied by one itinerary request
+ITINERARY_MAX_HOPS = 50
+
+# --- Event Configuration ---
+# Optional JSON file overriding the per-phase event weights/draw counts (see events.DEFAULT_PHASES)
+EVENT_CONFIG_FILE = os.environ.get('CHRONO_EVENT_CONFIG')
+EVENT_ENGINE = EventEngine.from_file(EVENT_CONFIG_FILE) if EVENT_CONFIG_FILE else EventEngine()
+# Randomness source for all game rules; swap in random.Random(seed) to reproduce a simulator run
+GAME_RNG = random
+
+# --- Leaderboard Configuration ---
+# Finished games a player needs before appearing on the win-rate board
+LEADERBOARD_MIN_GAMES = int(os.environ.get('CHRONO_LEADERBOARD_MIN_GAMES', '5'))
+# Seconds between resyncs of the in-memory board from the users table (picks up other workers' games)
+LEADERBOARD_REFRESH_INTERVAL = float(os.environ.get('CHRONO_LEADERBOARD_REFRESH_INTERVAL', '300'))
+LEADERBOARD_MAX_PAGE_SIZE = 100
+
+# --- Response Cache Configuration ---
+# Serialized airport-list responses kept per process, keyed by catalog version and query (0 disables
+# caching; conditional GET keeps working). Per-user badge lists use the user cache's size and TTL.
+RESPONSE_CACHE_SIZE = int(os.environ.get('CHRONO_RESPONSE_CACHE_SIZE', '256'))
+
+# --- Event Journal Configuration ---
+# Set CHRONO_JOURNAL=0 to stop recording game steps in the game_events table
+JOURNAL_ENABLED = os.environ.get('CHRONO_JOURNAL', '1') != '0'
+# Seconds journal records may wait in memory before their batched INSERT (0 = write on every step)
+JOURNAL_MAX_DELAY = float(os.environ.get('CHRONO_JOURNAL_MAX_DELAY', '1'))
+JOURNAL_BATCH_SIZE = int(os.environ.get('CHRONO_JOURNAL_BATCH_SIZE', '500'))
+
+# --- Operations Configuration ---
+# Bearer token for the /api/admin/* endpoints; they answer 404 while it is unset
+ADMIN_TOKEN = os.environ.get('CHRONO_ADMIN_TOKEN')
+
+# Badge metadata comes from badges.json; award conditions are the rules in badges.py
+BADGES_FILE = BASE / 'badges.json'
+BADGE_ENGINE = BadgeEngine.from_file(BADGES_FILE)
 
 
 # --- User Management Helpers (MODIFIED to use MariaDB) ---
 
-def find_user(username):
-    """Return the user dict for the given username (case-insensitive), or None if not found."""
-    cursor, conn = get_db_cursor()
+def _load_user(username):
+    """Load the user dict for the given username (case-insensitive) from the database, or None."""
+    # Note: We must fetch all fields required by the Python application logic.
+    # Badges come from user_badges in the same round-trip, in the order they were awarded.
+    query = ("SELECT u.id, u.username, u.password_hash, "
+             "GROUP_CONCAT(b.badge_id ORDER BY b.awarded_at, b.badge_id SEPARATOR ','), "
+             "u.playerHowManyWins, u.playerHowManyLoses, u.playerHowManyTimesPlayed, u.jetstream_uses, u.game_state_save "
+             "FROM users u LEFT JOIN user_badges b ON b.user_id = u.id WHERE u.username = %s GROUP BY u.id")
+    cursor, conn = get_db_cursor(query)
     try:
-        # Note: We must fetch all fields required by the Python application logic,
-        # which now includes the newly added columns (playerBadges, etc.).
-        query = "SELECT id, username, password_hash, playerBadges, playerHowManyWins, playerHowManyLoses, playerHowManyTimesPlayed, jetstream_uses, game_state_save FROM users WHERE username = %s"
         cursor.execute(query, (username,))
         user_data = cursor.fetchone()
         if user_data:
@@ -73,12 +146,12 @@ def find_user(username):
                 'id': user_data[0],
                 'playerName': user_data[1],
                 'playerPasswordHash': user_data[2],
-                'playerBadges': json.loads(user_data[3]) if user_data[3] else [],
+                'playerBadges': user_data[3].split(',') if user_data[3] else [],
                 'playerHowManyWins': user_data[4] if user_data[4] is not None else 0,
                 'playerHowManyLoses': user_data[5] if user_data[5] is not None else 0,
                 'playerHowManyTimesPlayed': user_data[6] if user_data[6] is not None else 0,
                 'jetstream_uses': user_data[7] if user_data[7] is not None else 0,
-                'game_state_save': json.loads(user_data[8]) if user_data[8] else None,
+                'game_state_save': decode_save(user_data[8]),
             }
             return user
         return None
@@ -86,30 +159,113 @@ def find_user(username):
         close_db_cursor(cursor, conn)
 
 
+# --- User Record Cache ---
+# Level 1: per-request memo on flask.g. Level 2: process-wide TTL LRU. Every write path calls
+# invalidate_user(), which patches (or drops) the request memo and drops the level-2 entry,
+# again once the write commits.
+
+_user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+_user_id_cache = TTLCache(USER_CACHE_SIZE, USER_ID_CACHE_TTL)
+
+
+def _user_key(username):
+    # Usernames compare case-insensitively in the DB, so cache them that way too
+    return username.casefold() if isinstance(username, str) else username
+
+
+def _request_users():
+    """Return this request's user memo (None outside a request)."""
+    if not has_request_context():
+        return None
+    if 'users' not in g:
+        g.users = {}
+    return g.users
+
+
+def find_user(username, fresh=False):
+    """Return the user dict for the given username (case-insensitive), or None if not found.
+
+    Served from the request memo, then the process-wide cache, then the database. Pass
+    `fresh=True` before a read-modify-write to skip the process-wide cache. Callers get
+    their own copy and may mutate it freely.
+    """
+    key = _user_key(username)
+    memo = _request_users()
+    if memo is not None and key in memo:
+        return copy.deepcopy(memo[key])
+
+    user = None if fresh else _user_cache.get(key)
+    if user is None:
+        user = _load_user(username)
+        if user is None:
+            return None
+        _user_cache.set(key, user)
+        _user_id_cache.set(key, user['id'])
+    if memo is not None:
+        memo[key] = user
+    return copy.deepcopy(user)
+
+
+def invalidate_user(username, **changes):
+    """Forget the cached record for a user after a write.
+
+    The process-wide entry is dropped now and again once the unit of work commits, since a
+    concurrent request may reload the row (still without this write) in between. The request
+    memo is patched with `changes` (the columns just written) so later helpers in the same
+    request skip the round-trip, or dropped when no changes are given.
+    """
+    key = _user_key(username)
+    _user_cache.invalidate(key)
+    after_commit(lambda: _user_cache.invalidate(key))
+    memo = _request_users()
+    if memo is not None and key in memo:
+        if changes:
+            memo[key] = dict(memo[key], **changes)
+        else:
+            del memo[key]
+
+
 def get_user_id(username):
     """Return the id of the user in the users table or None if not found."""
-    cursor, conn = get_db_cursor()
+    key = _user_key(username)
+    user_id = _user_id_cache.get(key)
+    if user_id is not None:
+        return user_id
+
+    query = "SELECT id FROM users WHERE username = %s"
+    cursor, conn = get_db_cursor(query)
     try:
-        query = "SELECT id FROM users WHERE username = %s"
         cursor.execute(query, (username,))
         result = cursor.fetchone()
+        if result:
+            _user_id_cache.set(key, result[0])
         return result[0] if result else None
     finally:
         close_db_cursor(cursor, conn)
 
 
+# --- Response Caches ---
+# Pre-serialized bodies of read-mostly routes (see responsecache.py). Airport lists are keyed by
+# catalog version and dropped on every catalog swap; badge lists are dropped when badges are stored.
+
+AIRPORT_RESPONSES = ResponseCache('airports', RESPONSE_CACHE_SIZE)
+BADGE_RESPONSES = ResponseCache('badges', USER_CACHE_SIZE, USER_CACHE_TTL)
+
+
 # --- Airport Loading (MODIFIED to use MariaDB) ---
 
 def load_all_airports():
     """Load airports from MariaDB and compute distance from EFHK for each entry.
 
+    Distances for the whole catalog are computed in one batch, and only rows whose stored
+    distance is out of date are written back, in a single executemany round-trip.
+
     Returns a list of airport dicts.
     """
-    airports_list = []
     cursor, conn = get_db_cursor()
     try:
         # Load all airports from the 'airports' table
-        query = "SELECT ident, name, code, city, country, lat, lon FROM airports"
+        query = "SELECT ident, name, code, city, country, lat, lon, distance FROM airports"
         cursor.execute(query)
         db_airports = cursor.fetchall()
     except Exception as e:
@@ -118,97 +274,222 @@ def load_all_airports():
     finally:
         close_db_cursor(cursor, conn)
 
-    # Convert DB tuples to dicts and calculate distance
-    for a in db_airports:
-        airport = {
-            'ICAO': a[0],
-            'name': a[1],
-            'code': a[2],
-            'city': a[3],
-            'country': a[4],
-            'lat': a[5],
-            'lon': a[6],
-        }
-
-        if airport['ICAO'] != 'EFHK':
-            try:
-                # Use Haversine formula helper to compute km distance
-                airport['distance'] = calculate_distance(airport['lat'], airport['lon'])
-            except KeyError:
-                # If lat/lon missing, set a sentinel high value and warn
-                print(f"Warning: Missing lat/lon data for {airport['ICAO']}. Setting distance to a default high value.")
-                airport['distance'] = 9999
-        else:
-            airport['distance'] = 0
+    # Convert DB tuples to dicts
+    airports_list = [{
+        'ICAO': a[0],
+        'name': a[1],
+        'code': a[2],
+        'city': a[3],
+        'country': a[4],
+        'lat': a[5],
+        'lon': a[6],
+    } for a in db_airports]
+    stored_distances = [a[7] for a in db_airports]
+
+    # Use the batch Haversine helper for every airport with coordinates
+    located = [i for i, a in enumerate(airports_list) if a['lat'] is not None and a['lon'] is not None]
+    distances = batch_distances([airports_list[i]['lat'] for i in located],
+                                [airports_list[i]['lon'] for i in located], EFHK_LAT, EFHK_LON)
+    for a in airports_list:
+        # If lat/lon missing, keep a sentinel high value
+        a['distance'] = 9999
+    for i, d in zip(located, distances):
+        airports_list[i]['distance'] = d
+
+    located = set(located)
+    changed = []
+    for i, (a, stored) in enumerate(zip(airports_list, stored_distances)):
+        if a['ICAO'] == 'EFHK':
+            a['distance'] = 0
+            continue
+        if i not in located:
+            print(f"Warning: Missing lat/lon data for {a['ICAO']}. Setting distance to a default high value.")
+        if stored != a['distance']:
+            changed.append((a['distance'], a['ICAO']))
+
+    # Persist only the distances that changed, as one batch (not one UPDATE per airport)
+    if changed:
+        execute_many("UPDATE airports SET distance = %s WHERE ident = %s", changed)
 
-        # Update the 'distance' field in the DB for persistence (if it's not EFHK)
-        # Note: This executes a query for *every* airport, which is inefficient.
-        # Ideally this distance should be pre-calculated or done in a single batch update.
-        if airport['ICAO'] != 'EFHK':
-            update_query = "UPDATE airports SET distance = %s WHERE ident = %s"
-            execute_query(update_query, (airport['distance'], airport['ICAO']))
+    return airports_list
 
-        airports_list.append(airport)
 
+def load_seed_airports():
+    """Load the shipped airport-data.json and compute distances from EFHK (no DB access)."""
+    try:
+        with open(AIRPORTS_FILE, encoding='utf-8') as f:
+            airports_list = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error: Could not load seed airports from {AIRPORTS_FILE}: {e}")
+        return []
+    distances = batch_distances([a['lat'] for a in airports_list], [a['lon'] for a in airports_list],
+                                EFHK_LAT, EFHK_LON)
+    for a, d in zip(airports_list, distances):
+        a['distance'] = 0 if a['ICAO'] == 'EFHK' else d
     return airports_list
 
 
-# Assign the combined list to AIRPORTS
-AIRPORTS = load_all_airports()
+# Boot from the local snapshot (or the seed file); the airports table refreshes it in the background
+CATALOG = AirportCatalog(CATALOG_SNAPSHOT, load_all_airports, seed_loader=load_seed_airports).boot()
+AIRPORTS = CATALOG.airports
+AIRPORT_INDEX = SpatialIndex([], [])
+DISTANCES = DistanceMatrix([])
+
+
+def _on_catalog_change(catalog):
+    """Point AIRPORTS (and the spatial index and distance matrix over it) at the new catalog version."""
+    global AIRPORTS, AIRPORT_INDEX, DISTANCES
+    located = list(catalog.airports.located())
+    AIRPORT_INDEX = SpatialIndex([icao for icao, _, _ in located], [(lat, lon) for _, lat, lon in located])
+    DISTANCES = DistanceMatrix([{'ICAO': icao, 'lat': lat, 'lon': lon} for icao, lat, lon in located],
+                               catalog.version)
+    clear_plan_cache()
+    AIRPORTS = catalog.airports
+    AIRPORT_RESPONSES.clear()
+
+
+CATALOG.subscribe(_on_catalog_change)
 
 
 def get_airport_by_icao(icao):
     """Return an airport dict from AIRPORTS matching the ICAO code, or None."""
-    return next((a for a in AIRPORTS if a['ICAO'] == icao), None)
+    return AIRPORTS.get(icao)
 
 
 # --- Game State Helpers ---
 
 def new_game_state(username):
-    """Create and return a fresh game state for a given username.
+    """Create and return a fresh game state for a given username (see engine.new_game_state)."""
+    return engine.new_game_state(username, GAME_RNG)
 
-    Randomly selects a fuel type and required flux to vary each new game.
-    """
-    # Determine random fuel requirements
-    fuel_types = {"Aetherite": [8, 12], "Lumorin": [14, 18], "Voltash": [5, 8], "Noxalite": [11, 15], "Inferno": [1, 5]}
-    chosen_fuel = random.choice(list(fuel_types.keys()))
-    required_flux = random.randint(fuel_types[chosen_fuel][0], fuel_types[chosen_fuel][1])
-
-    return {
-        'playerName': username,
-        'credits': 1000,
-        'energy': 1000,
-        'shards': {},
-        'countShards': 0,
-        'currentLocation': 'EFHK',  # Helsinki-Vantaa Airport
-        'fluxfire': 0,
-        'paradox': {'active': False, 'coins': 0, 'startTime': 0},
-        'fuel_to_make': chosen_fuel,
-        'required_flux': required_flux
-    }
+
+def _regenerate_session():
+    """Issue a fresh session id on login so a planted session cookie can't be reused."""
+    regenerate = getattr(session, 'regenerate', None)
+    if regenerate:
+        regenerate()
 
 
 def get_game_state():
-    """Retrieve the game state stored in the session (or None)."""
-    return session.get('game_state')
+    """Retrieve the game state stored in the session (or None).
+
+    Sessions hold GameState.to_bytes(); dicts left by the old JSON format are migrated on read.
+    """
+    return GameState.load(session.get('game_state'))
 
 
 def save_game_state(gs):
-    """Store the provided game state into the session."""
-    session['game_state'] = gs
+    """Store the provided game state into the session (compact binary encoding)."""
+    session['game_state'] = gs.to_bytes()
+
+
+def _write_game_states(items):
+    """Write a batch of (user key, (username, encoded save)) entries in one executemany round-trip.
+
+    `username` is a unique key, so the UPDATE addresses rows directly without a get_user_id lookup.
+    The batch commits on its own connection: it must never join (or wait on) a request's unit of
+    work, since that request may hold the very rows being written.
+    """
+    query = "UPDATE users SET game_state_save = %s WHERE username = %s"
+    with detached():
+        ok = execute_many(query, [(save, username) for _, (username, save) in items])
+    for key, _ in items:
+        # The request memo was already patched by persist_game_state; only drop the shared entry
+        _user_cache.invalidate(key)
+    return ok
+
+
+# Dirty game states are coalesced per user and written in batches by a background thread.
+# Entries are keyed by _user_key, so "Alice" and "alice" share one pending save.
+_save_buffer = WriteBehindBuffer(_write_game_states, max_staleness=SAVE_MAX_STALENESS,
+                                 batch_size=SAVE_BATCH_SIZE, name='game-state-saver')
 
 
 def persist_game_state(username, gs):
     """Persist the provided game state into the user's profile in the database.
 
     This saves an in-progress game so it can be resumed later (unless intentionally cleared).
+    The write is buffered (see SAVE_MAX_STALENESS); only the latest state per user is written.
+    It is queued once the request's unit of work commits, so a rolled-back request saves nothing
+    and saves always reach the buffer (and the users row) in commit order.
     """
-    user_id = get_user_id(username)
-    if user_id:
-        # Save game state as a JSON string or NULL
-        gs_json = json.dumps(gs) if gs else None
-        query = "UPDATE users SET game_state_save = %s WHERE id = %s"
-        execute_query(query, (gs_json, user_id))
+    # Encode now (see gamestate.encode_save) so later mutations don't leak into the write; None clears the save
+    save = encode_save(gs)
+    after_commit(lambda: _save_buffer.put(_user_key(username), (username, save)))
+    invalidate_user(username, game_state_save=gs.copy() if gs else None)
+
+
+def flush_game_state(username=None):
+    """Write the buffered game state for one user (or all users) once the request commits.
+
+    Never writes inside the request's transaction: the buffer's writer would wait on rows that
+    transaction holds. Outside a request the write happens immediately.
+    """
+    keys = None if username is None else [_user_key(username)]
+    after_commit(lambda: _save_buffer.flush(keys))
+
+
+def load_saved_game(username):
+    """Return the user's saved game (or None), preferring a save still waiting in the buffer."""
+    buffered, entry = _save_buffer.pending(_user_key(username))
+    if buffered:
+        return decode_save(entry[1])
+    user = find_user(username)
+    return user.get('game_state_save') if user else None
+
+
+# --- Event Journal ---
+
+def _write_journal_rows(rows):
+    """Insert a batch of journal rows in one executemany round-trip (INSERT IGNORE: retries are harmless).
+
+    Like _write_game_states, the batch commits on its own connection even when flushed from a
+    request (replay_game, or CHRONO_JOURNAL_MAX_DELAY=0): a rollback must not lose rows the
+    journal already popped, and the write must not wait on that request's row locks.
+    """
+    query = ("INSERT IGNORE INTO game_events (game_id, seq, user_id, recorded_at, action, payload) "
+             "VALUES (%s, %s, %s, %s, %s, %s)")
+    with detached():
+        return execute_many(query, rows)
+
+
+JOURNAL = EventJournal(_write_journal_rows, max_delay=JOURNAL_MAX_DELAY, batch_size=JOURNAL_BATCH_SIZE)
+
+
+def journal_step(username, before, gs, action, args=None, events=(), outcome=None):
+    """Queue the journal record of one step that turned `before` (a copy) into `gs`.
+
+    A game's first journaled step also records the state it started from, so games that
+    began before the journal existed can be replayed from that point on.
+    """
+    if not JOURNAL_ENABLED:
+        return
+    records = []
+    if gs.game_id is None:
+        records.append(journal.begin(before))
+        gs.game_id, gs.seq = before.game_id, before.seq
+    records.append(journal.step(before, gs, action, args, events, outcome))
+    JOURNAL.append(get_user_id(username), records)
+
+
+def load_game_journal(game_id):
+    """Return the (seq, action, payload) records of one game in step order."""
+    query = "SELECT seq, action, payload FROM game_events WHERE game_id = %s ORDER BY seq, recorded_at"
+    cursor, conn = get_db_cursor(query)
+    try:
+        cursor.execute(query, (game_id,))
+        return [(seq, action, json.loads(payload)) for seq, action, payload in cursor.fetchall()]
+    finally:
+        close_db_cursor(cursor, conn)
+
+
+def replay_game(game_id, upto=None):
+    """Rebuild a game's state after step `upto` (or its latest step) from the journal, or None."""
+    JOURNAL.flush()
+    gs = journal.replay(load_game_journal(game_id), upto)
+    if gs is not None:
+        gs.game_id = game_id
+    return gs
 
 
 # --- Decorator and Persistent Stats Logic ---
@@ -228,58 +509,299 @@ def login_required(f):
     return decorated_function
 
 
-def award_badge(username, badge_id):
-    """Add a badge to a user's profile in the database if they don't already have it.
+def admin_required(f):
+    """Flask decorator for operator endpoints: requires `Authorization: Bearer <CHRONO_ADMIN_TOKEN>`."""
+
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            abort(404)
+        supplied = request.headers.get('Authorization', '').encode('utf-8')
+        if not hmac.compare_digest(supplied, f'Bearer {ADMIN_TOKEN}'.encode('utf-8')):
+            return jsonify({'error': 'forbidden'}), 403
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+def _fresh_user_loader(username):
+    """Return a load_user() for badge evaluation that reads the user from the DB at most once."""
+    loaded = []
+
+    def load_user():
+        if not loaded:
+            loaded.append(find_user(username, fresh=True))
+        return loaded[0]
+
+    return load_user
+
+
+def evaluate_badges(gs, load_user, outcome=None, events=(), before=None):
+    """Return the ids of badges newly earned by one step of play, without storing them.
 
-    Returns the badge metadata when newly awarded, otherwise None.
+    `outcome` is 'win', 'lose' or 'quit' when the game just ended; `before` is the
+    badge_snapshot() taken before the step, used to skip milestone rules whose fields did
+    not change. `load_user()` is called only if some rule fires.
     """
-    user = find_user(username)
-    if user:
-        user_id = user['id']
-        current_badges = user.get('playerBadges', [])
+    changed = changed_fields(before, gs) if before is not None else ()
+    rules = BADGE_ENGINE.candidates(outcome, changed)
+    if not rules:
+        return []
+    earned, _ = BADGE_ENGINE.evaluate(rules, gs, events, load_user)
+    return earned
+
+
+def store_badges(username, earned, user):
+    """Insert `earned` badge ids into user_badges; returns the metadata of those actually added.
 
-        if badge_id not in current_badges:
-            current_badges.append(badge_id)
-            badges_json = json.dumps(current_badges)
-            query = "UPDATE users SET playerBadges = %s WHERE id = %s"
-            execute_query(query, (badges_json, user_id))
-            return BADGE_DATA.get(badge_id, {"name": badge_id, "desc": "New Badge!"})
-    return None
+    INSERT IGNORE on the (user_id, badge_id) key makes awarding idempotent, so concurrent
+    requests for the same player can never drop or duplicate a badge. Badges the player
+    already holds, or that a concurrent request stored first (affected row count 0), are
+    neither counted nor reported.
+    """
+    owned = user.get('playerBadges', []) if user else []
+    earned = [badge_id for badge_id in dict.fromkeys(earned) if badge_id not in owned]
+    if not earned:
+        return []
+    query = "INSERT IGNORE INTO user_badges (user_id, badge_id) VALUES (%s, %s)"
+    added = [badge_id for badge_id in earned if execute_rowcount(query, (user['id'], badge_id))]
+    if added:
+        invalidate_user(username, playerBadges=owned + added)
+        after_commit(lambda: BADGE_RESPONSES.invalidate(_user_key(username)))
+        after_commit(lambda: [BADGES_AWARDED.inc(badge_id) for badge_id in added])
+    if len(added) < len(earned):
+        # Stored elsewhere (or failed): drop the cached user so the next read sees the table
+        invalidate_user(username)
+    return [BADGE_ENGINE.info(badge_id) for badge_id in added]
+
+
+def award_earned_badges(username, gs, outcome=None, events=(), before=None):
+    """Evaluate every badge rule that could fire for this request and store new badges at once.
+
+    The user is loaded only if some rule fires, and the newly earned badges are inserted into
+    user_badges by store_badges. Returns the metadata of the badges actually awarded.
+    """
+    load_user = _fresh_user_loader(username)
+    earned = evaluate_badges(gs, load_user, outcome, events, before)
+    return store_badges(username, earned, load_user() if earned else None)
 
 
 def update_user_stats(username, win=False, clear_game=True):
-    """Increment play/win/loss counters for a user and award first-win/loss badges.
+    """Increment play/win/loss counters for a user (badges are handled by award_earned_badges).
 
     If clear_game is True, the saved in-progress game is removed from the user's profile.
     """
-    user = find_user(username)
+    # Counters are incremented in place, so there is no read first and concurrent finishes
+    # for the same player cannot overwrite each other
+    counters = ("playerHowManyWins = playerHowManyWins + %s, playerHowManyLoses = playerHowManyLoses + %s, "
+                "playerHowManyTimesPlayed = playerHowManyTimesPlayed + 1")
+    if clear_game:
+        # Clear any persisted in-progress save when the game is finalized
+        query = f"UPDATE users SET {counters}, game_state_save = NULL WHERE username = %s"
+    else:
+        # Keep the existing save if not clearing
+        query = f"UPDATE users SET {counters} WHERE username = %s"
+
+    updated = execute_rowcount(query, (int(win), int(not win), username))
+    if updated and clear_game:
+        # Also queue the cleared save: it supersedes a buffered one and lands after any in flight,
+        # so an older save can never be written over the NULL above
+        persist_game_state(username, None)
+    # The new totals are not read back: drop the cached record so the next read reloads them
+    invalidate_user(username)
+    if updated:
+        # Re-rank the player only once the new totals are committed
+        after_commit(lambda: LEADERBOARD.record_result(username, win))
+        after_commit(lambda: GAMES_FINISHED.inc('win' if win else 'lose'))
+
+
+# --- Leaderboard ---
+
+def load_leaderboard_rows():
+    """Return (username, wins, losses, played) for every player with a finished game."""
+    query = ("SELECT username, playerHowManyWins, playerHowManyLoses, playerHowManyTimesPlayed "
+             "FROM users WHERE playerHowManyTimesPlayed > 0")
+    cursor, conn = get_db_cursor()
+    if cursor is None:
+        # Leave the board unloaded so the next request retries
+        raise RuntimeError("no database connection")
+    try:
+        cursor.execute(query)
+        return [(name, wins or 0, losses or 0, played or 0) for name, wins, losses, played in cursor.fetchall()]
+    finally:
+        close_db_cursor(cursor, conn)
 
-    if user:
-        user_id = user['id']
-        wins = user.get('playerHowManyWins', 0)
-        losses = user.get('playerHowManyLoses', 0)
-        played = user.get('playerHowManyTimesPlayed', 0)
-        game_state_save = None
 
-        played += 1
+LEADERBOARD = Leaderboard(load_leaderboard_rows, min_games=LEADERBOARD_MIN_GAMES,
+                          refresh_interval=LEADERBOARD_REFRESH_INTERVAL)
 
-        if win:
-            wins += 1
-            award_badge(username, 'FIRST_WIN')
-        else:
-            losses += 1
-            award_badge(username, 'FIRST_LOSS')
 
-        if clear_game:
-            # Clear any persisted in-progress save when the game is finalized
-            game_state_save = None
-        else:
-            # Keep the existing save if not clearing
-            game_state_save = user.get('game_state_save')
+# --- Metrics ---
+# HTTP and DB series live in metrics.py; these are the game's own counters
+
+TRAVELS = metrics.REGISTRY.counter('chrono_travels_total', 'Hops applied (single travels and itinerary hops).')
+GAMES_FINISHED = metrics.REGISTRY.counter('chrono_games_finished_total', 'Finished games by outcome.', ('outcome',))
+BADGES_AWARDED = metrics.REGISTRY.counter('chrono_badges_awarded_total', 'Badges awarded by badge id.', ('badge',))
+
+metrics.REGISTRY.gauge('chrono_db_pool_connections', 'Connections owned by the DB pool by state.',
+                       lambda: {('open',): get_pool().stats()['size'], ('idle',): get_pool().stats()['idle']},
+                       ('state',))
+metrics.REGISTRY.gauge('chrono_password_hashes_in_flight', 'Password hashes running or queued on the hash pool.',
+                       lambda: get_hash_pool().in_flight)
+metrics.REGISTRY.gauge('chrono_password_hashes_rejected', 'Hash requests turned away with 503 since start.',
+                       lambda: get_hash_pool().rejected)
+metrics.REGISTRY.gauge('chrono_pending_game_saves', 'Game states buffered in memory awaiting their DB write.',
+                       lambda: len(_save_buffer))
+metrics.REGISTRY.gauge('chrono_response_cache_requests', 'Cached-route requests by cache and result since start.',
+                       lambda: {(c.name, result): n for c in (AIRPORT_RESPONSES, BADGE_RESPONSES)
+                                for result, n in (('hit', c.hits), ('miss', c.misses),
+                                                  ('not_modified', c.not_modified))},
+                       ('cache', 'result'))
+metrics.REGISTRY.gauge('chrono_journal_pending_records', 'Journal records buffered awaiting their batched insert.',
+                       lambda: len(JOURNAL))
+metrics.REGISTRY.gauge('chrono_journal_dropped_records', 'Journal records dropped because the buffer was full.',
+                       lambda: JOURNAL.dropped)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """Count and time the request (registered before the unit-of-work hook so it sees the final status)."""
+    started = g.pop('request_started', None)
+    if started is not None and metrics.METRICS_ENABLED:
+        route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        metrics.HTTP_REQUESTS.inc(route, request.method, str(response.status_code))
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - started, route, request.method)
+    return response
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint for this worker process."""
+    if not metrics.METRICS_ENABLED:
+        abort(404)
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
+# --- Profiling ---
+# Off until started through /api/admin/profiler or SIGUSR2 (see profiler.py)
+
+PROFILER = SamplingProfiler()
+install_signal_handler(PROFILER)
 
-        # Update DB
-        query = "UPDATE users SET playerHowManyWins = %s, playerHowManyLoses = %s, playerHowManyTimesPlayed = %s, game_state_save = %s WHERE id = %s"
-        execute_query(query, (wins, losses, played, json.dumps(game_state_save) if game_state_save else None, user_id))
+
+@app.before_request
+def start_profiling():
+    """Hand the request's thread to the sampler if the running session selects it."""
+    if not PROFILER.active:
+        return
+    route = request.url_rule.rule if request.url_rule else request.path
+    user = session.get('username') if PROFILER.user else None
+    if PROFILER.wants(route, request.path, user):
+        PROFILER.track(f"{request.method} {route}")
+        g.profiled = True
+
+
+@app.teardown_request
+def stop_profiling(exc):
+    if g.pop('profiled', False):
+        PROFILER.untrack()
+
+
+# --- Background Catalog Refresh ---
+
+@app.before_request
+def ensure_catalog_refresh():
+    """Start this worker's background catalog refresher on its first request."""
+    CATALOG.start_background_refresh(CATALOG_REFRESH_INTERVAL)
+
+
+# --- Request-scoped Unit of Work ---
+
+def get_unit_of_work():
+    """Return the request's UnitOfWork (created on first use), or None outside a request.
+
+    Every DB helper called while handling a request shares this one pooled connection, and
+    all of the request's writes are committed together when the request finishes.
+    """
+    if not has_request_context():
+        return None
+    if 'uow' not in g:
+        g.uow = UnitOfWork(get_pool())
+    return g.uow
+
+
+set_unit_provider(get_unit_of_work)
+
+
+@app.after_request
+def commit_unit_of_work(response):
+    """Commit the request's writes once; a failed commit turns the response into a 500."""
+    uow = g.pop('uow', None)
+    if uow is not None and not uow.finish(commit=response.status_code < 500):
+        if response.status_code < 500:
+            return jsonify({'ok': False, 'error': 'Could not save changes'}), 500
+    return response
+
+
+@app.teardown_request
+def rollback_unit_of_work(exc):
+    """Roll back whatever is left open when a request ended with an unhandled exception."""
+    uow = g.pop('uow', None)
+    if uow is not None:
+        uow.finish(commit=False)
+
+
+@app.errorhandler(PasswordPoolBusy)
+def password_pool_busy(exc):
+    """Too many logins/registrations are already waiting for the hash pool: shed load fast."""
+    response = jsonify({'ok': False, 'error': 'Server busy, please retry shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(HASH_RETRY_AFTER)
+    return response
+
+
+# --- Static Assets ---
+# Built by `python assets.py`; without a build, templates keep using Flask's /static/ route
+
+ASSETS = AssetManifest.load()
+
+
+@app.template_global()
+def asset_url(path):
+    """URL for a file under static/: its fingerprinted /assets/ URL when built, else /static/<path>."""
+    url = ASSETS.url(path) if ASSETS is not None else None
+    return url or url_for('static', filename=path)
+
+
+@app.template_global()
+def asset_urls(prefix):
+    """{path: fingerprinted URL} for the built files under `prefix`, for scripts that build image paths."""
+    return ASSETS.urls(prefix) if ASSETS is not None else {}
+
+
+@app.route('/assets/<path:filename>')
+def built_asset(filename):
+    """Serve a fingerprinted file, as WebP or precompressed when the client accepts it."""
+    choice = ASSETS.choose(filename, request.headers.get('Accept-Encoding', ''),
+                           request.headers.get('Accept', '')) if ASSETS is not None else None
+    if choice is None:
+        abort(404)
+    name, encoding = choice
+    # .br/.gz keep the type of the file they encode; a WebP variant is its own type
+    mimetype = mimetypes.guess_type(name if encoding is None else filename)[0]
+    response = send_from_directory(ASSETS.directory, name, mimetype=mimetype)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    vary = ASSETS.vary(filename)
+    if vary:
+        response.headers['Vary'] = vary
+    return response
 
 
 # --- HTML Page Routes ---
@@ -331,8 +853,11 @@ def quit_page():
         # Optionally persist and clear the current session game state
         gs = get_game_state()
         if gs:
+            award_earned_badges(username, gs, outcome='quit')
             persist_game_state(username, gs)  # save current state if desired
+            flush_game_state(username)
             session.pop('game_state', None)
+            GAMES_FINISHED.inc('quit')
 
         return render_template('quit.html', message="You quit the game. 👋")
     else:
@@ -362,13 +887,19 @@ def api_user_login():
     name = data.get('name')
     password = data.get('password')
     user = find_user(name)
-
-    if user and check_password_hash(user['playerPasswordHash'], password):
+    matches, new_hash = verify_password(user['playerPasswordHash'], password) if user else (False, None)
+
+    if matches:
+        if new_hash:
+            # Hash parameters changed since this password was stored: upgrade it transparently
+            if execute_query("UPDATE users SET password_hash = %s WHERE id = %s", (new_hash, user['id'])):
+                invalidate_user(name, playerPasswordHash=new_hash)
+        _regenerate_session()
         session['username'] = name
 
         # Always start a brand-new game on login (option C)
         new_gs = new_game_state(name)
-        session['game_state'] = new_gs
+        save_game_state(new_gs)
 
         # Clear persisted save for this user to enforce "start new on login/page load"
         persist_game_state(name, None)
@@ -381,56 +912,56 @@ def api_user_login():
 def api_user_register():
     """API: Create a new user account and start a fresh session.
 
-    New users get default counters and no saved in-progress game.
+    New users get default counters and no saved in-progress game. The unique key on
+    users.username decides whether the name is taken (INSERT IGNORE affects no row).
+    IGNORE also downgrades NULLs and truncation to warnings, so the input is checked first.
     """
-    data = request.get_json()
+    data = request.get_json() or {}
     name = data.get('name')
     password = data.get('password')
-
-    if find_user(name):
-        return jsonify({'ok': False, 'error': 'User already exists'})
+    if not isinstance(name, str) or not name or len(name) > USERNAME_MAX_LENGTH:
+        return jsonify({'ok': False, 'error': f'Name must be 1 to {USERNAME_MAX_LENGTH} characters.'}), 400
+    if not isinstance(password, str) or not password:
+        return jsonify({'ok': False, 'error': 'Password is required.'}), 400
 
     # Initialize game state but do NOT persist it (we will always start new on login/page load)
     initial_gs = new_game_state(name)
 
     # Insert new user into the database
-    password_hash = generate_password_hash(password)
+    password_hash = hash_password(password)
 
     # We must insert values for all fields expected by the Python application logic,
     # including those derived from default values in the original file/schema.
     # THIS QUERY ASSUMES THE NECESSARY COLUMNS HAVE BEEN ADDED VIA SQL ABOVE.
     query = """
-            INSERT INTO users (username, \
+            INSERT IGNORE INTO users (username, \
                                password_hash, \
                                credits, \
                                energy, \
                                current_location, \
                                shards, \
-                               playerBadges, \
                                playerHowManyWins, \
                                playerHowManyLoses, \
                                playerHowManyTimesPlayed, \
                                jetstream_uses, \
                                game_state_save)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) \
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) \
             """
 
     # Use initial game state values and default stats/badges
-    initial_badges_json = json.dumps([])
     initial_shards_json = json.dumps({})
     initial_stats = 0
     initial_jetstream = 0
     initial_save = None  # NULL in DB
 
     # Execute insert with all necessary values
-    success = execute_query(query, (
+    inserted = execute_rowcount(query, (
         name,
         password_hash,
-        initial_gs['credits'],
-        initial_gs['energy'],
-        initial_gs['currentLocation'],
+        initial_gs.credits,
+        initial_gs.energy,
+        initial_gs.current_location,
         initial_shards_json,  # Shards dict is stored as JSON string in the DB
-        initial_badges_json,
         initial_stats,
         initial_stats,
         initial_stats,
@@ -438,10 +969,14 @@ def api_user_register():
         initial_save
     ))
 
-    if success:
+    if inserted == 0:
+        return jsonify({'ok': False, 'error': 'User already exists'})
+    if inserted:
+        invalidate_user(name)
+        _regenerate_session()
         session['username'] = name
         # session gets a fresh game for this login
-        session['game_state'] = initial_gs
+        save_game_state(initial_gs)
         return jsonify({'ok': True})
     else:
         # Registration failed at the database level (likely due to missing columns or bad credentials)
@@ -457,30 +992,29 @@ def api_get_state():
     """
     gs = get_game_state()
     if gs:
-        return jsonify({'state': gs})
+        return fast_jsonify({'state': gs.to_dict()})
 
     # If somehow session state is missing, create a fresh one (option C behavior)
     username = session.get('username')
     if username:
-        # Check if a game state was saved in the DB
-        user = find_user(username)
-        saved_gs = user.get('game_state_save') if user else None
+        # Check if a game state was saved (a buffered save is newer than the DB copy)
+        saved_gs = load_saved_game(username)
 
         if saved_gs:
             # Resume saved game
             save_game_state(saved_gs)
             # Clear persisted save after loading it to the session to prevent auto-resume on refresh
             persist_game_state(username, None)
-            return jsonify({'state': saved_gs})
+            return fast_jsonify({'state': saved_gs.to_dict()})
         else:
             # Create a fresh one if no save exists (consistent with option C)
             fresh = new_game_state(username)
             save_game_state(fresh)
             # Clear persisted save to be consistent with option C (even though it was already None)
             persist_game_state(username, None)
-            return jsonify({'state': fresh})
+            return fast_jsonify({'state': fresh.to_dict()})
 
-    return jsonify({'error': 'Game state not found'}), 404
+    return fast_jsonify({'error': 'Game state not found'}), 404
 
 
 @app.route('/api/user/logout', methods=['POST'])
@@ -494,50 +1028,78 @@ def api_user_logout():
 # --- API Routes - Game Flow ---
 
 
-def weighted_sample_without_replacement(population, weights, k):
-    """Select up to k unique items from population according to given weights (without replacement)."""
-    items = population[:]
-    w = weights[:]
-    picked = []
-    k = min(k, len(items))
-    for _ in range(k):
-        total = sum(w)
-        if total <= 0:
-            break
-        r = random.uniform(0, total)
-        cumulative = 0
-        for i, wt in enumerate(w):
-            cumulative += wt
-            if r <= cumulative:
-                picked.append(items.pop(i))
-                w.pop(i)
-                break
-    return picked
-
-
-def check_loss_conditions(gs):
-    """Return True when the game's special loss conditions are met.
-
-    Loss occurs when:
-      - credits <= 20 and energy == 0
-      OR
-      - credits == 0 and 10 <= energy <= 20
-    """
-    credits = gs.get('credits', 0)
-    energy = gs.get('energy', 0)
-    if credits <= 20 and energy == 0:
-        return True
-    if credits == 0 and 10 <= energy <= 20:
-        return True
-    return False
+def energy_cost_for_km(km):
+    """Energy charged for flying `km` kilometres in distance-aware mode."""
+    return engine.energy_cost_for_km(km, ENERGY_PER_KM)
+
+
+def travel_cost(origin_icao, dest_icao, rng=random):
+    """Return the energy cost of one hop under the configured TRAVEL_COST_MODE."""
+    if TRAVEL_COST_MODE == 'distance' and origin_icao in DISTANCES and dest_icao in DISTANCES:
+        return energy_cost_for_km(DISTANCES.km(origin_icao, dest_icao))
+    return engine.random_travel_cost(origin_icao, dest_icao, rng)
 
 
 @app.route('/api/main/airports', methods=['GET'])
 @login_required
 def api_get_airports():
-    """Return the preloaded list of airports including computed distance from EFHK."""
-    # The AIRPORTS list is now loaded with calculated distances
-    return jsonify(AIRPORTS)
+    """Return airports (including computed distance from EFHK), optionally filtered and paginated.
+
+    Optional query parameters: country, city, bbox=minLat,minLon,maxLat,maxLon, offset, limit
+    (capped at AIRPORTS_MAX_PAGE_SIZE). Without a limit the whole matching list is returned.
+    The response body is always a JSON list; the match count is in the X-Total-Count header.
+    Bodies are cached per catalog version and query, and carry an ETag for conditional GETs.
+    """
+    args = request.args
+    bbox = None
+    if 'bbox' in args:
+        try:
+            bbox = tuple(float(v) for v in args['bbox'].split(','))
+        except ValueError:
+            bbox = ()
+        if len(bbox) != 4:
+            return jsonify({'error': 'bbox must be minLat,minLon,maxLat,maxLon'}), 400
+    offset = max(0, args.get('offset', 0, type=int))
+    limit = args.get('limit', type=int)
+    if limit is not None:
+        limit = max(0, min(limit, AIRPORTS_MAX_PAGE_SIZE))
+
+    country, city = args.get('country'), args.get('city')
+
+    def build():
+        total, airports = AIRPORTS.query(country=country, city=city, bbox=bbox, offset=offset, limit=limit)
+        return airports, {'X-Total-Count': str(total)}
+
+    return AIRPORT_RESPONSES.respond((CATALOG.version, country, city, bbox, offset, limit), build)
+
+
+@app.route('/api/main/airports/nearby', methods=['GET'])
+@login_required
+def api_get_nearby_airports():
+    """Return the k nearest airports to an ICAO code, or all airports within radius_km of it.
+
+    Query parameters: icao (required), k (default 5) or radius_km. Each result carries
+    `distanceFromOrigin` (km from the requested airport); results are nearest first.
+    """
+    origin = get_airport_by_icao(request.args.get('icao', '').upper())
+    if origin is None or origin.get('lat') is None or origin.get('lon') is None:
+        return jsonify({'error': 'Unknown airport'}), 404
+
+    radius_km = request.args.get('radius_km', type=float)
+    k = min(request.args.get('k', 5, type=int), NEARBY_MAX_RESULTS)
+
+    def is_origin(icao):
+        return icao == origin['ICAO']
+
+    if radius_km is not None:
+        results = AIRPORT_INDEX.within(origin['lat'], origin['lon'], radius_km, exclude=is_origin)[:NEARBY_MAX_RESULTS]
+    else:
+        results = AIRPORT_INDEX.nearest(origin['lat'], origin['lon'], k, exclude=is_origin)
+
+    return jsonify({
+        'origin': origin['ICAO'],
+        'airports': [dict(AIRPORTS.get(icao), distanceFromOrigin=int(km)) for icao, km in results],
+    })
 
 
 @app.route('/api/main/travel', methods=['POST'])
@@ -551,156 +1113,161 @@ def api_travel():
     username = session['username']
     data = request.get_json()
     icao = data.get('ICAO')
-    events = []
-    lose = False
-    win = False
+    badges_before = badge_snapshot(gs)
+    before = gs.copy()
+
+    # The rules themselves (cost, events, win/lose checks) live in engine.travel
+    events, outcome = engine.travel(gs, icao, rng=GAME_RNG, cost_fn=travel_cost, event_engine=EVENT_ENGINE)
 
     # Prevent travel if the player has no energy (cannot move)
-    if gs['energy'] <= 0:
-        return jsonify({
-            'events': [{'type': 'no_energy', 'message': 'Cannot travel with 0 Energy. Must refuel.'}],
-            'state': gs,
+    if outcome == engine.NO_ENERGY:
+        return fast_jsonify({
+            'events': events,
+            'state': gs.to_dict(),
             'win': False,
             'lose': False,
             'ok': False,
             'error': 'Insufficient Energy'
         }), 400
+    # Home refused the player (win requirements not met): nothing moved, so nothing to record
+    if outcome == engine.HOME_LOCKED:
+        return fast_jsonify({'events': events, 'state': gs.to_dict(), 'win': False, 'lose': False})
+    TRAVELS.inc()
+    journal_step(username, before, gs, 'travel', {'to': icao}, events, outcome)
+
+    # EFHK (home) win: all shards and enough fluxfire
+    if outcome == engine.WIN:
+        award_earned_badges(username, gs, outcome='win', before=badges_before)
+        update_user_stats(username, win=True, clear_game=True)
+        return fast_jsonify({'events': events, 'state': gs.to_dict(), 'win': True, 'lose': False})
+
+    # If lost, finalize and persist
+    if outcome == engine.LOSE:
+        award_earned_badges(username, gs, outcome='lose', events=events, before=badges_before)
+        update_user_stats(username, win=False, clear_game=True)
+        save_game_state(gs)
+        persist_game_state(username, gs)
+        flush_game_state(username)
+        return fast_jsonify(
+            {'events': events + [{'type': 'lose', 'message': 'You have lost the game.'}], 'state': gs.to_dict(), 'win': False,
+             'lose': True})
 
-    # Check for EFHK (home) win condition: all shards and enough fluxfire
-    if icao == 'EFHK':
-        if gs['countShards'] == 5 and gs['fluxfire'] >= gs['required_flux']:
-            win = True
-            update_user_stats(username, win=True, clear_game=True)
-            return jsonify(
-                {'events': [{'type': 'win', 'fuel': gs['fuel_to_make'], 'required_flux': gs['required_flux']}],
-                 'state': gs, 'win': True, 'lose': False})
-        else:
-            events.append({'type': 'efhk_requirements_not_met', 'required_flux': gs['required_flux']})
-            save_game_state(gs)
-            persist_game_state(username, gs)
-            return jsonify({'events': events, 'state': gs, 'win': False, 'lose': False})
-
-    # --- Standard Travel Logic (applies whether or not trapped in a paradox) ---
-
-    cost = random.randint(20, 200)
-
-    # Deduct energy cost; if not enough, deplete energy to 0 and notify
-    if gs['energy'] < cost:
-        gs['energy'] = 0
-        events.append({'type': 'insufficient_range', 'message': 'Not enough range for full travel; range set to 0.'})
-    else:
-        gs['energy'] -= cost
-
-    # Update the player's current location
-    gs['currentLocation'] = icao
-
-    # --- Handle random events on arrival ---
-
-    is_trapped = gs['paradox']['active']
-    num_events = random.randint(1, 3)
+    # No loss: award any milestone badges, persist state and return current events and state
+    award_earned_badges(username, gs, events=events, before=badges_before)
+    save_game_state(gs)
+    persist_game_state(username, gs)
+    return fast_jsonify({'events': events, 'state': gs.to_dict(), 'win': False, 'lose': False})
 
-    if is_trapped:
-        # When trapped in a paradox, events are limited: either nothing happens or a paradox coin is awarded.
-        base_events = events[:]
-        events = base_events
 
-        # 50% chance to grant a paradox coin, 50% chance nothing
-        if random.random() < 0.5:
-            gs['paradox']['coins'] += 1
-            events.append({'type': 'paradox_coin', 'coins': gs['paradox']['coins']})
+@app.route('/api/main/itinerary', methods=['POST'])
+@login_required
+def api_travel_itinerary():
+    """Apply several hops in one request, with the same rules as /api/main/travel.
 
-            if gs['paradox']['coins'] >= 3:
-                # Escape trap after collecting 3 coins
-                gs['paradox']['active'] = False
-                gs['paradox']['coins'] = 0
-                events.append({'type': 'paradox_escaped'})
-        else:
-            events.append({'type': 'nothing'})
+    Body: {"hops": [ICAO, ...]}. Hops are applied in order and stop early on a win, a loss or
+    running out of energy. Badges are evaluated after every hop, but the game state, badges and
+    stats are written once at the end. Returns the events of each applied hop.
+    """
+    gs = get_game_state()
+    username = session['username']
+    data = request.get_json() or {}
+    hops = data.get('hops')
+
+    if not isinstance(hops, list) or not hops or len(hops) > ITINERARY_MAX_HOPS:
+        return fast_jsonify({'ok': False, 'error': f'Provide between 1 and {ITINERARY_MAX_HOPS} hops.'}), 400
+    hops = [str(h).upper() for h in hops]
+    unknown = [h for h in hops if h not in AIRPORTS]
+    if unknown:
+        return fast_jsonify({'ok': False, 'error': f"Unknown airports: {', '.join(unknown)}"}), 400
+
+    load_user = _fresh_user_loader(username)
+    earned = []
+    applied = []
+    refused = 0
+    outcome = None
+    for icao in hops:
+        badges_before = badge_snapshot(gs)
+        before = gs.copy()
+        events, outcome = engine.travel(gs, icao, rng=GAME_RNG, cost_fn=travel_cost, event_engine=EVENT_ENGINE)
+        if outcome == engine.NO_ENERGY:
+            break
+        if outcome == engine.HOME_LOCKED:
+            # Refused at home: report it, but the hop changed nothing to count or journal
+            refused += 1
+            applied.append({'ICAO': icao, 'events': events})
+            continue
+        journal_step(username, before, gs, 'travel', {'to': icao}, events, outcome)
+
+        badge_outcome = {engine.WIN: 'win', engine.LOSE: 'lose'}.get(outcome)
+        for badge_id in evaluate_badges(gs, load_user, badge_outcome, events, badges_before):
+            if badge_id not in earned:
+                earned.append(badge_id)
+        if outcome == engine.LOSE:
+            events = events + [{'type': 'lose', 'message': 'You have lost the game.'}]
+        applied.append({'ICAO': icao, 'events': events})
+        if outcome in (engine.WIN, engine.LOSE):
+            break
 
-    else:
-        # Normal event pool when not trapped
-        event_population = ['bandit', 'credits', 'range', 'fluxfire', 'paradox', 'shard', 'nothing']
-        event_weights = [1, 1, 1, 1, 1, 1, 1]  # equal chance for each event
-
-        chosen = weighted_sample_without_replacement(event_population, event_weights, num_events)
-
-        for ev in chosen:
-            if ev == 'bandit':
-                # Bandit steals either credits or range (randomly chosen)
-                steal_type = random.choice(['credits', 'range'])
-                if steal_type == 'credits':
-                    loss_amount = random.randint(20, 100)
-                    gs['credits'] = max(0, gs['credits'] - loss_amount)
-                    events.append({'type': 'bandit', 'subtype': 'credits', 'amount': loss_amount})
-                else:
-                    loss_amount = random.randint(10, 100)
-                    gs['energy'] = max(0, gs['energy'] - loss_amount)
-                    events.append({'type': 'bandit', 'subtype': 'range', 'amount': loss_amount})
-
-            elif ev == 'credits':
-                # Player gains credits; award CREDIT_KING badge at threshold
-                gain = random.randint(10, 100)
-                gs['credits'] += gain
-                events.append({'type': 'credits', 'amount': gain})
-                if gs['credits'] >= 5000:
-                    award_badge(username, 'CREDIT_KING')
-
-            elif ev == 'range':
-                # Player gains energy (range)
-                gain = random.randint(10, 100)
-                gs['energy'] += gain
-                events.append({'type': 'range', 'amount': gain})
-
-            elif ev == 'fluxfire':
-                # Increment fluxfire and award FLUX_MASTER badge at 20
-                gs['fluxfire'] += 1
-                events.append({'type': 'fluxfire'})
-                if gs['fluxfire'] >= 20:
-                    award_badge(username, 'FLUX_MASTER')
-
-            elif ev == 'paradox':
-                # Activate paradox trap if not already active
-                if not gs['paradox'].get('active', False):
-                    gs['paradox']['active'] = True
-                    gs['paradox']['coins'] = 0
-                    gs['paradox']['startTime'] = int(time.time() * 1000)
-                    events.append({'type': 'paradox'})
-                else:
-                    # If already trapped, treat as nothing
-                    events.append({'type': 'nothing'})
-
-            elif ev == 'shard':
-                # Give the next uncollected shard (1..5) if available
-                shard_id = next((i for i in range(1, 6) if str(i) not in gs['shards']), None)
-                if shard_id is not None:
-                    gs['shards'][str(shard_id)] = True
-                    events.append({'type': 'shard', 'shard': shard_id})
-                    if len(gs['shards']) == 5:
-                        award_badge(username, 'FULL_SHARDS')
-                else:
-                    # No shards left to collect
-                    events.append({'type': 'nothing'})
-
-            elif ev == 'nothing':
-                events.append({'type': 'nothing'})
-
-    # Update the shard count based on collected shards
-    gs['countShards'] = sum(1 for v in gs['shards'].values() if v)
-
-    # Check for loss after processing events; if lost, finalize and persist
-    if check_loss_conditions(gs):
-        lose = True
+    TRAVELS.inc(amount=len(applied) - refused)
+    store_badges(username, earned, load_user() if earned else None)
+    if outcome == engine.WIN:
+        update_user_stats(username, win=True, clear_game=True)
+    elif outcome == engine.LOSE:
         update_user_stats(username, win=False, clear_game=True)
         save_game_state(gs)
         persist_game_state(username, gs)
-        return jsonify(
-            {'events': events + [{'type': 'lose', 'message': 'You have lost the game.'}], 'state': gs, 'win': False,
-             'lose': True})
+        flush_game_state(username)
+    elif len(applied) > refused:
+        save_game_state(gs)
+        persist_game_state(username, gs)
 
-    # No loss: persist state and return current events and state
-    save_game_state(gs)
-    persist_game_state(username, gs)
-    return jsonify({'events': events, 'state': gs, 'win': win, 'lose': lose})
+    stopped = {engine.WIN: 'win', engine.LOSE: 'lose', engine.NO_ENERGY: 'no_energy'}.get(outcome)
+    response = {
+        'hops': applied,
+        'state': gs.to_dict(),
+        'win': outcome == engine.WIN,
+        'lose': outcome == engine.LOSE,
+        'completed': len(applied),
+        'stopped': stopped,
+        'ok': stopped != 'no_energy',
+    }
+    if stopped == 'no_energy':
+        response['error'] = 'Insufficient Energy'
+        if not applied:
+            # Same status as a single travel attempted without energy
+            return fast_jsonify(response), 400
+    return fast_jsonify(response)
+
+
+@app.route('/api/main/plan', methods=['POST'])
+@login_required
+def api_plan_route():
+    """Plan a near-optimal itinerary from the current location through the given stops back to EFHK.
+
+    Body: {"stops": [ICAO, ...]}. Legs are costed with the distance-aware energy formula; if the
+    whole tour does not fit the player's current energy, stops are dropped until it does.
+    """
+    gs = get_game_state()
+    data = request.get_json() or {}
+    stops = data.get('stops')
+
+    if not isinstance(stops, list) or not stops or len(stops) > PLAN_MAX_STOPS:
+        return jsonify({'ok': False, 'error': f'Provide between 1 and {PLAN_MAX_STOPS} stops.'}), 400
+    stops = [str(s).upper() for s in stops]
+    unknown = [s for s in stops + [gs.current_location] if s not in DISTANCES]
+    if unknown:
+        return jsonify({'ok': False, 'error': f"Unknown airports: {', '.join(unknown)}"}), 400
+
+    route, energy, dropped = plan_within_budget(DISTANCES, gs.current_location, stops, gs.energy,
+                                                energy_cost_for_km)
+    return jsonify({
+        'ok': True,
+        'route': route,
+        'distance': int(route_length(DISTANCES, route)),
+        'energy': energy,
+        'dropped': dropped,
+        'feasible': energy <= gs.energy,
+    })
 
 
 @app.route('/api/buy/credits', methods=['POST'])
@@ -711,22 +1278,20 @@ def api_buy_credits():
     username = session['username']
     data = request.get_json()
     flux_spend = data.get('fluxfire', 0)
-
-    if not flux_spend or flux_spend <= 0:
-        return jsonify({'ok': False, 'error': 'Invalid amount of Fluxfire.'})
-
-    if gs['fluxfire'] < flux_spend:
-        return jsonify({'ok': False, 'error': 'Not enough Fluxfire.'})
+    badges_before = badge_snapshot(gs)
+    before = gs.copy()
 
     # Exchange rate: 1 Fluxfire = 10 Credits (as per client-side)
-    credit_gain = flux_spend * 10
+    error = engine.buy_credits(gs, flux_spend)
+    if error:
+        return fast_jsonify({'ok': False, 'error': error})
+    journal_step(username, before, gs, 'buy_credits', {'fluxfire': flux_spend})
 
-    gs['fluxfire'] -= flux_spend
-    gs['credits'] += credit_gain
+    award_earned_badges(username, gs, before=badges_before)
     save_game_state(gs)
     persist_game_state(username, gs)
 
-    return jsonify({'ok': True, 'state': gs})
+    return fast_jsonify({'ok': True, 'state': gs.to_dict()})
 
 
 # NEW ROUTE: Buy Range/Energy using Credits
@@ -743,37 +1308,103 @@ def api_buy_range():
 
     # Accept either 'credits' or 'amount' for robustness
     credits_spend = data.get('credits', data.get('amount', 0))
-
-    if not credits_spend or credits_spend <= 0:
-        return jsonify({'ok': False, 'error': 'Invalid amount of Credits.'})
-
-    if gs['credits'] < credits_spend:
-        return jsonify({'ok': False, 'error': 'Not enough Credits.'})
+    badges_before = badge_snapshot(gs)
+    before = gs.copy()
 
     # 1:1 exchange rate
-    range_gain = credits_spend
-
-    gs['credits'] -= credits_spend
-    gs['energy'] += range_gain
+    error = engine.buy_range(gs, credits_spend)
+    if error:
+        return fast_jsonify({'ok': False, 'error': error})
+    journal_step(username, before, gs, 'buy_range', {'credits': credits_spend})
 
+    award_earned_badges(username, gs, before=badges_before)
     save_game_state(gs)
     persist_game_state(username, gs)
 
-    return jsonify({'ok': True, 'state': gs})
+    return fast_jsonify({'ok': True, 'state': gs.to_dict()})
+
+
+def _leaderboard_page():
+    """Parse ?limit=&offset= for the leaderboard routes."""
+    limit = min(max(1, request.args.get('limit', 10, type=int)), LEADERBOARD_MAX_PAGE_SIZE)
+    offset = max(0, request.args.get('offset', 0, type=int))
+    return limit, offset
+
+
+@app.route('/api/leaderboard/wins', methods=['GET'])
+def api_leaderboard_wins():
+    """Top players by total wins (ties: fewer losses first). Supports ?limit=&offset=."""
+    LEADERBOARD.ensure_fresh()
+    limit, offset = _leaderboard_page()
+    total, entries = LEADERBOARD.top_by_wins(limit, offset)
+    return jsonify({'total': total, 'entries': entries})
+
+
+@app.route('/api/leaderboard/winrate', methods=['GET'])
+def api_leaderboard_winrate():
+    """Top players by win rate among those with at least LEADERBOARD_MIN_GAMES finished games."""
+    LEADERBOARD.ensure_fresh()
+    limit, offset = _leaderboard_page()
+    total, entries = LEADERBOARD.top_by_rate(limit, offset)
+    return jsonify({'total': total, 'minGames': LEADERBOARD.min_games, 'entries': entries})
+
+
+@app.route('/api/leaderboard/me', methods=['GET'])
+@login_required
+def api_leaderboard_me():
+    """The logged-in player's rank on both boards (null until they finish a game)."""
+    LEADERBOARD.ensure_fresh()
+    entry, ranks = LEADERBOARD.rank_of(session['username'])
+    return jsonify({'player': entry, 'rank': ranks, 'minGames': LEADERBOARD.min_games})
+
+
+@app.route('/api/admin/profiler', methods=['GET', 'POST'])
+@admin_required
+def api_admin_profiler():
+    """Show (GET) or start/stop (POST) the request profiler.
+
+    POST body: {"enabled": true, "rate": 0.1, "route": "/api/main/travel", "user": "alice",
+    "intervalMs": 5, "duration": 60}; every field but "enabled" is optional.
+    """
+    if request.method == 'GET':
+        return jsonify(PROFILER.status())
+    data = request.get_json(silent=True) or {}
+    if not data.get('enabled', True):
+        return jsonify(PROFILER.stop())
+    try:
+        status = PROFILER.start(rate=data.get('rate'), route=data.get('route'), user=data.get('user'),
+                                interval_ms=data.get('intervalMs'), duration=data.get('duration'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'ok': False, 'error': str(e)}), 400
+    return jsonify(status)
+
+
+@app.route('/api/admin/games/<game_id>', methods=['GET'])
+@admin_required
+def api_admin_game_replay(game_id):
+    """Rebuild a game's state from the event journal; ?step=N stops after step N."""
+    step = request.args.get('step', type=int)
+    gs = replay_game(game_id, step)
+    if gs is None:
+        return jsonify({'ok': False, 'error': 'No journal for this game'}), 404
+    return jsonify({'ok': True, 'gameId': game_id, 'step': gs.seq, 'state': gs.to_full_dict()})
 
 
 @app.route('/api/user/badges', methods=['GET'])
 @login_required
 def api_get_badges():
-    """Return the current user's badges with friendly names and descriptions."""
-    user = find_user(session['username'])
+    """Return the current user's badges with friendly names and descriptions (cached until they change)."""
+    username = session['username']
 
-    player_badges = []
-    for badge_id in user.get('playerBadges', []):
-        badge_info = BADGE_DATA.get(badge_id, {"name": badge_id, "desc": "Unknown Badge"})
-        player_badges.append(f"{badge_info['name']} ({badge_info['desc']})")
+    def build():
+        user = find_user(username)
+        player_badges = []
+        for badge_id in user.get('playerBadges', []):
+            badge_info = BADGE_ENGINE.info(badge_id)
+            player_badges.append(f"{badge_info['name']} ({badge_info['desc']})")
+        return {'playerBadges': player_badges}, None
 
-    return jsonify({'playerBadges': player_badges})
+    return BADGE_RESPONSES.respond(_user_key(username), build)
 
 
 # --- Server Run Block ---
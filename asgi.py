@@ -0,0 +1,220 @@
+"""ASGI entry point: serve the Flask app from an asyncio event loop.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Connections, slow uploads and slow downloads are handled on the event loop, so thousands of
+idle or slow clients cost a coroutine each rather than a thread. Only a fully received request
+is handed to a bounded thread pool that runs the (blocking, DB-backed) Flask routes unchanged.
+The pool is sized to the DB connection pool, since more threads would only queue on checkout;
+when too many requests are already waiting for a thread, new ones get 503 + Retry-After
+instead of piling up in memory.
+"""
+import os
+import sys
+import asyncio
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+
+from connect import POOL_MAX_SIZE
+
+# --- ASGI Bridge Configuration ---
+# Threads running Flask routes (defaults to the DB pool size)
+ASGI_WORKERS = int(os.environ.get('CHRONO_ASGI_WORKERS', str(POOL_MAX_SIZE)))
+# Requests allowed to wait for a free thread before new ones are rejected with 503
+ASGI_MAX_QUEUE = int(os.environ.get('CHRONO_ASGI_MAX_QUEUE', '1000'))
+# Largest request body accepted (bytes); larger ones get 413 without touching a thread
+ASGI_MAX_BODY = int(os.environ.get('CHRONO_ASGI_MAX_BODY', str(1024 * 1024)))
+# Response bytes buffered per hand-off from the worker thread to the event loop
+RESPONSE_CHUNK = 256 * 1024
+
+
+class _Response:
+    """Status, headers and body of a WSGI response, drained from its iterable in chunks."""
+
+    def __init__(self):
+        self.status = 500
+        self.headers = []
+        self.iterator = None
+        self.closer = None
+
+    def start_response(self, status, headers, exc_info=None):
+        if exc_info and self.iterator is not None:
+            raise exc_info[1].with_traceback(exc_info[2])
+        self.status = int(status.split(' ', 1)[0])
+        self.headers = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+    def drain(self, limit=RESPONSE_CHUNK):
+        """Pull up to `limit` bytes from the body; returns (chunks, finished)."""
+        chunks, size = [], 0
+        for chunk in self.iterator:
+            if chunk:
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= limit:
+                    return chunks, False
+        self.close()
+        return chunks, True
+
+    def close(self):
+        closer, self.closer = self.closer, None
+        if closer:
+            closer()
+
+
+class WSGIBridge:
+    """ASGI application running a WSGI app on a bounded thread pool with admission control."""
+
+    def __init__(self, wsgi_app, workers=ASGI_WORKERS, max_queue=ASGI_MAX_QUEUE, max_body=ASGI_MAX_BODY,
+                 on_shutdown=None):
+        self.wsgi_app = wsgi_app
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.max_body = max_body
+        self.on_shutdown = on_shutdown
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='asgi-worker')
+        # Requests admitted to the pool (running or waiting); only touched on the event loop
+        self.in_flight = 0
+        self.rejected = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        else:
+            raise RuntimeError(f"Unsupported ASGI scope type {scope['type']!r}")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                loop = asyncio.get_running_loop()
+                if self.on_shutdown:
+                    await loop.run_in_executor(self._executor, self.on_shutdown)
+                self._executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _http(self, scope, receive, send):
+        body = await self._read_body(receive)
+        if body is None:
+            return  # client went away mid-upload
+        if body is False:
+            await self._plain(send, 413, b'Request body too large')
+            return
+
+        if self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            await self._plain(send, 503, b'Server busy, retry shortly', [(b'retry-after', b'1')])
+            return
+
+        loop = asyncio.get_running_loop()
+        environ = self._environ(scope, body)
+        response = _Response()
+        self.in_flight += 1
+        try:
+            chunks, finished = await loop.run_in_executor(self._executor, self._run, environ, response)
+        finally:
+            self.in_flight -= 1
+
+        try:
+            await send({'type': 'http.response.start', 'status': response.status, 'headers': response.headers})
+            while True:
+                await send({'type': 'http.response.body', 'body': b''.join(chunks), 'more_body': not finished})
+                if finished:
+                    return
+                # Large bodies (static files) are pulled a chunk at a time so a slow reader never holds a thread
+                chunks, finished = await loop.run_in_executor(self._executor, response.drain)
+        finally:
+            if response.closer:
+                await loop.run_in_executor(self._executor, response.close)
+
+    def _run(self, environ, response):
+        """Worker thread: run the WSGI app and drain the first chunk of its body."""
+        iterable = self.wsgi_app(environ, response.start_response)
+        response.iterator = iter(iterable)
+        response.closer = getattr(iterable, 'close', None) or (lambda: None)
+        return response.drain()
+
+    async def _read_body(self, receive):
+        """Receive the whole request body on the loop; None on disconnect, False if over max_body."""
+        parts, size = [], 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > self.max_body:
+                return False
+            parts.append(chunk)
+            if not message.get('more_body', False):
+                return b''.join(parts)
+
+    @staticmethod
+    async def _plain(send, status, text, extra_headers=()):
+        headers = [(b'content-type', b'text/plain; charset=utf-8'),
+                   (b'content-length', str(len(text)).encode())] + list(extra_headers)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': text})
+
+    @staticmethod
+    def _environ(scope, body):
+        """Translate an ASGI HTTP scope into a WSGI environ (PEP 3333)."""
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        root_path = scope.get('root_path', '')
+        path = scope['path']
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+            'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', ()):
+            name = name.decode('latin-1')
+            value = value.decode('latin-1')
+            if name == 'content-type':
+                environ['CONTENT_TYPE'] = value
+                continue
+            if name == 'content-length':
+                continue  # set from the body actually received
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            if key in environ:
+                # Repeated headers are joined; cookies use '; ' per RFC 6265
+                environ[key] += ('; ' if key == 'HTTP_COOKIE' else ',') + value
+            else:
+                environ[key] = value
+        return environ
+
+
+def _create_app():
+    import app as flask_app_module
+    import metrics
+    # Land buffered game saves before the process exits
+    bridge = WSGIBridge(flask_app_module.app, on_shutdown=flask_app_module.flush_game_state)
+    metrics.REGISTRY.gauge('chrono_asgi_requests_in_flight', 'Requests running on or waiting for a worker thread.',
+                           lambda: bridge.in_flight)
+    metrics.REGISTRY.gauge('chrono_asgi_requests_rejected', 'Requests turned away with 503 since start.',
+                           lambda: bridge.rejected)
+    return bridge
+
+
+app = _create_app()
@@ -0,0 +1,248 @@
+"""Static asset build step and the helpers that serve its output.
+
+Usage:
+    python assets.py                 # build into .cache/assets (CHRONO_ASSET_DIR)
+    python assets.py --out dist/assets
+
+The build copies everything under static/ to content-hashed names (css/main.3f2a9c1b04de.css),
+so the files can be cached forever: a changed file gets a new URL. Along the way it
+
+- shrinks each image to twice the size it is displayed at (IMAGE_BOXES) and adds a WebP
+  variant next to it (needs Pillow; images are copied unchanged without it);
+- rewrites '../static/...' references inside CSS and JS to the hashed URLs;
+- writes .gz (and, with the brotli package, .br) copies of text assets.
+
+manifest.json maps each logical path ('css/main.css') to its built file and variants. The
+app loads it at startup: templates call asset_url('css/main.css'), and /assets/<file>
+picks the best encoding or image format the client accepts. Without a manifest
+asset_url() falls back to Flask's /static/ route, so development needs no build.
+"""
+import os
+import re
+import sys
+import json
+import gzip
+import shutil
+import hashlib
+import argparse
+from io import BytesIO
+from fnmatch import fnmatch
+from pathlib import Path
+
+try:
+    # Optional: image resizing and WebP variants. Without it images are copied as-is.
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    # Optional: Brotli copies of text assets. gzip copies are always written.
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE = Path(__file__).parent
+STATIC_DIR = BASE / 'static'
+ASSET_DIR = os.environ.get('CHRONO_ASSET_DIR', str(BASE / '.cache' / 'assets'))
+ASSET_URL_PREFIX = '/assets/'
+MANIFEST_NAME = 'manifest.json'
+
+# Hashed files never change, so clients may keep them for a year without revalidating
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+TEXT_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.html'}
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg'}
+# Precompressed copies smaller than this fraction of the original are not worth serving
+MIN_COMPRESSION_GAIN = 0.9
+
+# Largest (width, height) each image is displayed at in CSS/JS, doubled for high-DPI screens.
+# Images matching no pattern keep their size (but still get a WebP variant).
+IMAGE_BOXES = {
+    'img/chronoquest-logo.png': (600, 100),  # .logo { height: 50px } (main), width 150px (start)
+    'img/chronoshard*.png': (160, 160),  # event modal, max-width: 80px
+    'img/fluxfire.png': (160, 160),
+    'img/black-dot.png': (64, 64),  # Leaflet marker icons, iconSize [32, 32]
+    'img/country-pin.png': (64, 64),
+    'img/starting-airport.png': (64, 64),
+}
+WEBP_QUALITY = 82
+
+_STATIC_REF = re.compile(r"""(?:\.\./|/)static/([\w./-]+\.\w+)""")
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def _hashed_name(logical, data):
+    stem, ext = os.path.splitext(logical)
+    return f"{stem}.{_digest(data)}{ext}"
+
+
+def _write(out_dir, name, data):
+    path = Path(out_dir) / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+
+
+def _resize(path, logical):
+    """Return (png bytes, webp bytes or None) for an image shrunk to its display box."""
+    with Image.open(path) as img:
+        img.load()
+        box = next((size for pattern, size in IMAGE_BOXES.items() if fnmatch(logical, pattern)), None)
+        if box and (img.width > box[0] or img.height > box[1]):
+            img.thumbnail(box, Image.LANCZOS)
+        png = _encode(img, 'PNG', optimize=True)
+        webp = _encode(img, 'WEBP', quality=WEBP_QUALITY, method=6)
+    return png, webp
+
+
+def _encode(img, fmt, **options):
+    buf = BytesIO()
+    img.save(buf, fmt, **options)
+    return buf.getvalue()
+
+
+def _precompress(out_dir, name, data, entry):
+    """Write .gz/.br copies of a text asset when they are meaningfully smaller."""
+    compressed = {'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        compressed['br'] = brotli.compress(data, quality=11)
+    for encoding, blob in compressed.items():
+        if len(blob) < len(data) * MIN_COMPRESSION_GAIN:
+            suffix = '.gz' if encoding == 'gzip' else '.br'
+            _write(out_dir, name + suffix, blob)
+            entry.setdefault('encodings', []).append(encoding)
+
+
+def build(static_dir=STATIC_DIR, out_dir=ASSET_DIR):
+    """Build every file under `static_dir` into `out_dir` and write the manifest. Returns it."""
+    static_dir = Path(static_dir)
+    out_dir = Path(out_dir)
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    out_dir.mkdir(parents=True)
+
+    files = sorted(p for p in static_dir.rglob('*') if p.is_file())
+    manifest = {}
+    if Image is None:
+        print("Pillow not installed: images are copied without resizing or WebP variants", file=sys.stderr)
+    if brotli is None:
+        print("brotli not installed: text assets get gzip copies only", file=sys.stderr)
+
+    # Images first, so CSS/JS referencing them can be rewritten to the hashed names
+    for path in files:
+        logical = path.relative_to(static_dir).as_posix()
+        if path.suffix.lower() not in IMAGE_EXTENSIONS:
+            continue
+        if Image is not None:
+            data, webp = _resize(path, logical)
+        else:
+            data, webp = path.read_bytes(), None
+        name = _hashed_name(logical, data)
+        _write(out_dir, name, data)
+        entry = {'file': name, 'size': len(data), 'source_size': path.stat().st_size}
+        if webp is not None and len(webp) < len(data):
+            webp_name = os.path.splitext(name)[0] + '.webp'
+            _write(out_dir, webp_name, webp)
+            entry['webp'] = webp_name
+        manifest[logical] = entry
+
+    def rewrite(match):
+        entry = manifest.get(match.group(1))
+        return ASSET_URL_PREFIX + entry['file'] if entry else match.group(0)
+
+    for path in files:
+        logical = path.relative_to(static_dir).as_posix()
+        if logical in manifest:
+            continue
+        data = path.read_bytes()
+        text_asset = path.suffix.lower() in TEXT_EXTENSIONS
+        if text_asset:
+            data = _STATIC_REF.sub(rewrite, data.decode('utf-8')).encode('utf-8')
+        name = _hashed_name(logical, data)
+        _write(out_dir, name, data)
+        entry = {'file': name, 'size': len(data), 'source_size': path.stat().st_size}
+        if text_asset:
+            _precompress(out_dir, name, data, entry)
+        manifest[logical] = entry
+
+    with open(out_dir / MANIFEST_NAME, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+# --- Serving ---
+
+class AssetManifest:
+    """The build's manifest: logical path -> hashed URL, and hashed file -> servable variants."""
+
+    def __init__(self, directory, entries):
+        self.directory = str(directory)
+        self.entries = entries
+        self.by_file = {e['file']: e for e in entries.values()}
+
+    @classmethod
+    def load(cls, directory=ASSET_DIR):
+        """Load `directory`/manifest.json, or return None when the build has not been run."""
+        try:
+            with open(os.path.join(directory, MANIFEST_NAME), encoding='utf-8') as f:
+                return cls(directory, json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Error loading asset manifest from {directory}: {e}", file=sys.stderr)
+            return None
+
+    def url(self, logical):
+        entry = self.entries.get(logical)
+        return ASSET_URL_PREFIX + entry['file'] if entry else None
+
+    def urls(self, prefix=''):
+        """{logical path: hashed URL} for every asset under `prefix` (for scripts building URLs)."""
+        return {k: ASSET_URL_PREFIX + e['file'] for k, e in self.entries.items() if k.startswith(prefix)}
+
+    def choose(self, filename, accept_encoding='', accept=''):
+        """Pick the file to send for a hashed name. Returns (filename, content-encoding or None) or None."""
+        entry = self.by_file.get(filename)
+        if entry is None:
+            return None
+        if entry.get('webp') and 'image/webp' in accept:
+            return entry['webp'], None
+        encodings = entry.get('encodings', ())
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if encoding in encodings and accepts_encoding(accept_encoding, encoding):
+                return filename + suffix, encoding
+        return filename, None
+
+    def vary(self, filename):
+        """Vary header for a hashed name: the request headers choose() looked at for it."""
+        entry = self.by_file.get(filename) or {}
+        if entry.get('webp'):
+            return 'Accept'
+        return 'Accept-Encoding' if entry.get('encodings') else None
+
+
+def accepts_encoding(header, coding):
+    """True if an Accept-Encoding header allows `coding` (q=0 excludes it)."""
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        if name.strip().lower() == coding:
+            return not re.search(r'q\s*=\s*0(?:\.0*)?\s*$', params)
+    return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build fingerprinted, precompressed static assets.')
+    parser.add_argument('--static', default=str(STATIC_DIR), help='source directory (default: static/)')
+    parser.add_argument('--out', default=ASSET_DIR, help='output directory (default: CHRONO_ASSET_DIR)')
+    args = parser.parse_args(argv)
+
+    manifest = build(args.static, args.out)
+    source = sum(e['source_size'] for e in manifest.values())
+    built = sum(e['size'] for e in manifest.values())
+    print(f"Built {len(manifest)} assets into {args.out}: {source / 1024:.0f} KiB -> {built / 1024:.0f} KiB")
+
+
+if __name__ == '__main__':
+    main()
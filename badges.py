@@ -0,0 +1,250 @@
+"""Badge rule engine: badge metadata from badges.json, award conditions as registered rules.
+
+Each rule declares when it can fire: on a game outcome ('win', 'lose', 'quit') or, for
+in-game milestones, whenever one of the state fields it depends on changed. `candidates()`
+uses those declarations as an index so a request only evaluates rules that could fire,
+and `evaluate()` checks them all in one pass.
+"""
+import json
+
+# Badges that predate badges.json; their metadata lives here
+LEGACY_BADGES = {
+    "FIRST_WIN": {"name": "Time Traveler", "desc": "Achieved your first ChronoQuest victory."},
+    "FIRST_LOSS": {"name": "Temporal Blip", "desc": "Experienced your first journey ending in defeat."},
+    "FLUX_MASTER": {"name": "Fluxfire Collector", "desc": "Reached 20 Fluxfire in a single game."},
+    "CREDIT_KING": {"name": "Credit King", "desc": "Reached 5000 Credits in a single game."},
+    "FULL_SHARDS": {"name": "Shard Hoarder", "desc": "Collected all 5 ChronoShards."},
+}
+
+# Game-state fields milestone rules may depend on (compared before/after a request)
+WATCHED_FIELDS = ('credits', 'energy', 'fluxfire', 'count_shards')
+
+# Range bought (credits spent) that counts as "heavy range spending"
+HEAVY_RANGE_SPENDING = 500
+
+BADGE_RULES = {}
+
+
+def badge_rule(badge_id, on=None, fields=(), needs_user=False):
+    """Register `fn(gs, events, user) -> bool` as the award condition for `badge_id`.
+
+    `on` is the outcome the rule fires on ('win', 'lose', 'quit'); milestone rules leave it
+    None and list the WATCHED_FIELDS they read in `fields`. Only rules registered with
+    `needs_user=True` receive the user record; the others get None, so requests whose
+    rules all fail never have to load the user.
+    """
+    def register(fn):
+        BADGE_RULES[badge_id] = (on, tuple(fields), needs_user, fn)
+        return fn
+    return register
+
+
+def new_game_stats():
+    """Per-game counters the badge rules read (stored as gs.stats)."""
+    return {
+        'travels': 0,
+        'range_bought': 0,
+        'credits_bought': 0,
+        'bandit_hits': 0,
+        'paradox_escapes': 0,
+        'min_energy': 1000,
+        'last_action': None,
+        'previous_action': None,
+        'repeat_hop': False,
+    }
+
+
+def game_stats(gs):
+    """Return gs.stats, creating it for states saved before stats were tracked."""
+    stats = gs.stats
+    if stats is None:
+        stats = gs.stats = new_game_stats()
+    return stats
+
+
+def snapshot(gs):
+    """Capture the watched fields at the start of a request (pass to `changed_fields`)."""
+    return {f: getattr(gs, f) for f in WATCHED_FIELDS}
+
+
+def changed_fields(before, gs):
+    return {f for f in WATCHED_FIELDS if before.get(f) != getattr(gs, f)}
+
+
+class BadgeEngine:
+    """Evaluates registered badge rules for a game state in a single pass."""
+
+    def __init__(self, definitions, rules=None):
+        rules = BADGE_RULES if rules is None else rules
+        self.info_by_id = dict(LEGACY_BADGES)
+        for d in definitions:
+            self.info_by_id[d['BadgeID']] = {"name": d['BadgeName'], "desc": d['WhatBadgeDoes']}
+        # Badges without an implementable rule (e.g. TEMPORAL_STASIS: there is no paradox
+        # timeout) are simply never indexed, so they cost nothing at evaluation time.
+        self._by_outcome = {}
+        self._by_field = {}
+        for badge_id, (on, fields, needs_user, fn) in rules.items():
+            rule = (badge_id, (needs_user, fn))
+            if on is not None:
+                self._by_outcome.setdefault(on, []).append(rule)
+            for field in fields:
+                self._by_field.setdefault(field, []).append(rule)
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def info(self, badge_id):
+        return self.info_by_id.get(badge_id, {"name": badge_id, "desc": "Unknown Badge"})
+
+    def candidates(self, outcome=None, changed=()):
+        """Return the (badge_id, rule) pairs that could fire for this outcome / set of changed fields."""
+        rules = dict(self._by_outcome.get(outcome, ())) if outcome else {}
+        for field in changed:
+            rules.update(self._by_field.get(field, ()))
+        return list(rules.items())
+
+    def evaluate(self, rules, gs, events, load_user):
+        """Evaluate candidate rules in one pass.
+
+        `load_user()` is called at most once, and only if some rule fired or needs the user.
+        Returns (newly earned badge ids the user does not own yet, user record or None).
+        """
+        fired = [badge_id for badge_id, (needs_user, fn) in rules if not needs_user and fn(gs, events, None)]
+        user_rules = [(badge_id, fn) for badge_id, (needs_user, fn) in rules if needs_user]
+        if not fired and not user_rules:
+            return [], None
+        user = load_user()
+        if not user:
+            return [], None
+        fired += [badge_id for badge_id, fn in user_rules if fn(gs, events, user)]
+        owned = set(user.get('playerBadges', []))
+        return [badge_id for badge_id in fired if badge_id not in owned], user
+
+
+def _had_event(events, event_type):
+    return any(e.get('type') == event_type for e in events)
+
+
+# --- Milestone Rules (any time during a game) ---
+
+@badge_rule('CREDIT_KING', fields=('credits',))
+def _credit_king(gs, events, user):
+    return gs.credits >= 5000
+
+
+@badge_rule('FLUX_MASTER', fields=('fluxfire',))
+def _flux_master(gs, events, user):
+    return gs.fluxfire >= 20
+
+
+@badge_rule('FULL_SHARDS', fields=('count_shards',))
+def _full_shards(gs, events, user):
+    return gs.count_shards >= 5
+
+
+# --- Win Rules ---
+
+@badge_rule('FIRST_WIN', on='win')
+@badge_rule('CHRONO_NAVIGATOR', on='win')
+def _won(gs, events, user):
+    return True
+
+
+@badge_rule('NEXUS_PIONEER', on='win')
+def _nexus_pioneer(gs, events, user):
+    return game_stats(gs)['range_bought'] == 0
+
+
+@badge_rule('FLUX_SYNTHESIZER', on='win')
+def _flux_synthesizer(gs, events, user):
+    return gs.fluxfire == gs.required_flux
+
+
+@badge_rule('MILLION_MILE_MASTERY', on='win')
+def _million_mile_mastery(gs, events, user):
+    return game_stats(gs)['travels'] < 5
+
+
+@badge_rule('TEMPORAL_ARCHITECT', on='win')
+def _temporal_architect(gs, events, user):
+    return game_stats(gs)['paradox_escapes'] >= 1
+
+
+@badge_rule('CREDIT_HOARD', on='win')
+def _credit_hoard(gs, events, user):
+    return gs.credits > 2000
+
+
+@badge_rule('UNSEEN_PATH_FINDER', on='win')
+def _unseen_path_finder(gs, events, user):
+    return game_stats(gs)['bandit_hits'] == 0
+
+
+@badge_rule('VOID_JUMPER', on='win')
+def _void_jumper(gs, events, user):
+    return game_stats(gs)['min_energy'] <= 10
+
+
+@badge_rule('ELEMENTAL_ALCHEMIST', on='win')
+def _elemental_alchemist(gs, events, user):
+    return game_stats(gs)['credits_bought'] > 0
+
+
+@badge_rule('ZERO_HOUR_SUCCESS', on='win', needs_user=True)
+def _zero_hour_success(gs, events, user):
+    # Evaluated before the finished game is counted
+    return user.get('playerHowManyTimesPlayed', 0) == 0
+
+
+# --- Loss Rules ---
+
+@badge_rule('FIRST_LOSS', on='lose')
+def _lost(gs, events, user):
+    return True
+
+
+@badge_rule('CHRONO_GHOST', on='quit')
+def _chrono_ghost(gs, events, user):
+    return True
+
+
+@badge_rule('COSMIC_BANKRUPT', on='lose')
+def _cosmic_bankrupt(gs, events, user):
+    return gs.credits <= 20 and gs.energy == 0
+
+
+@badge_rule('BANDIT_PREY', on='lose')
+def _bandit_prey(gs, events, user):
+    return _had_event(events, 'bandit')
+
+
+@badge_rule('SHARD_SEEKER_FAILURE', on='lose')
+def _shard_seeker_failure(gs, events, user):
+    return gs.count_shards == 4
+
+
+@badge_rule('INEFFICIENT_ENGINE', on='lose')
+def _inefficient_engine(gs, events, user):
+    return gs.energy == 0 and game_stats(gs)['range_bought'] >= HEAVY_RANGE_SPENDING
+
+
+@badge_rule('ACCIDENTAL_TOURIST', on='lose')
+def _accidental_tourist(gs, events, user):
+    return game_stats(gs)['repeat_hop']
+
+
+@badge_rule('FLUX_DEFICIT', on='lose')
+def _flux_deficit(gs, events, user):
+    return gs.count_shards == 5 and gs.fluxfire < gs.required_flux
+
+
+@badge_rule('OVERSPENDER', on='lose')
+def _overspender(gs, events, user):
+    return game_stats(gs)['previous_action'] == 'buy_credits'
+
+
+@badge_rule('FORGOTTEN_TRAVELER', on='lose')
+def _forgotten_traveler(gs, events, user):
+    return gs.credits >= 500 and game_stats(gs)['range_bought'] == 0
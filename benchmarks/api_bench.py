@@ -0,0 +1,410 @@
+"""Reproducible load test and benchmark for the ChronoQuest HTTP API.
+
+Usage:
+    python -m benchmarks.api_bench                                   # stand-in DB, test client + WSGI
+    python -m benchmarks.api_bench --mode wsgi --clients 16 --sessions 64
+    python -m benchmarks.api_bench --db mariadb                      # local MariaDB from connect.py settings
+    python -m benchmarks.api_bench --out after.json --compare before.json
+
+Each session registers, logs in, reads state and airports, makes many travels (starting a
+new game by logging in again when one ends), buys range and reads badges. Per route it
+reports p50/p95/p99 latency, requests per second and DB statements per request, plus
+micro-timings for find_user and load_all_airports. Results are saved as JSON stamped with
+the git commit so runs can be compared across commits. With the default stand-in DB
+(benchmarks/standin_db.py, SQLite) nothing touches the network.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE))
+
+
+class QueryCountMiddleware:
+    """WSGI middleware reporting the DB statements a request ran in an X-DB-Queries header.
+
+    Counting happens on the thread serving the request, so concurrent clients don't skew it.
+    """
+
+    def __init__(self, wsgi_app, counter):
+        self._app = wsgi_app
+        self._counter = counter
+
+    def __call__(self, environ, start_response):
+        before = self._counter()
+
+        def counting_start_response(status, headers, exc_info=None):
+            return start_response(status, headers + [('X-DB-Queries', str(self._counter() - before))], exc_info)
+
+        return self._app(environ, counting_start_response)
+
+
+class Recorder:
+    """Thread-safe per-route recorder of latency, DB statements and wire sizes."""
+
+    # Per-request measurements a client may report, averaged per route
+    MEASURES = ('queries', 'cookie_bytes', 'response_bytes')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.measures = defaultdict(lambda: defaultdict(list))
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def timed(self, route, fn):
+        start = time.perf_counter()
+        status, body, measured = fn()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies[route].append(elapsed)
+            for key, value in measured.items():
+                if value is not None:
+                    self.measures[route][key].append(value)
+            self.statuses[route][status] += 1
+        return status, body
+
+    def report(self, wall_seconds):
+        routes = {}
+        for route, samples in sorted(self.latencies.items()):
+            ordered = sorted(samples)
+
+            def pct(p):
+                return 1000 * ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+            def mean(key):
+                values = self.measures[route].get(key)
+                return round(sum(values) / len(values), 2) if values else None
+
+            routes[route] = {
+                'requests': len(samples),
+                'p50_ms': round(pct(50), 3),
+                'p95_ms': round(pct(95), 3),
+                'p99_ms': round(pct(99), 3),
+                'mean_ms': round(1000 * sum(samples) / len(samples), 3),
+                # Share of the run's wall time; per-route RPS under the mixed workload
+                'rps': round(len(samples) / wall_seconds, 1) if wall_seconds else None,
+                'db_queries_per_request': mean('queries'),
+                # Request Cookie header and response (status line, headers, body) sizes
+                'cookie_bytes': mean('cookie_bytes'),
+                'response_bytes': mean('response_bytes'),
+                'statuses': dict(self.statuses[route]),
+            }
+        total = sum(len(s) for s in self.latencies.values())
+        return {'total_requests': total, 'wall_s': round(wall_seconds, 3),
+                'rps': round(total / wall_seconds, 1) if wall_seconds else None, 'routes': routes}
+
+
+# --- Clients ---
+
+class TestClientSession:
+    """Drives the app in-process through Flask's test client."""
+
+    def __init__(self, app):
+        self._client = app.test_client()
+
+    def request(self, method, path, body=None):
+        cookie = self._client.get_cookie('session')
+        response = self._client.open(path, method=method, json=body)
+        queries = response.headers.get('X-DB-Queries')
+        header_bytes = sum(len(k) + len(v) + 4 for k, v in response.headers.items())
+        return response.status_code, response.get_json(silent=True), {
+            'queries': int(queries) if queries else None,
+            'cookie_bytes': len(f"session={cookie.value}") if cookie else 0,
+            'response_bytes': len(response.status) + 11 + header_bytes + len(response.get_data()),
+        }
+
+
+class HttpSession:
+    """Drives a real WSGI server over a keep-alive HTTP/1.1 connection with a cookie jar."""
+
+    def __init__(self, host, port):
+        self._conn = http.client.HTTPConnection(host, port, timeout=30)
+        self._cookies = {}
+
+    def request(self, method, path, body=None):
+        headers = {}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        if self._cookies:
+            headers['Cookie'] = '; '.join(f"{k}={v}" for k, v in self._cookies.items())
+        cookie_bytes = len(headers.get('Cookie', ''))
+        self._conn.request(method, path, body=payload, headers=headers)
+        response = self._conn.getresponse()
+        data = response.read()
+        for header, value in response.getheaders():
+            if header.lower() == 'set-cookie':
+                name, _, rest = value.partition('=')
+                self._cookies[name] = rest.split(';', 1)[0]
+        try:
+            parsed = json.loads(data) if data else None
+        except ValueError:
+            parsed = None
+        queries = response.getheader('X-DB-Queries')
+        header_bytes = sum(len(k) + len(v) + 4 for k, v in response.getheaders())
+        return response.status, parsed, {
+            'queries': int(queries) if queries else None,
+            'cookie_bytes': cookie_bytes,
+            'response_bytes': len(response.reason) + 15 + header_bytes + len(data),
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+# --- Workload ---
+
+def run_session(session, recorder, name, travels, rng):
+    """One realistic player session (see module docstring)."""
+    def call(method, path, body=None, route=None):
+        return recorder.timed(route or f"{method} {path}", lambda: session.request(method, path, body))
+
+    password = 'bench-password'
+    call('POST', '/api/user/register', {'name': name, 'password': password})
+    call('POST', '/api/user/login', {'name': name, 'password': password})
+    call('GET', '/api/main/state')
+    status, airports = call('GET', '/api/main/airports')
+    icaos = [a['ICAO'] for a in airports or [] if a['ICAO'] != 'EFHK'] or ['EGLL']
+
+    state = None
+    for i in range(travels):
+        status, body = call('POST', '/api/main/travel', {'ICAO': rng.choice(icaos)})
+        state = (body or {}).get('state', state)
+        # Won, lost or stranded without energy: logging in again starts a new game
+        if status == 400 or (body and (body.get('win') or body.get('lose'))):
+            call('POST', '/api/user/login', {'name': name, 'password': password})
+            continue
+        if state and state.get('energy', 0) < 200 and state.get('credits', 0) > 100:
+            status, body = call('POST', '/api/buy/range', {'credits': state['credits'] - 100})
+            state = (body or {}).get('state', state)
+        if i % 10 == 9:
+            call('GET', '/api/user/badges')
+    call('GET', '/api/user/badges')
+
+
+def run_workload(make_session, recorder, sessions, travels, clients, seed, prefix):
+    """Run `sessions` player sessions over `clients` concurrent threads."""
+    jobs = list(range(sessions))
+    lock = threading.Lock()
+
+    def worker(worker_id):
+        rng = random.Random(seed + worker_id)
+        while True:
+            with lock:
+                if not jobs:
+                    return
+                job = jobs.pop()
+            session = make_session()
+            try:
+                run_session(session, recorder, f"{prefix}{job}", travels, rng)
+            finally:
+                close = getattr(session, 'close', None)
+                if close:
+                    close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(max(1, clients))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+def micro_benchmarks(app_module, username, repeat=200):
+    """Time the hottest helpers directly (outside a request, so no request-level memo)."""
+    results = {}
+    app_module._user_cache.clear()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        app_module._user_cache.clear()
+        app_module.find_user(username)
+    results['find_user_uncached_us'] = round(1e6 * (time.perf_counter() - start) / repeat, 2)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        app_module.find_user(username)
+    results['find_user_cached_us'] = round(1e6 * (time.perf_counter() - start) / repeat, 2)
+    start = time.perf_counter()
+    for _ in range(max(1, repeat // 20)):
+        app_module.load_all_airports()
+    results['load_all_airports_ms'] = round(1000 * (time.perf_counter() - start) / max(1, repeat // 20), 3)
+    return results
+
+
+# --- Servers ---
+
+def start_wsgi_server(flask_app):
+    """Threaded werkzeug server (one thread per connection); returns (port, stop)."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, flask_app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_port, server.shutdown
+
+
+def start_asgi_server(flask_app):
+    """uvicorn serving asgi.WSGIBridge (event loop + bounded thread pool); returns (port, stop)."""
+    # Note: clients share this process's GIL with the event loop, which inflates asgi latencies
+    # here; run `uvicorn asgi:app` in its own process for absolute numbers.
+    import socket
+    import uvicorn
+    from asgi import WSGIBridge
+
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    config = uvicorn.Config(WSGIBridge(flask_app), log_level='warning', lifespan='on', timeout_keep_alive=60)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+
+    return sock.getsockname()[1], stop
+
+
+def open_idle_connections(port, count):
+    """Open `count` connections that send half a request and then go quiet (slow clients)."""
+    import socket
+    socks = []
+    for _ in range(count):
+        sock = socket.create_connection(('127.0.0.1', port))
+        sock.sendall(b'GET /api/main/state HTTP/1.1\r\nHost: localhost\r\n')
+        socks.append(sock)
+    time.sleep(0.5)  # let the server accept them all
+    return socks
+
+
+def process_usage():
+    """Resident memory (KiB) and thread count of this process (Linux /proc; empty elsewhere)."""
+    usage = {}
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key == 'VmRSS':
+                    usage['rss_kib'] = int(value.split()[0])
+                elif key == 'Threads':
+                    usage['threads'] = int(value)
+    except OSError:
+        pass
+    return usage
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline):
+    """Print per-route p50/p95 and DB-query deltas against a previous results file."""
+    for mode, result in current['modes'].items():
+        old_routes = baseline.get('modes', {}).get(mode, {}).get('routes', {})
+        print(f"\n{mode}: vs {baseline.get('commit')}")
+        for route, stats in result['routes'].items():
+            old = old_routes.get(route)
+            if not old:
+                continue
+            print(f"  {route:32s} p50 {old['p50_ms']:8.3f} -> {stats['p50_ms']:8.3f} ms"
+                  f"   p95 {old['p95_ms']:8.3f} -> {stats['p95_ms']:8.3f} ms"
+                  f"   queries {old['db_queries_per_request']} -> {stats['db_queries_per_request']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ChronoQuest HTTP API benchmark.')
+    parser.add_argument('--db', choices=('standin', 'mariadb'), default='standin')
+    parser.add_argument('--mode', choices=('testclient', 'wsgi', 'asgi', 'both', 'all'), default='both',
+                        help="'both' = testclient + wsgi; 'all' adds asgi (needs uvicorn)")
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--travels', type=int, default=50, help='travel requests per session')
+    parser.add_argument('--clients', type=int, default=4, help='concurrent clients in wsgi/asgi mode')
+    parser.add_argument('--idle', type=int, default=0,
+                        help='extra idle connections (half-sent requests) held open in wsgi/asgi mode')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='write results JSON here')
+    parser.add_argument('--compare', help='previous results JSON to compare against')
+    args = parser.parse_args(argv)
+
+    counter = None
+    if args.db == 'standin':
+        from benchmarks import standin_db
+        standin_db.install()
+        counter = standin_db.thread_queries
+    # Keep the benchmark from touching the repo's catalog snapshot
+    os.environ.setdefault('CHRONO_CATALOG_SNAPSHOT', os.path.join(tempfile.mkdtemp(), 'airport-catalog.pickle'))
+
+    import app as app_module
+
+    if counter:
+        app_module.app.wsgi_app = QueryCountMiddleware(app_module.app.wsgi_app, counter)
+
+    results = {'commit': git_commit(), 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'db': args.db,
+               'config': vars(args), 'modes': {}}
+    run_id = f"{int(time.time())}{random.Random().randrange(1000):03d}"
+
+    modes = {'both': ('testclient', 'wsgi'), 'all': ('testclient', 'wsgi', 'asgi')}.get(args.mode, (args.mode,))
+    for mode in modes:
+        prefix = f"bench{run_id}{mode[0]}"
+        if mode == 'testclient':
+            recorder = Recorder()
+            wall = run_workload(lambda: TestClientSession(app_module.app), recorder, args.sessions, args.travels,
+                                1, args.seed, prefix)
+            results['modes'][mode] = recorder.report(wall)
+            continue
+
+        start_server = start_wsgi_server if mode == 'wsgi' else start_asgi_server
+        port, stop = start_server(app_module.app)
+        idle = open_idle_connections(port, args.idle)
+        try:
+            recorder = Recorder()
+            wall = run_workload(lambda: HttpSession('127.0.0.1', port), recorder, args.sessions,
+                                args.travels, args.clients, args.seed, prefix)
+            results['modes'][mode] = recorder.report(wall)
+            results['modes'][mode]['process'] = process_usage()
+            results['modes'][mode]['process']['idle_connections'] = len(idle)
+        finally:
+            for sock in idle:
+                sock.close()
+            stop()
+
+    app_module.flush_game_state()
+    results['micro'] = micro_benchmarks(app_module, f"bench{run_id}{modes[0][0]}0")
+
+    for mode, result in results['modes'].items():
+        print(f"\n[{mode}] {result['total_requests']} requests in {result['wall_s']} s ({result['rps']} req/s)"
+              f"  {result.get('process', '')}")
+        for route, s in result['routes'].items():
+            print(f"  {route:32s} n={s['requests']:5d}  p50={s['p50_ms']:8.3f}  p95={s['p95_ms']:8.3f}"
+                  f"  p99={s['p99_ms']:8.3f} ms  db/req={s['db_queries_per_request']}"
+                  f"  cookie={s['cookie_bytes']}B  response={s['response_bytes']}B")
+    print(f"\n[micro] {results['micro']}")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2) + '\n', encoding='utf-8')
+    if args.compare:
+        compare(results, json.loads(Path(args.compare).read_text(encoding='utf-8')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Measure airport catalog memory footprint and lookup time at OurAirports scale.
+
+Usage: python benchmarks/catalog_bench.py [--airports 70000]
+
+Compares the columnar AirportTable against the old list-of-dicts catalog with a synthetic
+catalog of the requested size (no database needed).
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from catalog import AirportTable  # noqa: E402
+
+
+def synthetic_airports(n, seed=1):
+    """Generate n airport dicts shaped like the airports table (about 250 countries, 10k cities)."""
+    rng = random.Random(seed)
+    countries = [f"Country {i}" for i in range(250)]
+    cities = [f"City {i}" for i in range(10000)]
+    airports = []
+    for i in range(n):
+        icao = f"X{i:06d}"
+        airports.append({
+            'ICAO': icao, 'name': f"Airport {i}", 'code': icao,
+            'city': rng.choice(cities), 'country': rng.choice(countries),
+            'lat': rng.uniform(-90, 90), 'lon': rng.uniform(-180, 180),
+            'distance': rng.randint(0, 20000),
+        })
+    return airports
+
+
+def deep_sizeof_dicts(airports):
+    """Approximate memory of a list of airport dicts, counting each distinct object once."""
+    seen = set()
+    size = sys.getsizeof(airports)
+    for a in airports:
+        for obj in (a, *a.values()):
+            if id(obj) not in seen:
+                seen.add(id(obj))
+                size += sys.getsizeof(obj)
+    return size
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--airports', type=int, default=70000)
+    parser.add_argument('--lookups', type=int, default=10000)
+    args = parser.parse_args()
+
+    airports = synthetic_airports(args.airports)
+    start = time.perf_counter()
+    table = AirportTable(airports)
+    build_s = time.perf_counter() - start
+
+    rng = random.Random(2)
+    probes = [airports[rng.randrange(len(airports))]['ICAO'] for _ in range(args.lookups)]
+    scan_probes = probes[:max(1, args.lookups // 100)]
+
+    results = {
+        'airports': len(table),
+        'list_of_dicts_bytes': deep_sizeof_dicts(airports),
+        'table_bytes': table.nbytes(),
+        'table_build_s': build_s,
+        'icao_lookup_table_us': 1e6 * timed(lambda: [table.get(p) for p in probes], 1) / len(probes),
+        'icao_lookup_linear_scan_us': 1e6 * timed(
+            lambda: [next((a for a in airports if a['ICAO'] == p), None) for p in scan_probes], 1) / len(scan_probes),
+        'country_query_ms': 1e3 * timed(lambda: table.query(country='Country 7', limit=50), 100),
+        'bbox_query_ms': 1e3 * timed(lambda: table.query(bbox=(50, 0, 60, 30), limit=50), 20),
+    }
+    for key, value in results.items():
+        print(f"{key:30s} {value:,.2f}" if isinstance(value, float) else f"{key:30s} {value:,}")
+
+
+if __name__ == '__main__':
+    main()
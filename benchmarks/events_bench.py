@@ -0,0 +1,85 @@
+"""Microbenchmark for arrival event resolution (the hottest pure-Python path in /api/main/travel).
+
+Usage: python benchmarks/events_bench.py [--iterations 200000]
+
+Compares the legacy copy-and-scan sampler with the precompiled Fenwick/alias samplers and
+times a full EventEngine.resolve() for each phase.
+"""
+import argparse
+import copy
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from events import DEFAULT_PHASES, EventEngine, FenwickSampler, AliasTable  # noqa: E402
+
+
+def legacy_weighted_sample_without_replacement(population, weights, k, rng):
+    """The sampler api_travel used before the event engine (O(k*n) per call), kept for comparison."""
+    items = population[:]
+    w = weights[:]
+    picked = []
+    k = min(k, len(items))
+    for _ in range(k):
+        total = sum(w)
+        if total <= 0:
+            break
+        r = rng.uniform(0, total)
+        cumulative = 0
+        for i, wt in enumerate(w):
+            cumulative += wt
+            if r <= cumulative:
+                picked.append(items.pop(i))
+                w.pop(i)
+                break
+    return picked
+
+
+def per_call_us(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return 1e6 * (time.perf_counter() - start) / iterations
+
+
+def fresh_state():
+    return {'credits': 1000, 'energy': 1000, 'shards': {}, 'countShards': 0, 'fluxfire': 0,
+            'paradox': {'active': False, 'coins': 0, 'startTime': 0}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200000)
+    parser.add_argument('--population', type=int, default=7,
+                        help='event population size for the sampler comparison (7 = current game)')
+    args = parser.parse_args()
+    n = args.iterations
+    rng = random.Random(42)
+
+    population = [f"ev{i}" for i in range(args.population)]
+    weights = [rng.randint(1, 5) for _ in population]
+    fenwick = FenwickSampler(population, weights)
+    alias = AliasTable(population, weights)
+
+    print(f"population={args.population} iterations={n}")
+    print(f"legacy sampler, k=3        {per_call_us(lambda: legacy_weighted_sample_without_replacement(population, weights, 3, rng), n):8.3f} us")
+    print(f"fenwick sampler, k=3       {per_call_us(lambda: fenwick.sample(rng, 3), n):8.3f} us")
+    print(f"alias table, k=1           {per_call_us(lambda: alias.draw(rng), n):8.3f} us")
+
+    engine = EventEngine(DEFAULT_PHASES)
+    normal = fresh_state()
+    trapped = fresh_state()
+    trapped['paradox']['active'] = True
+
+    def resolve(template):
+        return engine.resolve(copy.deepcopy(template), rng)
+
+    print(f"engine.resolve, normal     {per_call_us(lambda: resolve(normal), n // 4):8.3f} us (incl. state copy)")
+    print(f"engine.resolve, paradox    {per_call_us(lambda: resolve(trapped), n // 4):8.3f} us (incl. state copy)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Check that the simulator and the web routes play identical games for the same seed.
+
+Usage:
+    python -m benchmarks.sim_parity                        # seed 7, every policy
+    python -m benchmarks.sim_parity --seed 1 --games 20 --policy greedy
+
+For each game, simulate.play_game records the policy's actions and the state after every
+step. The same actions are then replayed through the Flask test client (stand-in DB) with
+app.GAME_RNG = random.Random(seed), and each response's state and outcome must match the
+simulator's. Each divergence is reported; the exit status is non-zero if any game diverged.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE))
+
+ROUTES = {'travel': ('/api/main/travel', 'ICAO'), 'buy_range': ('/api/buy/range', 'credits'),
+          'buy_credits': ('/api/buy/credits', 'fluxfire')}
+
+
+def _comparable(state):
+    # The simulator's player is always "simulator", and the paradox start time is the wall clock
+    # (display only); everything else must match exactly
+    state = {k: v for k, v in state.items() if k != 'playerName'}
+    state['paradox'] = {k: v for k, v in state['paradox'].items() if k != 'startTime'}
+    return state
+
+
+def _web_outcome(engine, response):
+    data = response.get_json()
+    if response.status_code == 400 and data.get('error') == 'Insufficient Energy':
+        return engine.NO_ENERGY
+    if data.get('win'):
+        return engine.WIN
+    if data.get('lose'):
+        return engine.LOSE
+    return None
+
+
+def check_game(app_module, world, seed, policy_name, username, max_steps=1000):
+    """Play `seed` in the simulator and over HTTP. Returns None if identical, else a description."""
+    import engine
+    import simulate
+
+    trace = []
+    outcome = simulate.play_game(seed, policy_name, world, max_steps, trace)[0]
+    start = engine.new_game_state('simulator', random.Random(seed)).to_dict()
+
+    client = app_module.app.test_client()
+    app_module.GAME_RNG = random.Random(seed)
+    response = client.post('/api/user/register', json={'name': username, 'password': 'parity-check'})
+    if not response.get_json().get('ok'):
+        return f"could not register {username}: {response.get_json()}"
+    state = client.get('/api/main/state').get_json()['state']
+    if _comparable(state) != _comparable(start):
+        return f"start state differs: web {state} vs simulator {start}"
+
+    for step, (action, amount, sim_outcome, sim_state) in enumerate(trace, 1):
+        path, field = ROUTES[action]
+        response = client.post(path, json={field: amount})
+        web_outcome = _web_outcome(engine, response) if action == 'travel' else None
+        if web_outcome != (sim_outcome if sim_outcome in (engine.WIN, engine.LOSE, engine.NO_ENERGY) else None):
+            return f"step {step} ({action} {amount}): outcome web {web_outcome!r} vs simulator {sim_outcome!r}"
+        web_state = response.get_json()['state']
+        if _comparable(web_state) != _comparable(sim_state):
+            return f"step {step} ({action} {amount}): state web {web_state} vs simulator {sim_state}"
+    print(f"seed {seed} {policy_name}: {len(trace)} steps identical ({outcome})")
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Simulator vs web-route parity check.')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--games', type=int, default=1, help='check seeds seed .. seed+games-1')
+    parser.add_argument('--policy', action='append', help='policy to check (repeatable; default: all)')
+    parser.add_argument('--cost-mode', choices=('random', 'distance'), default='random')
+    parser.add_argument('--max-steps', type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    from benchmarks import standin_db
+    standin_db.install()
+    os.environ.setdefault('CHRONO_CATALOG_SNAPSHOT', os.path.join(tempfile.mkdtemp(), 'airport-catalog.pickle'))
+    os.environ['CHRONO_TRAVEL_COST_MODE'] = args.cost_mode
+
+    import app as app_module
+    import simulate
+
+    world = simulate.World(cost_mode=args.cost_mode, energy_per_km=app_module.ENERGY_PER_KM)
+    failures = 0
+    for policy_name in args.policy or sorted(simulate.POLICIES):
+        for seed in range(args.seed, args.seed + args.games):
+            problem = check_game(app_module, world, seed, policy_name, f"parity{policy_name}{seed}", args.max_steps)
+            if problem:
+                failures += 1
+                print(f"seed {seed} {policy_name}: DIVERGED at {problem}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
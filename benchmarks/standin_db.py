@@ -0,0 +1,191 @@
+"""Embedded, network-free stand-in for the `mariadb` connector, backed by SQLite.
+
+`install()` creates a throwaway database file with the ChronoQuest schema and the airports
+from airport-data.json, then registers this module as `mariadb` in sys.modules. It must run
+before `connect`/`app` are imported. Only the connector surface connect.py uses is
+provided, with MariaDB-specific SQL translated on the fly. Every statement and connection
+is counted in STATS (process totals) and per thread (`thread_queries()`) so benchmarks can
+report DB work per request even with concurrent clients.
+"""
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+BASE = Path(__file__).resolve().parent.parent
+
+STATS = {'queries': 0, 'connections': 0}
+_stats_lock = threading.Lock()
+_local = threading.local()
+_db_path = None
+
+SCHEMA = """
+CREATE TABLE airports (
+    ident TEXT NOT NULL PRIMARY KEY,
+    name TEXT, code TEXT, city TEXT, country TEXT,
+    distance INTEGER, lat REAL, lon REAL
+);
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    password_hash TEXT NOT NULL,
+    credits INTEGER DEFAULT 1000,
+    energy INTEGER DEFAULT 1000,
+    current_location TEXT DEFAULT 'EFHK',
+    shards TEXT,
+    playerHowManyWins INTEGER DEFAULT 0,
+    playerHowManyLoses INTEGER DEFAULT 0,
+    playerHowManyTimesPlayed INTEGER DEFAULT 0,
+    jetstream_uses INTEGER DEFAULT 0,
+    game_state_save TEXT
+);
+CREATE TABLE user_badges (
+    user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    badge_id TEXT NOT NULL,
+    awarded_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, badge_id)
+);
+CREATE INDEX badge_awarded ON user_badges (badge_id, awarded_at);
+CREATE TABLE game_events (
+    game_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    recorded_at TEXT NOT NULL,
+    action TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (game_id, seq, recorded_at)
+);
+CREATE INDEX user_recorded ON game_events (user_id, recorded_at);
+"""
+
+
+class Error(Exception):
+    """Mirrors mariadb.Error: the base class connect.py catches."""
+
+
+def _count(key, n=1):
+    with _stats_lock:
+        STATS[key] += n
+    if key == 'queries':
+        _local.queries = getattr(_local, 'queries', 0) + n
+
+
+def thread_queries():
+    """Statements executed so far on the calling thread."""
+    return getattr(_local, 'queries', 0)
+
+
+def reset_stats():
+    with _stats_lock:
+        for key in STATS:
+            STATS[key] = 0
+
+
+def _translate(query):
+    query = query.replace('%s', '?')
+    query = re.sub(r'\bINSERT\s+IGNORE\b', 'INSERT OR IGNORE', query, flags=re.I)
+    # SQLite (before 3.44) has no ORDER BY inside aggregates and spells the separator as an argument
+    query = re.sub(r"GROUP_CONCAT\((.+?) ORDER BY .+? SEPARATOR ('[^']*')\)", r"group_concat(\1, \2)", query, flags=re.I)
+    return query
+
+
+class Cursor:
+    def __init__(self, raw):
+        self._raw = raw
+        self.rowcount = -1
+
+    def execute(self, query, params=None):
+        _count('queries')
+        try:
+            self._raw.execute(_translate(query), tuple(params or ()))
+        except sqlite3.Error as e:
+            raise Error(str(e)) from e
+        self.rowcount = self._raw.rowcount
+
+    def executemany(self, query, seq_of_params):
+        _count('queries')
+        try:
+            self._raw.executemany(_translate(query), [tuple(p) for p in seq_of_params])
+        except sqlite3.Error as e:
+            raise Error(str(e)) from e
+        self.rowcount = self._raw.rowcount
+
+    def fetchone(self):
+        return self._raw.fetchone()
+
+    def fetchall(self):
+        return self._raw.fetchall()
+
+    @property
+    def lastrowid(self):
+        return self._raw.lastrowid
+
+    def close(self):
+        self._raw.close()
+
+
+class Connection:
+    def __init__(self, path, autocommit=True):
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self.autocommit = autocommit
+
+    def cursor(self, prepared=False, **kwargs):
+        return Cursor(self._db.cursor())
+
+    def begin(self):
+        _count('queries')
+        self._db.execute('BEGIN')
+
+    def commit(self):
+        if self._db.in_transaction:
+            _count('queries')
+            self._db.execute('COMMIT')
+
+    def rollback(self):
+        if self._db.in_transaction:
+            _count('queries')
+            self._db.execute('ROLLBACK')
+
+    def ping(self):
+        self._db.execute('SELECT 1')
+
+    def close(self):
+        self._db.close()
+
+
+def connect(**kwargs):
+    if _db_path is None:
+        raise Error('stand-in database not installed')
+    _count('connections')
+    return Connection(_db_path, kwargs.get('autocommit', True))
+
+
+def create_database(path):
+    """Create the schema and seed the airports table at `path`."""
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    with open(BASE / 'airport-data.json', encoding='utf-8') as f:
+        airports = json.load(f)
+    db.executemany(
+        "INSERT INTO airports (ident, name, code, city, country, distance, lat, lon) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(a['ICAO'], a['name'], a['code'], a['city'], a['country'], a.get('distance'), a['lat'], a['lon'])
+         for a in airports])
+    db.commit()
+    db.close()
+
+
+def install(path=None):
+    """Create a fresh stand-in database and register this module as `mariadb`. Returns the DB path."""
+    global _db_path
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix='chronoquest-bench-', suffix='.sqlite3')
+        os.close(fd)
+        os.unlink(path)
+    create_database(path)
+    _db_path = path
+    sys.modules['mariadb'] = sys.modules[__name__]
+    return path
@@ -0,0 +1,303 @@
+"""Airport catalog that boots from a local snapshot and refreshes from MariaDB in the background."""
+import os
+import sys
+import json
+import time
+import pickle
+import hashlib
+import threading
+from array import array
+from math import isnan
+
+from geo import np
+
+SNAPSHOT_MAGIC = b'CQCAT1'
+SNAPSHOT_FORMAT = 2  # 2: columnar AirportTable payload
+_DIGEST_SIZE = hashlib.sha256().digest_size
+
+# Fields that define an airport row; the row hash (catalog version) is computed over these
+ROW_FIELDS = ('ICAO', 'name', 'code', 'city', 'country', 'lat', 'lon', 'distance')
+
+
+def row_hash(airports):
+    """Return a stable content hash of the catalog rows (used as the catalog version)."""
+    rows = sorted((tuple(a.get(f) for f in ROW_FIELDS) for a in airports), key=lambda r: r[0] or '')
+    return hashlib.sha256(json.dumps(rows, separators=(',', ':')).encode('utf-8')).hexdigest()[:16]
+
+
+# --- Columnar Airport Table ---
+
+class AirportTable:
+    """Compact columnar store for the airport catalog.
+
+    Coordinates and distances live in typed arrays; city and country names are interned
+    once and referenced by small integer ids. A hash index maps ICAO -> row and secondary
+    indexes map (case-folded) country and city -> rows, so lookups never scan the table.
+    Rows are materialized as plain dicts only when a caller asks for them.
+    """
+
+    def __init__(self, airports):
+        self._icao = []
+        self._name = []
+        self._code = []
+        self._places = [None]  # interned city/country strings; id 0 means "unknown"
+        place_ids = {None: 0}
+        self._city = array('I')
+        self._country = array('I')
+        self._lat = array('d')
+        self._lon = array('d')
+        self._distance = array('i')
+
+        def place_id(value):
+            if value not in place_ids:
+                place_ids[value] = len(self._places)
+                self._places.append(sys.intern(value))
+            return place_ids[value]
+
+        for a in airports:
+            self._icao.append(sys.intern(a['ICAO']))
+            self._name.append(a.get('name'))
+            code = a.get('code')
+            # Most codes equal the ICAO ident; share the string instead of storing a copy
+            self._code.append(self._icao[-1] if code == a['ICAO'] else code)
+            self._city.append(place_id(a.get('city')))
+            self._country.append(place_id(a.get('country')))
+            lat, lon = a.get('lat'), a.get('lon')
+            self._lat.append(float('nan') if lat is None else lat)
+            self._lon.append(float('nan') if lon is None else lon)
+            self._distance.append(a.get('distance') if a.get('distance') is not None else 9999)
+        self._build_indexes()
+
+    def _build_indexes(self):
+        self._by_icao = {icao: i for i, icao in enumerate(self._icao)}
+        by_country, by_city = {}, {}
+        for i in range(len(self._icao)):
+            for column, index in ((self._country, by_country), (self._city, by_city)):
+                place = self._places[column[i]]
+                if place is not None:
+                    index.setdefault(place.casefold(), array('I')).append(i)
+        self._by_country = by_country
+        self._by_city = by_city
+
+    def __getstate__(self):
+        # Indexes are derived data; rebuild them on load to keep snapshots small
+        state = self.__dict__.copy()
+        for key in ('_by_icao', '_by_country', '_by_city'):
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._build_indexes()
+
+    def __len__(self):
+        return len(self._icao)
+
+    def __iter__(self):
+        return (self.row(i) for i in range(len(self._icao)))
+
+    def __contains__(self, icao):
+        return icao in self._by_icao
+
+    def row(self, i):
+        """Materialize row i as the airport dict served by the API."""
+        lat, lon = self._lat[i], self._lon[i]
+        return {
+            'ICAO': self._icao[i],
+            'name': self._name[i],
+            'code': self._code[i],
+            'city': self._places[self._city[i]],
+            'country': self._places[self._country[i]],
+            'lat': None if isnan(lat) else lat,
+            'lon': None if isnan(lon) else lon,
+            'distance': self._distance[i],
+        }
+
+    def get(self, icao):
+        """Return the airport dict for an ICAO code, or None (O(1) hash lookup)."""
+        i = self._by_icao.get(icao)
+        return None if i is None else self.row(i)
+
+    def located(self):
+        """Yield (ICAO, lat, lon) for every airport with coordinates."""
+        for i, icao in enumerate(self._icao):
+            if not isnan(self._lat[i]) and not isnan(self._lon[i]):
+                yield icao, self._lat[i], self._lon[i]
+
+    def query(self, country=None, city=None, bbox=None, offset=0, limit=None):
+        """Return (total_matches, [airport dicts]) filtered by country, city and bounding box.
+
+        `bbox` is (min_lat, min_lon, max_lat, max_lon); a box with min_lon > max_lon wraps the
+        antimeridian. Country/city matching is case-insensitive and served from the indexes.
+        """
+        rows = None
+        for value, index in ((country, self._by_country), (city, self._by_city)):
+            if value:
+                matches = index.get(value.casefold(), ())
+                rows = matches if rows is None else sorted(set(rows).intersection(matches))
+        if bbox is not None:
+            rows = self._in_bbox(range(len(self._icao)) if rows is None else rows, *bbox)
+        elif rows is None:
+            rows = range(len(self._icao))
+        total = len(rows)
+        end = None if limit is None else offset + limit
+        return total, [self.row(i) for i in rows[offset:end]]
+
+    def _in_bbox(self, rows, min_lat, min_lon, max_lat, max_lon):
+        wraps = min_lon > max_lon
+        if np is not None:
+            idx = np.asarray(rows, dtype=np.int64)
+            lat = np.frombuffer(self._lat, dtype=np.float64)[idx]
+            lon = np.frombuffer(self._lon, dtype=np.float64)[idx]
+            lon_ok = (lon >= min_lon) | (lon <= max_lon) if wraps else (lon >= min_lon) & (lon <= max_lon)
+            return idx[(lat >= min_lat) & (lat <= max_lat) & lon_ok].tolist()
+        lat, lon = self._lat, self._lon
+        if wraps:
+            return [i for i in rows if min_lat <= lat[i] <= max_lat and (lon[i] >= min_lon or lon[i] <= max_lon)]
+        return [i for i in rows if min_lat <= lat[i] <= max_lat and min_lon <= lon[i] <= max_lon]
+
+    def nbytes(self):
+        """Approximate memory held by the table's columns, strings and indexes."""
+        size = sum(sys.getsizeof(col) for col in (
+            self._icao, self._name, self._code, self._places, self._city, self._country,
+            self._lat, self._lon, self._distance, self._by_icao, self._by_country, self._by_city))
+        seen = set()
+        for column in (self._icao, self._name, self._code, self._places):
+            for value in column:
+                if value is not None and id(value) not in seen:
+                    seen.add(id(value))
+                    size += sys.getsizeof(value)
+        size += sum(sys.getsizeof(rows) for index in (self._by_country, self._by_city) for rows in index.values())
+        return size
+
+
+# --- Snapshots ---
+
+def write_snapshot(path, airports, version):
+    """Atomically write a checksummed pickle snapshot of the catalog (an AirportTable)."""
+    payload = pickle.dumps({'format': SNAPSHOT_FORMAT, 'version': version, 'airports': airports},
+                           protocol=pickle.HIGHEST_PROTOCOL)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC + hashlib.sha256(payload).digest() + payload)
+    os.replace(tmp, path)
+
+
+def read_snapshot(path):
+    """Return (AirportTable, version) from a snapshot file, or None if it is missing, corrupt or outdated."""
+    try:
+        with open(path, 'rb') as f:
+            blob = f.read()
+    except OSError:
+        return None
+    header = len(SNAPSHOT_MAGIC)
+    if not blob.startswith(SNAPSHOT_MAGIC):
+        return None
+    digest, payload = blob[header:header + _DIGEST_SIZE], blob[header + _DIGEST_SIZE:]
+    if hashlib.sha256(payload).digest() != digest:
+        print(f"Warning: airport catalog snapshot {path} failed its checksum; ignoring it.", file=sys.stderr)
+        return None
+    data = pickle.loads(payload)
+    if data.get('format') != SNAPSHOT_FORMAT:
+        return None
+    return data['airports'], data['version']
+
+
+# --- Catalog ---
+
+class AirportCatalog:
+    """Holds the current AirportTable and swaps it atomically when the source data changes.
+
+    Boot order: the local snapshot, else the seed loader (e.g. the shipped airport-data.json).
+    `refresh()` pulls rows from `db_loader` and only replaces the catalog (and rewrites the
+    snapshot) when the row hash differs from the current version. Subscribers registered
+    with `subscribe()` are called with the catalog after every swap.
+    """
+
+    def __init__(self, snapshot_path, db_loader, seed_loader=None):
+        self.snapshot_path = str(snapshot_path)
+        self._db_loader = db_loader
+        self._seed_loader = seed_loader
+        self.airports = AirportTable([])
+        self.version = None
+        self.source = None
+        self._snapshot_version = None  # version currently persisted in the snapshot file
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def boot(self):
+        """Load the catalog from the snapshot (or seed) without touching the database."""
+        snap = read_snapshot(self.snapshot_path)
+        if snap is not None:
+            self._snapshot_version = snap[1]
+            self._swap(snap[0], snap[1], 'snapshot')
+        elif self._seed_loader is not None:
+            airports = self._seed_loader()
+            self._swap(AirportTable(airports), row_hash(airports), 'seed')
+        return self
+
+    def subscribe(self, callback):
+        """Call `callback(catalog)` now (if loaded) and after every future catalog swap."""
+        self._subscribers.append(callback)
+        if self.version is not None:
+            callback(self)
+
+    def _swap(self, airports, version, source):
+        with self._lock:
+            self.airports = airports
+            self.version = version
+            self.source = source
+        for callback in self._subscribers:
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"Error: airport catalog subscriber failed: {e}", file=sys.stderr)
+
+    def refresh(self):
+        """Reload rows from the database; swap and re-snapshot only when the version changed.
+
+        Returns True if the catalog was replaced.
+        """
+        airports = self._db_loader()
+        if not airports:
+            # DB unreachable or empty: keep serving the current catalog rather than nothing
+            return False
+        version = row_hash(airports)
+        changed = version != self.version
+        if changed:
+            self._swap(AirportTable(airports), version, 'database')
+        if version != self._snapshot_version:
+            try:
+                write_snapshot(self.snapshot_path, self.airports, version)
+                self._snapshot_version = version
+            except OSError as e:
+                print(f"Warning: could not write airport catalog snapshot: {e}", file=sys.stderr)
+        return changed
+
+    def start_background_refresh(self, interval):
+        """Refresh once in a daemon thread, then every `interval` seconds (0 = only once).
+
+        Safe to call repeatedly (e.g. per request); it starts one thread per process.
+        """
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._refresh_loop, args=(interval,),
+                                            name='airport-catalog-refresh', daemon=True)
+            self._thread.start()
+
+    def _refresh_loop(self, interval):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error: airport catalog refresh failed: {e}", file=sys.stderr)
+            if interval <= 0:
+                return
+            time.sleep(interval)
@@ -1,6 +1,14 @@
 import mariadb
 import sys
 import os
+import time
+import atexit
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import metrics
+from metrics import timed_cursor
 
 # --- Database Configuration ---
 # IMPORTANT: Use environment variables for sensitive data in production.
@@ -11,6 +19,18 @@ DB_USER = os.environ.get("MARIADB_USER", "futuretechnologies")
 DB_PASSWORD = os.environ.get("MARIADB_PASSWORD", "Btno9180?")
 DB_NAME = "chronoquest"
 
+# --- Connection Pool Configuration ---
+# Minimum number of idle connections kept open (idle eviction never goes below this)
+POOL_MIN_SIZE = int(os.environ.get("MARIADB_POOL_MIN", "1"))
+# Hard cap on connections opened by this process (idle + checked out)
+POOL_MAX_SIZE = int(os.environ.get("MARIADB_POOL_MAX", "10"))
+# Seconds an idle connection may sit in the pool before it is closed
+POOL_IDLE_TIMEOUT = float(os.environ.get("MARIADB_POOL_IDLE_TIMEOUT", "300"))
+# Seconds a caller waits for a free connection when the pool is exhausted
+POOL_CHECKOUT_TIMEOUT = float(os.environ.get("MARIADB_POOL_CHECKOUT_TIMEOUT", "5"))
+# Connections idle for longer than this are pinged before being handed out
+POOL_PING_AFTER = float(os.environ.get("MARIADB_POOL_PING_AFTER", "30"))
+
 
 def _connect():
     """Internal function to establish a database connection, now using variables."""
@@ -24,65 +44,463 @@ def _connect():
             password=DB_PASSWORD,
             autocommit=True
         )
+        metrics.DB_CONNECTIONS_OPENED.inc()
         return conn
     except mariadb.Error as e:
+        metrics.DB_ERRORS.inc('connect')
         # Print a clearer error message to help diagnose connection failure
         print(f"Error connecting to MariaDB using User '{DB_USER}' at Host '{DB_HOST}': {e}", file=sys.stderr)
         return None
 
-def get_db_cursor():
+
+def _close_quietly(conn):
+    """Close a raw connection, ignoring errors from an already-dead socket."""
+    metrics.DB_CONNECTIONS_CLOSED.inc()
+    try:
+        conn.close()
+    except mariadb.Error:
+        pass
+
+
+# --- Connection Pool ---
+
+class ConnectionPool:
+    """Bounded, thread-safe pool of MariaDB connections.
+
+    Connections are reused LIFO so the hottest ones stay warm, pinged on checkout when they
+    have been idle for a while, replaced when the ping fails, and closed once they have been
+    idle longer than `idle_timeout` (never dropping below `min_size` idle connections).
+    """
+
+    def __init__(self, factory, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                 idle_timeout=POOL_IDLE_TIMEOUT, checkout_timeout=POOL_CHECKOUT_TIMEOUT,
+                 ping_after=POOL_PING_AFTER):
+        self._factory = factory
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.ping_after = ping_after
+        self._idle = deque()  # (conn, last_used) pairs, most recently used on the right
+        self._size = 0  # open connections owned by the pool (idle + checked out)
+        self._cond = threading.Condition()
+        self._pid = os.getpid()
+
+    def _reset_after_fork(self):
+        """Forget connections inherited from a parent process; their sockets are shared."""
+        if self._pid != os.getpid():
+            self._idle.clear()
+            self._size = 0
+            self._pid = os.getpid()
+
+    def _evict_idle(self, now):
+        """Pop connections that exceeded the idle timeout. Caller must hold the lock."""
+        expired = []
+        while len(self._idle) > self.min_size and now - self._idle[0][1] > self.idle_timeout:
+            expired.append(self._idle.popleft()[0])
+        self._size -= len(expired)
+        return expired
+
+    def _is_alive(self, conn):
+        try:
+            conn.ping()
+            return True
+        except mariadb.Error:
+            return False
+
+    def acquire(self):
+        """Check out a healthy connection, or return None if none can be obtained in time."""
+        started = time.perf_counter()
+        try:
+            return self._acquire()
+        finally:
+            metrics.DB_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        with self._cond:
+            self._reset_after_fork()
+            while True:
+                now = time.monotonic()
+                expired = self._evict_idle(now)
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # Reserve a slot; the handshake itself happens outside the lock
+                    self._size += 1
+                    conn, last_used = None, now
+                    break
+                remaining = deadline - now
+                if remaining <= 0:
+                    print(f"Error: connection pool exhausted ({self.max_size} connections in use)", file=sys.stderr)
+                    metrics.DB_ERRORS.inc('pool_exhausted')
+                    return None
+                self._cond.wait(remaining)
+
+        for stale in expired:
+            _close_quietly(stale)
+
+        if conn is not None and time.monotonic() - last_used > self.ping_after and not self._is_alive(conn):
+            # Reconnect-on-failure: the server dropped this connection while it sat idle
+            _close_quietly(conn)
+            conn = None
+
+        if conn is None:
+            conn = self._factory()
+            if conn is None:
+                self._forget()
+        return conn
+
+    def release(self, conn, discard=False):
+        """Return a connection to the pool, or close it if it is broken (`discard=True`)."""
+        if conn is None:
+            return
+        if discard:
+            _close_quietly(conn)
+            self._forget()
+            return
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _forget(self):
+        """Give back a slot whose connection was closed or never opened."""
+        with self._cond:
+            self._size = max(0, self._size - 1)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager yielding a pooled connection (or None when the DB is unreachable).
+
+        The connection is returned to the pool on exit and discarded if a database error
+        escaped the block and the connection no longer answers a ping.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        except mariadb.Error:
+            self.release(conn, discard=conn is not None and not self._is_alive(conn))
+            conn = None
+            raise
+        finally:
+            if conn is not None:
+                self.release(conn)
+
+    def close_all(self):
+        """Close every idle connection (used at process shutdown)."""
+        with self._cond:
+            idle = [c for c, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+        for conn in idle:
+            _close_quietly(conn)
+
+    def stats(self):
+        """Return a snapshot of pool occupancy for diagnostics."""
+        with self._cond:
+            return {'size': self._size, 'idle': len(self._idle), 'max_size': self.max_size}
+
+
+_pool = ConnectionPool(_connect)
+atexit.register(_pool.close_all)
+
+
+def get_pool():
+    """Return the process-wide connection pool."""
+    return _pool
+
+
+def db_connection():
+    """Context manager yielding a pooled connection: `with db_connection() as conn: ...`"""
+    return _pool.connection()
+
+
+# --- Unit of Work ---
+
+class UnitOfWork:
+    """One pooled connection and at most one transaction shared by every helper in a scope.
+
+    The connection is checked out lazily on first use; the transaction starts at the first
+    write, so read-only scopes never pay for a commit. Fixed statements run on cached
+    server-side prepared cursors. `finish()` commits once (or rolls back if any write
+    failed or `commit=False`) and returns the connection to the pool.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+        self.conn = None
+        self._cursors = {}  # query text -> prepared cursor on self.conn
+        self.in_transaction = False
+        self.failed = False
+        self._on_commit = []  # callbacks to run once the writes are durable
+
+    def after_commit(self, fn):
+        """Run `fn()` after this scope's writes commit (dropped if they roll back)."""
+        self._on_commit.append(fn)
+
+    def connection(self):
+        """Return the scope's connection, checking one out of the pool on first use."""
+        if self.conn is None:
+            self.conn = self._pool.acquire()
+        return self.conn
+
+    def cursor(self, query=None):
+        """Return a cursor on the scope's connection (a cached prepared one when `query` is given)."""
+        conn = self.connection()
+        if conn is None:
+            return None
+        if query is None:
+            return timed_cursor(conn.cursor())
+        cursor = self._cursors.get(query)
+        if cursor is None:
+            cursor = timed_cursor(conn.cursor(prepared=True))
+            self._cursors[query] = cursor
+        return cursor
+
+    def owns(self, cursor):
+        return cursor in self._cursors.values()
+
+    def begin(self):
+        """Open the scope's transaction if it is not open yet."""
+        if not self.in_transaction:
+            self.connection().begin()
+            self.in_transaction = True
+
+    def finish(self, commit=True):
+        """Commit (or roll back) the transaction and release the connection.
+
+        Returns: True if everything written in this scope was committed.
+        """
+        callbacks, self._on_commit = self._on_commit, []
+        conn, self.conn = self.conn, None
+        if conn is None:
+            ok = commit and not self.failed
+            self._run_callbacks(callbacks if ok else ())
+            return True
+        ok = True
+        discard = False
+        try:
+            if self.in_transaction:
+                if commit and not self.failed:
+                    conn.commit()
+                else:
+                    conn.rollback()
+                    ok = False
+        except mariadb.Error as e:
+            print(f"Error finishing transaction: {e}", file=sys.stderr)
+            metrics.DB_ERRORS.inc('commit')
+            ok = False
+            discard = True
+        finally:
+            for cursor in self._cursors.values():
+                try:
+                    cursor.close()
+                except mariadb.Error:
+                    discard = True
+            self._cursors.clear()
+            self.in_transaction = False
+            self._pool.release(conn, discard=discard)
+        self._run_callbacks(callbacks if ok and commit and not self.failed else ())
+        return ok
+
+    @staticmethod
+    def _run_callbacks(callbacks):
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception as e:
+                print(f"Error in after-commit callback: {e}", file=sys.stderr)
+
+
+_unit_provider = None
+_detached = threading.local()
+
+
+def set_unit_provider(provider):
+    """Register a callable returning the active UnitOfWork (or None).
+
+    The web layer uses this to bind one unit of work to each request; outside a request
+    the provider returns None and helpers fall back to autocommit pooled connections.
     """
-    Establishes a connection and returns the connection object and a cursor.
+    global _unit_provider
+    _unit_provider = provider
+
+
+def _current_unit():
+    if getattr(_detached, 'active', False):
+        return None
+    return _unit_provider() if _unit_provider else None
+
+
+@contextmanager
+def detached():
+    """Run the DB helpers called inside the block on their own autocommit pooled connections.
+
+    For writers (e.g. the write-behind save buffer) whose statements must neither join nor
+    wait on the unit of work of the request that happens to trigger them.
+    """
+    previous = getattr(_detached, 'active', False)
+    _detached.active = True
+    try:
+        yield
+    finally:
+        _detached.active = previous
+
+
+def after_commit(fn):
+    """Run `fn()` once the current unit of work commits, or right away outside a unit."""
+    unit = _current_unit()
+    if unit is None:
+        fn()
+    else:
+        unit.after_commit(fn)
+
+
+def get_db_cursor(query=None):
+    """
+    Checks a connection out of the pool and returns it together with a cursor.
     Used primarily for SELECT queries where results need immediate processing
     (e.g., in `find_user` or `load_all_airports`).
 
+    Inside a unit of work the unit's connection is used instead, and passing the fixed
+    `query` text returns a cached server-side prepared cursor for it.
+
     Returns: (cursor, connection) or (None, None) on failure.
     """
-    conn = _connect()
+    unit = _current_unit()
+    if unit is not None:
+        try:
+            cursor = unit.cursor(query)
+            return (cursor, unit.conn) if cursor else (None, None)
+        except mariadb.Error as e:
+            print(f"Error creating cursor: {e}", file=sys.stderr)
+            return None, None
+
+    conn = _pool.acquire()
     if conn:
         try:
-            cursor = conn.cursor()
+            cursor = timed_cursor(conn.cursor())
             return cursor, conn
         except mariadb.Error as e:
             print(f"Error creating cursor: {e}", file=sys.stderr)
-            conn.close()
+            _pool.release(conn, discard=True)
             return None, None
     return None, None
 
 def close_db_cursor(cursor, conn):
-    """Closes the cursor and the database connection."""
+    """Closes the cursor and returns the connection to the pool (unless a unit of work owns it)."""
+    unit = _current_unit()
+    if unit is not None and conn is not None and conn is unit.conn:
+        # The unit keeps its prepared cursors and connection until the scope finishes
+        if cursor and not unit.owns(cursor):
+            cursor.close()
+        return
     if cursor:
         cursor.close()
     if conn:
         # Note: Connection is not committed here as this function is used after SELECT
-        conn.close()
+        _pool.release(conn)
+
+
+def _execute_in_unit(unit, query, run):
+    """Run a write on the unit's transaction; a failure dooms the whole unit to rollback.
+
+    Returns the cursor's rowcount, or None on error.
+    """
+    try:
+        cursor = unit.cursor(query)
+        if cursor is None:
+            unit.failed = True
+            return None
+        unit.begin()
+        run(cursor)
+        return cursor.rowcount
+    except mariadb.Error as e:
+        print(f"Error executing query: {e}", file=sys.stderr)
+        metrics.DB_ERRORS.inc('execute')
+        unit.failed = True
+        return None
+
+
+def execute_rowcount(query, params=None):
+    """
+    Executes a non-SELECT database query like execute_query, but reports how many rows it
+    affected (e.g. 0 for an INSERT IGNORE that hit a unique key).
+
+    Returns: the affected row count, or None on error.
+    """
+    unit = _current_unit()
+    if unit is not None:
+        return _execute_in_unit(unit, query, lambda cursor: cursor.execute(query, params))
+
+    try:
+        with db_connection() as conn:
+            if not conn:
+                return None
+
+            cursor = timed_cursor(conn.cursor())
+            try:
+                cursor.execute(query, params)
+                conn.commit()
+                return cursor.rowcount
+            except mariadb.Error:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    except mariadb.Error as e:
+        print(f"Error executing query: {e}", file=sys.stderr)
+        metrics.DB_ERRORS.inc('execute')
+        return None
+
 
 def execute_query(query, params=None):
     """
     Executes a non-SELECT database query (INSERT, UPDATE, DELETE) and handles commit/rollback.
+    Inside a unit of work the statement joins the unit's transaction and is committed when
+    the unit finishes.
 
-    Returns: True on successful commit, False on error.
+    Returns: True on successful commit (or successful execution inside a unit), False on error.
     """
-    conn = None
-    cursor = None
-    try:
-        conn = _connect()
-        if not conn:
-            return False
+    return execute_rowcount(query, params) is not None
+
 
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        conn.commit()
+def execute_many(query, seq_of_params):
+    """
+    Executes one non-SELECT statement for every parameter tuple in a single round-trip batch
+    (cursor.executemany) and commits once. Joins the active unit of work like execute_query.
+
+    Returns: True on successful commit (or nothing to do), False on error.
+    """
+    seq_of_params = list(seq_of_params)
+    if not seq_of_params:
         return True
+    unit = _current_unit()
+    if unit is not None:
+        return _execute_in_unit(unit, query, lambda cursor: cursor.executemany(query, seq_of_params)) is not None
+
+    try:
+        with db_connection() as conn:
+            if not conn:
+                return False
+
+            cursor = timed_cursor(conn.cursor())
+            try:
+                cursor.executemany(query, seq_of_params)
+                conn.commit()
+                return True
+            except mariadb.Error:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
 
     except mariadb.Error as e:
-        print(f"Error executing query: {e}", file=sys.stderr)
-        if conn:
-            conn.rollback()
+        print(f"Error executing batch query: {e}", file=sys.stderr)
+        metrics.DB_ERRORS.inc('execute')
         return False
-
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
\ No newline at end of file
@@ -66,7 +66,6 @@ CREATE TABLE users (
     energy INT(11) DEFAULT 1000,
     current_location VARCHAR(10) DEFAULT 'EFHK',
     shards TEXT DEFAULT NULL,
-    playerBadges TEXT DEFAULT NULL,
     playerHowManyWins INT(11) DEFAULT 0,
     playerHowManyLoses INT(11) DEFAULT 0,
     playerHowManyTimesPlayed INT(11) DEFAULT 0,
@@ -75,3 +74,42 @@ CREATE TABLE users (
     PRIMARY KEY (id),
     UNIQUE KEY username (username)
 );
+
+---
+-- 6. Create the 'user_badges' table (one row per badge a player holds)
+---
+CREATE TABLE user_badges (
+    user_id INT(11) NOT NULL,
+    badge_id VARCHAR(64) NOT NULL,
+    awarded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, badge_id),
+    KEY badge_awarded (badge_id, awarded_at),
+    CONSTRAINT user_badges_user FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+);
+
+---
+-- 7. Create the 'game_events' table (append-only journal of game steps, see journal.py)
+---
+-- No foreign key to users: partitioned InnoDB tables cannot have them, and the journal is
+-- meant to outlive (and be analysed apart from) the users table. recorded_at is in the key
+-- for partitioning, so concurrent requests on one session can store the same seq twice;
+-- journal.replay keeps the earliest.
+CREATE TABLE game_events (
+    game_id CHAR(22) NOT NULL,
+    seq INT(11) NOT NULL,
+    user_id INT(11) NOT NULL,
+    recorded_at DATETIME(3) NOT NULL,
+    action VARCHAR(32) NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (game_id, seq, recorded_at),
+    KEY user_recorded (user_id, recorded_at)
+)
+-- Partitioned by month so old history can be archived or dropped a partition at a time.
+-- Add next month's partition ahead of time by splitting pmax, e.g.:
+--   ALTER TABLE game_events REORGANIZE PARTITION pmax INTO (
+--       PARTITION p2026_12 VALUES LESS THAN ('2027-01-01'), PARTITION pmax VALUES LESS THAN (MAXVALUE));
+PARTITION BY RANGE COLUMNS (recorded_at) (
+    PARTITION p2026_10 VALUES LESS THAN ('2026-11-01'),
+    PARTITION p2026_11 VALUES LESS THAN ('2026-12-01'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
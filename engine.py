@@ -0,0 +1,165 @@
+"""Pure ChronoQuest game rules, shared by the Flask routes and the headless simulator.
+
+Nothing here touches Flask, the session or the database. Every function that needs
+randomness takes an `rng` (the `random` module or a `random.Random`), so the same seed
+and the same sequence of player actions produce the same game on the web and offline.
+"""
+import random
+
+from badges import new_game_stats, game_stats
+from events import EventEngine
+from gamestate import GameState
+
+START_AIRPORT = 'EFHK'  # Helsinki-Vantaa Airport: start and finish of every game
+FUEL_TYPES = {"Aetherite": [8, 12], "Lumorin": [14, 18], "Voltash": [5, 8], "Noxalite": [11, 15], "Inferno": [1, 5]}
+TOTAL_SHARDS = 5
+FLUX_TO_CREDITS_RATE = 10  # 1 Fluxfire = 10 Credits
+CREDITS_TO_RANGE_RATE = 1  # 1 Credit = 1 Energy
+MIN_RANDOM_COST, MAX_RANDOM_COST = 20, 200
+DEFAULT_ENERGY_PER_KM = 0.06  # distance-aware mode
+MIN_TRAVEL_COST = 20
+
+# Travel outcomes returned by travel()
+NO_ENERGY = 'no_energy'
+HOME_LOCKED = 'home_locked'  # tried to return to EFHK without meeting the win requirements
+WIN = 'win'
+LOSE = 'lose'
+
+DEFAULT_EVENT_ENGINE = EventEngine()
+
+
+def new_game_state(username, rng=random):
+    """Create and return a fresh game state for a given username.
+
+    Randomly selects a fuel type and required flux to vary each new game.
+    """
+    chosen_fuel = rng.choice(list(FUEL_TYPES.keys()))
+    required_flux = rng.randint(FUEL_TYPES[chosen_fuel][0], FUEL_TYPES[chosen_fuel][1])
+
+    return GameState(
+        player_name=username,
+        credits=1000,
+        energy=1000,
+        current_location=START_AIRPORT,
+        fuel_to_make=chosen_fuel,
+        required_flux=required_flux,
+        # Per-game counters read by the badge rules
+        stats=new_game_stats(),
+    )
+
+
+def check_loss_conditions(gs):
+    """Return True when the game's special loss conditions are met.
+
+    Loss occurs when:
+      - credits <= 20 and energy == 0
+      OR
+      - credits == 0 and 10 <= energy <= 20
+    """
+    credits = gs.credits
+    energy = gs.energy
+    if credits <= 20 and energy == 0:
+        return True
+    if credits == 0 and 10 <= energy <= 20:
+        return True
+    return False
+
+
+def can_win(gs):
+    """True when returning to EFHK now would win: all shards and enough fluxfire."""
+    return gs.count_shards == TOTAL_SHARDS and gs.fluxfire >= gs.required_flux
+
+
+def random_travel_cost(origin, destination, rng=random):
+    """Classic travel cost: 20-200 energy regardless of geography."""
+    return rng.randint(MIN_RANDOM_COST, MAX_RANDOM_COST)
+
+
+def energy_cost_for_km(km, energy_per_km=DEFAULT_ENERGY_PER_KM):
+    """Distance-aware travel cost: energy per km flown, never below MIN_TRAVEL_COST."""
+    return max(MIN_TRAVEL_COST, int(round(km * energy_per_km)))
+
+
+def record_travel_stats(gs, origin, destination, events):
+    """Update the per-game counters the badge rules read after one hop."""
+    stats = game_stats(gs)
+    stats['travels'] += 1
+    stats['repeat_hop'] = origin == destination
+    stats['previous_action'] = stats['last_action']
+    stats['last_action'] = 'travel'
+    stats['bandit_hits'] += sum(1 for e in events if e['type'] == 'bandit')
+    stats['paradox_escapes'] += sum(1 for e in events if e['type'] == 'paradox_escaped')
+    stats['min_energy'] = min(stats['min_energy'], gs.energy)
+
+
+def travel(gs, icao, rng=random, cost_fn=random_travel_cost, event_engine=DEFAULT_EVENT_ENGINE):
+    """Apply one hop to `gs` in place: energy cost, arrival events and win/lose checks.
+
+    `cost_fn(origin, destination, rng)` prices the hop. Returns (events, outcome) where
+    outcome is None for an ordinary hop or one of NO_ENERGY, HOME_LOCKED, WIN, LOSE.
+    """
+    events = []
+
+    # Prevent travel if the player has no energy (cannot move)
+    if gs.energy <= 0:
+        return [{'type': 'no_energy', 'message': 'Cannot travel with 0 Energy. Must refuel.'}], NO_ENERGY
+
+    # Check for EFHK (home) win condition: all shards and enough fluxfire
+    if icao == START_AIRPORT:
+        if can_win(gs):
+            record_travel_stats(gs, gs.current_location, icao, [])
+            return [{'type': 'win', 'fuel': gs.fuel_to_make, 'required_flux': gs.required_flux}], WIN
+        return [{'type': 'efhk_requirements_not_met', 'required_flux': gs.required_flux}], HOME_LOCKED
+
+    # --- Standard Travel Logic (applies whether or not trapped in a paradox) ---
+
+    cost = cost_fn(gs.current_location, icao, rng)
+
+    # Deduct energy cost; if not enough, deplete energy to 0 and notify
+    if gs.energy < cost:
+        gs.energy = 0
+        events.append({'type': 'insufficient_range', 'message': 'Not enough range for full travel; range set to 0.'})
+    else:
+        gs.energy -= cost
+
+    # Update the player's current location
+    origin = gs.current_location
+    gs.current_location = icao
+
+    # Random events on arrival (phase-specific tables live in the event engine)
+    events.extend(event_engine.resolve(gs, rng))
+
+    record_travel_stats(gs, origin, icao, events)
+
+    return events, (LOSE if check_loss_conditions(gs) else None)
+
+
+def buy_credits(gs, flux_spend):
+    """Exchange fluxfire for credits. Returns an error message, or None on success."""
+    if not flux_spend or flux_spend <= 0:
+        return 'Invalid amount of Fluxfire.'
+    if gs.fluxfire < flux_spend:
+        return 'Not enough Fluxfire.'
+
+    credit_gain = flux_spend * FLUX_TO_CREDITS_RATE
+    gs.fluxfire -= flux_spend
+    gs.credits += credit_gain
+    stats = game_stats(gs)
+    stats['credits_bought'] += credit_gain
+    stats['last_action'] = 'buy_credits'
+    return None
+
+
+def buy_range(gs, credits_spend):
+    """Exchange credits for energy (range). Returns an error message, or None on success."""
+    if not credits_spend or credits_spend <= 0:
+        return 'Invalid amount of Credits.'
+    if gs.credits < credits_spend:
+        return 'Not enough Credits.'
+
+    gs.credits -= credits_spend
+    gs.energy += credits_spend * CREDITS_TO_RANGE_RATE
+    stats = game_stats(gs)
+    stats['range_bought'] += credits_spend
+    stats['last_action'] = 'buy_range'
+    return None
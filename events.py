@@ -0,0 +1,231 @@
+"""Data-driven arrival event engine used by the travel routes.
+
+Event behaviour lives in small handler functions registered by name; which events can
+happen, how likely they are and how many fire per arrival is pure data (a phase table),
+so weights can change per game phase or via a JSON file without touching code.
+"""
+import json
+import time
+import random
+
+# --- Default Phase Tables ---
+# 'normal': 1-3 distinct events per arrival, all equally likely.
+# 'paradox': while trapped, either a paradox coin or nothing (50/50).
+DEFAULT_PHASES = {
+    'normal': {
+        'draws': [1, 3],
+        'weights': {'bandit': 1, 'credits': 1, 'range': 1, 'fluxfire': 1, 'paradox': 1, 'shard': 1, 'nothing': 1},
+    },
+    'paradox': {
+        'draws': [1, 1],
+        'weights': {'paradox_coin': 1, 'nothing': 1},
+    },
+}
+
+EVENT_HANDLERS = {}
+
+
+def event_handler(name):
+    """Register `fn(gs, rng)` as the handler for event `name`; it returns a list of event dicts."""
+    def register(fn):
+        EVENT_HANDLERS[name] = fn
+        return fn
+    return register
+
+
+# --- Samplers ---
+
+class AliasTable:
+    """Walker/Vose alias table: O(1) weighted draws with replacement."""
+
+    def __init__(self, items, weights):
+        n = len(items)
+        total = float(sum(weights))
+        self.items = list(items)
+        self._prob = [0.0] * n
+        self._alias = [0] * n
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self._prob[s] = scaled[s]
+            self._alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in small + large:
+            self._prob[i] = 1.0
+
+    def draw(self, rng):
+        i = int(rng.random() * len(self._prob))
+        return self.items[i] if rng.random() < self._prob[i] else self.items[self._alias[i]]
+
+    def sample(self, rng, k):
+        """k=1 is the only without-replacement case an alias table can serve."""
+        return [self.draw(rng)] if k >= 1 else []
+
+
+class FenwickSampler:
+    """Weighted sampling without replacement over a precompiled Fenwick (binary indexed) tree.
+
+    The tree is built once; each call copies it (a flat list) and then every draw and
+    removal costs O(log n), instead of rebuilding cumulative sums per draw.
+    """
+
+    def __init__(self, items, weights):
+        self.items = list(items)
+        self._weights = [float(w) for w in weights]
+        n = len(self.items)
+        tree = [0.0] * (n + 1)
+        for i, w in enumerate(self._weights, 1):
+            tree[i] += w
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._total = sum(self._weights)
+        self._top = 1 << (n.bit_length() - 1) if n else 0
+
+    def sample(self, rng, k):
+        tree = self._tree[:]
+        weights = self._weights[:]
+        total = self._total
+        n = len(self.items)
+        picked = []
+        for _ in range(min(k, n)):
+            if total <= 0:
+                break
+            r = rng.random() * total
+            pos, step = 0, self._top
+            while step:
+                nxt = pos + step
+                if nxt <= n and tree[nxt] <= r:
+                    pos = nxt
+                    r -= tree[nxt]
+                step >>= 1
+            # Floating-point slack can land past the last live item; step back to one
+            while pos >= n or weights[pos] <= 0:
+                pos -= 1
+            picked.append(self.items[pos])
+            w = weights[pos]
+            weights[pos] = 0.0
+            total -= w
+            i = pos + 1
+            while i <= n:
+                tree[i] -= w
+                i += i & -i
+        return picked
+
+
+# --- Engine ---
+
+class EventEngine:
+    """Resolves arrival events for a game state from precompiled per-phase sampling tables."""
+
+    def __init__(self, phases=None, handlers=None):
+        self.handlers = EVENT_HANDLERS if handlers is None else handlers
+        self.phases = {}
+        for name, spec in (phases or DEFAULT_PHASES).items():
+            items = [ev for ev, w in spec['weights'].items() if w > 0]
+            unknown = [ev for ev in items if ev not in self.handlers]
+            if unknown:
+                raise ValueError(f"Phase '{name}' uses events without handlers: {', '.join(unknown)}")
+            weights = [spec['weights'][ev] for ev in items]
+            lo, hi = spec.get('draws', [1, 1])
+            # Single draws get the O(1) alias table; multi-draws need removal -> Fenwick tree
+            sampler = AliasTable(items, weights) if hi <= 1 else FenwickSampler(items, weights)
+            self.phases[name] = (sampler, lo, hi)
+
+    @classmethod
+    def from_file(cls, path):
+        """Build an engine from a JSON file shaped like DEFAULT_PHASES (missing phases use defaults)."""
+        with open(path, encoding='utf-8') as f:
+            phases = dict(DEFAULT_PHASES, **json.load(f))
+        return cls(phases)
+
+    @staticmethod
+    def phase_for(gs):
+        return 'paradox' if gs.paradox_active else 'normal'
+
+    def resolve(self, gs, rng=random):
+        """Apply this arrival's random events to `gs` in place and return the event dicts."""
+        sampler, lo, hi = self.phases[self.phase_for(gs)]
+        events = []
+        for ev in sampler.sample(rng, rng.randint(lo, hi)):
+            events.extend(self.handlers[ev](gs, rng))
+        return events
+
+
+# --- Event Handlers ---
+
+@event_handler('bandit')
+def _bandit(gs, rng):
+    # Bandit steals either credits or range (randomly chosen)
+    if rng.choice(['credits', 'range']) == 'credits':
+        loss_amount = rng.randint(20, 100)
+        gs.credits = max(0, gs.credits - loss_amount)
+        return [{'type': 'bandit', 'subtype': 'credits', 'amount': loss_amount}]
+    loss_amount = rng.randint(10, 100)
+    gs.energy = max(0, gs.energy - loss_amount)
+    return [{'type': 'bandit', 'subtype': 'range', 'amount': loss_amount}]
+
+
+@event_handler('credits')
+def _credits(gs, rng):
+    # Player gains credits
+    gain = rng.randint(10, 100)
+    gs.credits += gain
+    return [{'type': 'credits', 'amount': gain}]
+
+
+@event_handler('range')
+def _range(gs, rng):
+    # Player gains energy (range)
+    gain = rng.randint(10, 100)
+    gs.energy += gain
+    return [{'type': 'range', 'amount': gain}]
+
+
+@event_handler('fluxfire')
+def _fluxfire(gs, rng):
+    # Increment fluxfire
+    gs.fluxfire += 1
+    return [{'type': 'fluxfire'}]
+
+
+@event_handler('paradox')
+def _paradox(gs, rng):
+    # Activate paradox trap if not already active; if already trapped, treat as nothing
+    if gs.paradox_active:
+        return [{'type': 'nothing'}]
+    gs.paradox_active = True
+    gs.paradox_coins = 0
+    gs.paradox_start = int(time.time() * 1000)
+    return [{'type': 'paradox'}]
+
+
+@event_handler('shard')
+def _shard(gs, rng):
+    # Give the next uncollected shard (1..5) if available; otherwise nothing
+    shard_id = next((i for i in range(1, 6) if not gs.has_shard(i)), None)
+    if shard_id is None:
+        return [{'type': 'nothing'}]
+    gs.add_shard(shard_id)
+    return [{'type': 'shard', 'shard': shard_id}]
+
+
+@event_handler('paradox_coin')
+def _paradox_coin(gs, rng):
+    # Trapped: grant a paradox coin; escape the trap after collecting 3
+    gs.paradox_coins += 1
+    events = [{'type': 'paradox_coin', 'coins': gs.paradox_coins}]
+    if gs.paradox_coins >= 3:
+        gs.paradox_active = False
+        gs.paradox_coins = 0
+        events.append({'type': 'paradox_escaped'})
+    return events
+
+
+@event_handler('nothing')
+def _nothing(gs, rng):
+    return [{'type': 'nothing'}]
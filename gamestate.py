@@ -0,0 +1,242 @@
+"""Typed game state with a compact, versioned binary encoding.
+
+A GameState is what the game rules (engine.py, events.py, badges.py) mutate. It is stored in
+the session as `to_bytes()` and in users.game_state_save as `encode_save()` (the same bytes,
+base64 text, since the column is LONGTEXT). API responses use `to_dict()`, which keeps the
+original JSON shape; `to_full_dict()` adds the badge counters for internal records (the event
+journal). `GameState.load()` also reads the JSON dicts written before this format
+existed, so old saves and sessions migrate transparently on first read.
+"""
+import json
+import base64
+import struct
+
+# Binary layout, version 3 (little-endian):
+#   header  B version, i credits, i energy, i fluxfire, i required_flux, B shard_mask,
+#           B flags, H paradox_coins, q paradox_start (epoch ms)
+#   journal I seq (steps journaled so far; absent in version 1)
+#   stats   6 x i (STATS_INT_FIELDS) when FLAG_STATS is set
+#   strings H length + UTF-8 bytes each for player_name, current_location, fuel_to_make,
+#           game_id (not in version 1) and, with stats, last_action and previous_action
+#           (length NONE_STR = None). Versions 1 and 2 used a B length (NONE_STR_V2 = None),
+#           which could not hold a 255-character (or long multibyte) username.
+FORMAT_VERSION = 3
+_HEADER = struct.Struct('<BiiiiBBHq')
+_JOURNAL = struct.Struct('<I')
+_STATS = struct.Struct('<6i')
+_STR_LEN = struct.Struct('<H')
+
+FLAG_PARADOX_ACTIVE = 0x01
+FLAG_STATS = 0x02
+FLAG_REPEAT_HOP = 0x04
+
+NONE_STR = 0xFFFF
+NONE_STR_V2 = 0xFF
+
+# Integer per-game counters (see badges.new_game_stats), in encoding order
+STATS_INT_FIELDS = ('travels', 'range_bought', 'credits_bought', 'bandit_hits', 'paradox_escapes', 'min_energy')
+
+
+class GameState:
+    """One in-progress game. Shards are a bitmask (bit i-1 = shard i); paradox fields are inline."""
+
+    __slots__ = ('player_name', 'credits', 'energy', 'shard_mask', 'current_location', 'fluxfire',
+                 'paradox_active', 'paradox_coins', 'paradox_start', 'fuel_to_make', 'required_flux', 'stats',
+                 'game_id', 'seq')
+
+    def __init__(self, player_name, credits, energy, current_location, fuel_to_make, required_flux,
+                 fluxfire=0, shard_mask=0, paradox_active=False, paradox_coins=0, paradox_start=0, stats=None,
+                 game_id=None, seq=0):
+        self.player_name = player_name
+        self.credits = credits
+        self.energy = energy
+        self.shard_mask = shard_mask
+        self.current_location = current_location
+        self.fluxfire = fluxfire
+        self.paradox_active = paradox_active
+        self.paradox_coins = paradox_coins
+        self.paradox_start = paradox_start
+        self.fuel_to_make = fuel_to_make
+        self.required_flux = required_flux
+        # Per-game counters owned by badges.py (None for games saved before they existed)
+        self.stats = stats
+        # Event journal position (journal.py): the game's id, assigned on its first journaled step
+        self.game_id = game_id
+        self.seq = seq
+
+    # --- Shards ---
+
+    def has_shard(self, shard_id):
+        return bool(self.shard_mask >> (shard_id - 1) & 1)
+
+    def add_shard(self, shard_id):
+        self.shard_mask |= 1 << (shard_id - 1)
+
+    @property
+    def count_shards(self):
+        return bin(self.shard_mask).count('1')
+
+    # --- Copies and equality ---
+
+    def copy(self):
+        clone = GameState.__new__(GameState)
+        for name in self.__slots__:
+            setattr(clone, name, getattr(self, name))
+        if self.stats is not None:
+            clone.stats = dict(self.stats)
+        return clone
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def __eq__(self, other):
+        if not isinstance(other, GameState):
+            return NotImplemented
+        return all(getattr(self, n) == getattr(other, n) for n in self.__slots__)
+
+    def __repr__(self):
+        return f"GameState({self.player_name!r}, at={self.current_location}, energy={self.energy})"
+
+    # --- JSON views (API responses, journal records and legacy saves) ---
+
+    def to_dict(self):
+        """The JSON shape the API has always returned (badge counters stay server-side)."""
+        return {
+            'playerName': self.player_name,
+            'credits': self.credits,
+            'energy': self.energy,
+            'shards': {str(i): True for i in range(1, self.shard_mask.bit_length() + 1) if self.has_shard(i)},
+            'countShards': self.count_shards,
+            'currentLocation': self.current_location,
+            'fluxfire': self.fluxfire,
+            'paradox': {'active': self.paradox_active, 'coins': self.paradox_coins, 'startTime': self.paradox_start},
+            'fuel_to_make': self.fuel_to_make,
+            'required_flux': self.required_flux,
+        }
+
+    def to_full_dict(self):
+        """to_dict() plus the per-game badge counters: everything from_dict() needs to rebuild the state."""
+        data = self.to_dict()
+        data['stats'] = dict(self.stats) if self.stats is not None else None
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a state from the legacy dict (JSON saves and cookie sessions)."""
+        paradox = data.get('paradox') or {}
+        mask = 0
+        for key, owned in (data.get('shards') or {}).items():
+            if owned:
+                mask |= 1 << (int(key) - 1)
+        stats = data.get('stats')
+        return cls(
+            player_name=data.get('playerName', ''),
+            credits=data.get('credits', 0),
+            energy=data.get('energy', 0),
+            current_location=data.get('currentLocation', 'EFHK'),
+            fuel_to_make=data.get('fuel_to_make', ''),
+            required_flux=data.get('required_flux', 0),
+            fluxfire=data.get('fluxfire', 0),
+            shard_mask=mask,
+            paradox_active=bool(paradox.get('active', False)),
+            paradox_coins=paradox.get('coins', 0),
+            paradox_start=paradox.get('startTime', 0),
+            stats=dict(stats) if stats is not None else None,
+        )
+
+    # --- Binary encoding ---
+
+    def to_bytes(self):
+        stats = self.stats
+        flags = (FLAG_PARADOX_ACTIVE if self.paradox_active else 0) | (FLAG_STATS if stats is not None else 0)
+        if stats is not None and stats.get('repeat_hop'):
+            flags |= FLAG_REPEAT_HOP
+        parts = [_HEADER.pack(FORMAT_VERSION, self.credits, self.energy, self.fluxfire, self.required_flux,
+                              self.shard_mask, flags, self.paradox_coins, self.paradox_start),
+                 _JOURNAL.pack(self.seq)]
+        strings = [self.player_name, self.current_location, self.fuel_to_make, self.game_id]
+        if stats is not None:
+            parts.append(_STATS.pack(*(stats.get(f, 0) for f in STATS_INT_FIELDS)))
+            strings += [stats.get('last_action'), stats.get('previous_action')]
+        for text in strings:
+            if text is None:
+                parts.append(_STR_LEN.pack(NONE_STR))
+            else:
+                raw = text.encode('utf-8')
+                if len(raw) >= NONE_STR:
+                    raise ValueError(f"String field too long to encode: {text[:20]!r}...")
+                parts.append(_STR_LEN.pack(len(raw)) + raw)
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        version = data[0] if data else None
+        if version not in (1, 2, FORMAT_VERSION):
+            raise ValueError(f"Unsupported game state format version {version!r}")
+        (_, credits, energy, fluxfire, required_flux, shard_mask, flags,
+         paradox_coins, paradox_start) = _HEADER.unpack_from(data)
+        offset = _HEADER.size
+        seq = 0
+        if version >= 2:
+            seq, = _JOURNAL.unpack_from(data, offset)
+            offset += _JOURNAL.size
+        counters = None
+        if flags & FLAG_STATS:
+            counters = _STATS.unpack_from(data, offset)
+            offset += _STATS.size
+
+        strings = []
+        wide = version >= 3
+        none_len = NONE_STR if wide else NONE_STR_V2
+        for _ in range((4 if version >= 2 else 3) + (2 if counters is not None else 0)):
+            if wide:
+                length, = _STR_LEN.unpack_from(data, offset)
+                offset += _STR_LEN.size
+            else:
+                length = data[offset]
+                offset += 1
+            if length == none_len:
+                strings.append(None)
+            else:
+                strings.append(data[offset:offset + length].decode('utf-8'))
+                offset += length
+
+        if version < 2:
+            strings.insert(3, None)  # no game_id
+        stats = None
+        if counters is not None:
+            stats = dict(zip(STATS_INT_FIELDS, counters))
+            stats['last_action'] = strings[4]
+            stats['previous_action'] = strings[5]
+            stats['repeat_hop'] = bool(flags & FLAG_REPEAT_HOP)
+        return cls(strings[0], credits, energy, strings[1], strings[2], required_flux, fluxfire=fluxfire,
+                   shard_mask=shard_mask, paradox_active=bool(flags & FLAG_PARADOX_ACTIVE),
+                   paradox_coins=paradox_coins, paradox_start=paradox_start, stats=stats,
+                   game_id=strings[3], seq=seq)
+
+    @classmethod
+    def load(cls, value):
+        """Accept any stored form: GameState, binary, base64 save text, legacy JSON text or dict."""
+        if value is None or isinstance(value, GameState):
+            return value
+        if isinstance(value, (bytes, bytearray)):
+            return cls.from_bytes(bytes(value))
+        if isinstance(value, dict):
+            return cls.from_dict(value)
+        return decode_save(value)
+
+
+def encode_save(gs):
+    """Text for users.game_state_save: base64 of to_bytes() (None for no save)."""
+    return base64.b64encode(gs.to_bytes()).decode('ascii') if gs is not None else None
+
+
+def decode_save(text):
+    """Inverse of encode_save(); JSON saves from before the binary format are migrated."""
+    if not text:
+        return None
+    if text.lstrip().startswith('{'):
+        return GameState.from_dict(json.loads(text))
+    return GameState.from_bytes(base64.b64decode(text))
@@ -0,0 +1,155 @@
+"""Great-circle helpers shared by the airport catalog and the game routes."""
+import heapq
+from math import radians, sin, cos, sqrt, atan2
+
+try:
+    # Optional: vectorized path for large catalogs. Everything works without it.
+    import numpy as np
+except ImportError:
+    np = None
+
+R = 6371  # Earth radius in kilometers
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Return the great-circle distance (float km) between two lat/lon points."""
+    lat1, lon1, lat2, lon2 = radians(lat1), radians(lon1), radians(lat2), radians(lon2)
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return R * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+
+def batch_distances(lats, lons, origin_lat, origin_lon):
+    """Return whole-kilometre distances from the origin to every (lat, lon) pair at once.
+
+    Uses NumPy array math when available and a pure-Python loop otherwise. Distances are
+    rounded down like `calculate_distance` so both paths agree with the per-row helper.
+    """
+    if np is not None:
+        lat = np.radians(np.asarray(lats, dtype=np.float64))
+        lon = np.radians(np.asarray(lons, dtype=np.float64))
+        lat0 = np.radians(origin_lat)
+        lon0 = np.radians(origin_lon)
+        a = np.sin((lat - lat0) / 2) ** 2 + np.cos(lat0) * np.cos(lat) * np.sin((lon - lon0) / 2) ** 2
+        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+        return (R * c).astype(np.int64).tolist()
+
+    lat0 = radians(origin_lat)
+    lon0 = radians(origin_lon)
+    cos_lat0 = cos(lat0)
+    out = []
+    for lat, lon in zip(lats, lons):
+        lat = radians(lat)
+        a = sin((lat - lat0) / 2) ** 2 + cos_lat0 * cos(lat) * sin((radians(lon) - lon0) / 2) ** 2
+        out.append(int(R * 2 * atan2(sqrt(a), sqrt(1 - a))))
+    return out
+
+
+# --- Spatial Index ---
+
+def to_unit_vector(lat, lon):
+    """Return the (x, y, z) point on the unit sphere for a lat/lon in degrees."""
+    lat, lon = radians(lat), radians(lon)
+    return (cos(lat) * cos(lon), cos(lat) * sin(lon), sin(lat))
+
+
+def chord_for_km(km):
+    """Convert a great-circle distance (km) to the straight-line chord on the unit sphere."""
+    return 2 * sin(min(km / R, 3.141592653589793) / 2)
+
+
+def km_for_chord(chord):
+    """Inverse of chord_for_km."""
+    return R * 2 * atan2(chord / 2, sqrt(max(0.0, 1 - (chord / 2) ** 2)))
+
+
+class SpatialIndex:
+    """Static k-d tree over points on the unit sphere.
+
+    Euclidean chord length is monotonic in great-circle distance, so nearest-neighbour and
+    radius queries in 3-D give exact great-circle answers with O(log n) average cost.
+    Items are arbitrary payloads (e.g. airport dicts) supplied with their lat/lon.
+    """
+
+    _LEAF_SIZE = 8
+
+    def __init__(self, items, latlons):
+        self.items = list(items)
+        self._points = [to_unit_vector(lat, lon) for lat, lon in latlons]
+        # Node layout: (axis, split, left, right) for inner nodes, (None, indices) for leaves
+        self._root = self._build(list(range(len(self._points)))) if self._points else None
+
+    def __len__(self):
+        return len(self.items)
+
+    def _build(self, idx):
+        if len(idx) <= self._LEAF_SIZE:
+            return (None, idx)
+        pts = self._points
+        # Split on the axis with the widest spread for a better-balanced tree
+        spreads = [max(pts[i][a] for i in idx) - min(pts[i][a] for i in idx) for a in range(3)]
+        axis = spreads.index(max(spreads))
+        idx.sort(key=lambda i: pts[i][axis])
+        mid = len(idx) // 2
+        return (axis, pts[idx[mid]][axis], self._build(idx[:mid]), self._build(idx[mid:]))
+
+    @staticmethod
+    def _dist2(p, q):
+        return (p[0] - q[0]) ** 2 + (p[1] - q[1]) ** 2 + (p[2] - q[2]) ** 2
+
+    def nearest(self, lat, lon, k=5, exclude=None):
+        """Return up to k (item, km) pairs closest to lat/lon, nearest first.
+
+        `exclude` is an optional predicate on items (e.g. to skip the query airport itself).
+        """
+        if self._root is None or k <= 0:
+            return []
+        q = to_unit_vector(lat, lon)
+        heap = []  # max-heap of (-dist2, index) holding the k best so far
+
+        def visit(node):
+            if node[0] is None:
+                for i in node[1]:
+                    if exclude is not None and exclude(self.items[i]):
+                        continue
+                    d2 = self._dist2(q, self._points[i])
+                    if len(heap) < k:
+                        heapq.heappush(heap, (-d2, i))
+                    elif d2 < -heap[0][0]:
+                        heapq.heapreplace(heap, (-d2, i))
+                return
+            axis, split, left, right = node
+            diff = q[axis] - split
+            near, far = (left, right) if diff < 0 else (right, left)
+            visit(near)
+            if len(heap) < k or diff * diff < -heap[0][0]:
+                visit(far)
+
+        visit(self._root)
+        return [(self.items[i], km_for_chord(sqrt(-nd2))) for nd2, i in sorted(heap, reverse=True)]
+
+    def within(self, lat, lon, radius_km, exclude=None):
+        """Return (item, km) pairs within radius_km of lat/lon, nearest first."""
+        if self._root is None or radius_km < 0:
+            return []
+        q = to_unit_vector(lat, lon)
+        r2 = chord_for_km(radius_km) ** 2
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node[0] is None:
+                for i in node[1]:
+                    if exclude is not None and exclude(self.items[i]):
+                        continue
+                    d2 = self._dist2(q, self._points[i])
+                    if d2 <= r2:
+                        found.append((d2, i))
+                continue
+            axis, split, left, right = node
+            diff = q[axis] - split
+            if diff < 0 or diff * diff <= r2:
+                stack.append(left)
+            if diff >= 0 or diff * diff <= r2:
+                stack.append(right)
+        found.sort()
+        return [(self.items[i], km_for_chord(sqrt(d2))) for d2, i in found]
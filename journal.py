@@ -0,0 +1,170 @@
+"""Append-only journal of game steps, written in batches off the request path.
+
+Every step a player takes (travel, buying credits or range) becomes one record holding the
+action, the events it produced and the fields it changed. The first record of a game
+("start") holds the full state it began from, so `replay()` can rebuild the state after any
+step from the records alone, without re-running the random rules.
+
+Records are buffered in memory and handed to `writer` by a background thread in batches of
+up to `batch_size`, at most `max_delay` seconds after they were appended.
+"""
+import os
+import sys
+import json
+import atexit
+import secrets
+import threading
+from collections import deque
+from datetime import datetime
+
+from gamestate import GameState
+
+START = 'start'
+# Fields a step may change; `seq` is the journal position itself and `game_id` never changes
+STEP_FIELDS = tuple(f for f in GameState.__slots__ if f not in ('stats', 'game_id', 'seq'))
+
+
+def new_game_id():
+    return secrets.token_urlsafe(16)  # 22 characters
+
+
+def _compact_events(events):
+    # Messages are presentation only; the type and amounts are what analytics needs
+    return [{k: v for k, v in e.items() if k != 'message'} for e in events]
+
+
+def begin(gs):
+    """Give `gs` a game id and return its "start" record (the full state the journal replays from)."""
+    gs.game_id = new_game_id()
+    gs.seq = 0
+    return (gs.game_id, 0, START, {'state': gs.to_full_dict()})
+
+
+def step(before, after, action, args=None, events=(), outcome=None):
+    """Advance `after.seq` and return the record of one step that turned `before` into `after`."""
+    changed = {f: getattr(after, f) for f in STEP_FIELDS if getattr(before, f) != getattr(after, f)}
+    payload = {'args': args or {}, 'events': _compact_events(events), 'set': changed}
+    if after.stats is not None and after.stats != before.stats:
+        old = before.stats or {}
+        payload['stats'] = {k: v for k, v in after.stats.items() if old.get(k) != v}
+    if outcome:
+        payload['outcome'] = outcome
+    after.seq += 1
+    return (after.game_id, after.seq, action, payload)
+
+
+def replay(records, upto=None):
+    """Rebuild a game from its records (any order): the state after step `upto`, or the latest.
+
+    `records` are (seq, action, payload) tuples. Two concurrent requests on the same session both
+    step from the same seq, so a seq can have more than one record (the table key includes
+    recorded_at); only the first record seen for each seq is applied. Returns None if the start
+    record is missing.
+    """
+    records = sorted({r[0]: r for r in reversed(list(records))}.values(), key=lambda r: r[0])
+    if not records or records[0][1] != START:
+        return None
+    gs = GameState.from_dict(records[0][2]['state'])
+    for seq, action, payload in records[1:]:
+        if upto is not None and seq > upto:
+            break
+        for field, value in payload.get('set', {}).items():
+            setattr(gs, field, value)
+        if 'stats' in payload:
+            gs.stats = dict(gs.stats or {}, **payload['stats'])
+        gs.seq = seq
+    return gs
+
+
+class EventJournal:
+    """Buffers journal rows and writes them in batches from a background thread.
+
+    `writer(rows)` receives a list of (game_id, seq, user_id, recorded_at, action, payload
+    JSON) tuples and returns True on success; failed batches are retried on the next tick.
+    At most `max_pending` rows are held while the database is unreachable; beyond that the
+    oldest are dropped (and counted in `dropped`).
+    """
+
+    def __init__(self, writer, max_delay=1.0, batch_size=500, max_pending=100000, name='event-journal'):
+        self._writer = writer
+        self.max_delay = max_delay
+        self.batch_size = max(1, batch_size)
+        self.max_pending = max_pending
+        self.name = name
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # keeps batches in append order
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stopping = False
+        self._pid = os.getpid()
+        self.dropped = 0
+        atexit.register(self.stop)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def append(self, user_id, records):
+        """Queue records from begin()/step() for `user_id`."""
+        now = datetime.now()
+        rows = [(game_id, seq, user_id, now, action, json.dumps(payload, separators=(',', ':')))
+                for game_id, seq, action, payload in records]
+        with self._lock:
+            self._pending.extend(rows)
+            overflow = len(self._pending) - self.max_pending
+            for _ in range(max(0, overflow)):
+                self._pending.popleft()
+            self.dropped += max(0, overflow)
+        if overflow > 0:
+            print(f"Warning: {self.name} full, dropped {overflow} oldest records", file=sys.stderr)
+        if self.max_delay <= 0:
+            self.flush()
+        else:
+            self._ensure_thread()
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.set()
+
+    def flush(self):
+        """Synchronously write everything buffered. Returns True on success."""
+        with self._write_lock:
+            while True:
+                with self._lock:
+                    batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                if not batch:
+                    return True
+                if not self._write(batch):
+                    with self._lock:
+                        self._pending.extendleft(reversed(batch))
+                    return False
+
+    def _write(self, batch):
+        try:
+            return bool(self._writer(batch))
+        except Exception as e:
+            print(f"Error: {self.name} flush failed: {e}", file=sys.stderr)
+            return False
+
+    def _ensure_thread(self):
+        if self._pid != os.getpid():
+            # Forked worker: the parent's flusher thread does not exist here
+            self._thread = None
+            self._pid = os.getpid()
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stopping = False
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.max_delay)
+            self._wakeup.clear()
+            if self._pending:
+                self.flush()
+
+    def stop(self):
+        """Stop the flusher thread and write everything still buffered (used at shutdown)."""
+        self._stopping = True
+        self._wakeup.set()
+        self.flush()
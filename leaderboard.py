@@ -0,0 +1,272 @@
+"""In-memory leaderboard kept in rank order by indexable skip lists.
+
+Each ordering (total wins; win rate among players with enough games) is a skip list whose
+links also store how many entries they jump over, so inserting, removing, finding a
+player's rank and fetching the entry at a given rank are all O(log n). The board is
+rebuilt from the users table once per `refresh_interval` and kept current in between by
+`record_result()` calls after each finished game.
+"""
+import sys
+import math
+import time
+import random
+import threading
+
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, levels):
+        self.key = key
+        self.next = [None] * levels
+        # width[i]: how many positions next[i] is ahead of this node
+        self.width = [1] * levels
+
+
+class IndexableSkipList:
+    """Sorted collection of unique, comparable keys with O(log n) rank and index lookups."""
+
+    def __init__(self, expected_size=1 << 20, rng=None):
+        self.max_levels = max(1, int(math.log2(max(2, expected_size))))
+        self._rng = rng or random.Random()
+        self._tail = _Node(None, self.max_levels)
+        self._head = _Node(None, self.max_levels)
+        self._head.next = [self._tail] * self.max_levels
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _random_levels(self):
+        # Geometric: each extra level with probability 1/2
+        return min(self.max_levels, 1 - int(math.log2(1.0 - self._rng.random())))
+
+    def _find(self, key):
+        """Per level, the last node before `key` and the positions skipped to reach it."""
+        chain = [None] * self.max_levels
+        steps = [0] * self.max_levels
+        node = self._head
+        tail = self._tail
+        for level in reversed(range(self.max_levels)):
+            while node.next[level] is not tail and node.next[level].key < key:
+                steps[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+        return chain, steps
+
+    def insert(self, key):
+        chain, steps_at_level = self._find(key)
+        levels = self._random_levels()
+        node = _Node(key, levels)
+        steps = 0
+        for level in range(levels):
+            prev = chain[level]
+            node.next[level] = prev.next[level]
+            prev.next[level] = node
+            node.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, self.max_levels):
+            chain[level].width[level] += 1
+        self._size += 1
+
+    def remove(self, key):
+        chain, _ = self._find(key)
+        node = chain[0].next[0]
+        if node is self._tail or node.key != key:
+            raise KeyError(key)
+        for level in range(len(node.next)):
+            prev = chain[level]
+            prev.width[level] += node.width[level] - 1
+            prev.next[level] = node.next[level]
+        for level in range(len(node.next), self.max_levels):
+            chain[level].width[level] -= 1
+        self._size -= 1
+
+    def rank(self, key):
+        """0-based position of `key`, or None if it is not present."""
+        node = self._head
+        tail = self._tail
+        position = 0
+        for level in reversed(range(self.max_levels)):
+            while node.next[level] is not tail and node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        node = node.next[0]
+        return position if node is not tail and node.key == key else None
+
+    def _node_at(self, index):
+        node = self._head
+        remaining = index + 1
+        for level in reversed(range(self.max_levels)):
+            while node.next[level] is not self._tail and node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        return node
+
+    def __getitem__(self, index):
+        if not 0 <= index < self._size:
+            raise IndexError(index)
+        return self._node_at(index).key
+
+    def slice(self, start, count):
+        """Keys at positions start .. start+count-1 (clipped to the list)."""
+        if start >= self._size or count <= 0:
+            return []
+        node = self._node_at(max(0, start))
+        keys = []
+        while node is not self._tail and len(keys) < count:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+    def __iter__(self):
+        node = self._head.next[0]
+        while node is not self._tail:
+            yield node.key
+            node = node.next[0]
+
+
+class Leaderboard:
+    """Ranks players by wins and by win rate; thread-safe.
+
+    Wins order: most wins, then fewest losses, then name. Win-rate order (players with at
+    least `min_games` finished games): highest rate, then most wins, then name.
+    """
+
+    def __init__(self, loader, min_games=5, refresh_interval=300):
+        self._loader = loader  # () -> iterable of (username, wins, losses, played)
+        self.min_games = min_games
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._entries = {}  # casefolded name -> (display name, wins, losses, played)
+        self._by_wins = IndexableSkipList()
+        self._by_rate = IndexableSkipList()
+        self._loaded_at = None
+        self._refreshing = False
+        self._reloading = False  # refresh() is reading the table
+
+    # --- Keys ---
+
+    @staticmethod
+    def _wins_key(key, entry):
+        _, wins, losses, _ = entry
+        return (-wins, losses, key)
+
+    def _rate_key(self, key, entry):
+        _, wins, _, played = entry
+        if played < self.min_games:
+            return None
+        return (-wins / played, -wins, key)
+
+    # --- Maintenance ---
+
+    def _put(self, key, entry):
+        old = self._entries.get(key)
+        if old is not None:
+            self._by_wins.remove(self._wins_key(key, old))
+            rate_key = self._rate_key(key, old)
+            if rate_key is not None:
+                self._by_rate.remove(rate_key)
+        self._entries[key] = entry
+        self._by_wins.insert(self._wins_key(key, entry))
+        rate_key = self._rate_key(key, entry)
+        if rate_key is not None:
+            self._by_rate.insert(rate_key)
+
+    def record_result(self, username, win):
+        """Add one finished game to the player's totals (call after the counter UPDATE commits).
+
+        The counters are incremented in place in the database, so only the delta is known
+        here. A game that finishes while refresh() is reading the table is left to the
+        reload (or the next one), since the rows read may or may not include it yet.
+        """
+        key = username.casefold()
+        with self._lock:
+            if self._loaded_at is None or self._reloading:
+                return
+            name, wins, losses, played = self._entries.get(key, (username, 0, 0, 0))
+            self._put(key, (name, wins + bool(win), losses + (not win), played + 1))
+
+    def refresh(self):
+        """Rebuild from the loader (the users table). Readers keep the old board meanwhile."""
+        with self._lock:
+            self._reloading = True
+        try:
+            rows = list(self._loader())
+        except Exception:
+            with self._lock:
+                self._reloading = False
+            raise
+        entries = {}
+        by_wins = IndexableSkipList()
+        by_rate = IndexableSkipList()
+        for username, wins, losses, played in rows:
+            if played <= 0:
+                continue
+            key = username.casefold()
+            entry = (username, wins, losses, played)
+            entries[key] = entry
+            by_wins.insert(self._wins_key(key, entry))
+            rate_key = self._rate_key(key, entry)
+            if rate_key is not None:
+                by_rate.insert(rate_key)
+        with self._lock:
+            self._entries, self._by_wins, self._by_rate = entries, by_wins, by_rate
+            self._reloading = False
+            self._loaded_at = time.monotonic()
+
+    def ensure_fresh(self):
+        """Load on first use and resync every refresh_interval (other workers' games, missed updates).
+
+        The first load blocks; later refreshes run in one caller while the rest read the old board.
+        """
+        now = time.monotonic()
+        with self._lock:
+            loaded_at = self._loaded_at
+            if loaded_at is not None and (self.refresh_interval <= 0 or now - loaded_at < self.refresh_interval):
+                return
+            if loaded_at is not None and self._refreshing:
+                return
+            self._refreshing = True
+        try:
+            self.refresh()
+        except Exception as e:
+            # Keep serving the previous board; the next call retries
+            print(f"Leaderboard refresh failed: {e}", file=sys.stderr)
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    # --- Queries ---
+
+    def _row(self, position, key):
+        name, wins, losses, played = self._entries[key]
+        return {'rank': position + 1, 'name': name, 'wins': wins, 'losses': losses, 'played': played,
+                'winRate': round(wins / played, 4)}
+
+    def top_by_wins(self, limit=10, offset=0):
+        """Returns (total ranked players, rows for ranks offset+1 .. offset+limit)."""
+        with self._lock:
+            keys = self._by_wins.slice(offset, limit)
+            return len(self._by_wins), [self._row(offset + i, k[-1]) for i, k in enumerate(keys)]
+
+    def top_by_rate(self, limit=10, offset=0):
+        with self._lock:
+            keys = self._by_rate.slice(offset, limit)
+            return len(self._by_rate), [self._row(offset + i, k[-1]) for i, k in enumerate(keys)]
+
+    def rank_of(self, username):
+        """The player's 1-based ranks (None where unranked) and the size of each board."""
+        key = username.casefold()
+        with self._lock:
+            entry = self._entries.get(key)
+            result = {'wins': None, 'winRate': None,
+                      'totalByWins': len(self._by_wins), 'totalByWinRate': len(self._by_rate)}
+            if entry is None:
+                return None, result
+            result['wins'] = self._by_wins.rank(self._wins_key(key, entry)) + 1
+            rate_key = self._rate_key(key, entry)
+            if rate_key is not None:
+                result['winRate'] = self._by_rate.rank(rate_key) + 1
+            return self._row(result['wins'] - 1, key), result
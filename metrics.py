@@ -0,0 +1,248 @@
+"""In-process metrics rendered in the Prometheus text format (served at /metrics).
+
+Counters and histograms are plain dicts keyed by label values, each guarded by its own lock,
+so recording a sample costs a dict lookup and an addition. Gauges are callbacks read at
+scrape time. Every worker process keeps (and exposes) its own numbers; Prometheus sums them.
+
+The DB layer reports through `observe_query`, which also writes the slow-query log.
+"""
+import os
+import re
+import sys
+import time
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+
+# --- Metrics Configuration ---
+# Set CHRONO_METRICS=0 to skip all instrumentation (and 404 on /metrics)
+METRICS_ENABLED = os.environ.get('CHRONO_METRICS', '1') != '0'
+# Statements slower than this (milliseconds) are written to stderr; 0 disables the log
+SLOW_QUERY_MS = float(os.environ.get('CHRONO_SLOW_QUERY_MS', '200'))
+
+# Seconds; spans sub-millisecond cache hits to multi-second stalls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label combination."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}' for k, v in items]
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label combination (plus _sum and _count)."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [per-bucket counts (last is +Inf), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, (list(counts), total)) for k, (counts, total) in self._series.items())
+        lines = []
+        for labels, (counts, total) in items:
+            running = 0
+            for bound, n in zip(self.buckets + (float('inf'),), counts):
+                running += n
+                le = _format_labels(self.labelnames, labels, f'le="{_format_value(bound)}"')
+                lines.append(f'{self.name}_bucket{le} {running}')
+            plain = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{plain} {_format_value(total)}')
+            lines.append(f'{self.name}_count{plain} {running}')
+        return lines
+
+
+class Gauge:
+    """Value read from `fn()` at scrape time; `fn` may return a number or {labels tuple: number}."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, fn, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._fn = fn
+
+    def render(self):
+        value = self._fn()
+        items = sorted(value.items()) if isinstance(value, dict) else [((), value)]
+        return [f'{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}' for k, v in items]
+
+
+class Registry:
+    """Named collection of metrics, rendered together for a scrape."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None and not isinstance(metric, Gauge):
+                return existing  # re-imported module: keep the series already collected
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def gauge(self, name, help_text, fn, labelnames=()):
+        return self._add(Gauge(name, help_text, fn, labelnames))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                body = metric.render()
+            except Exception as e:
+                print(f"Error collecting metric {metric.name}: {e}", file=sys.stderr)
+                continue
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(body)
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# --- HTTP ---
+HTTP_REQUESTS = REGISTRY.counter('chrono_http_requests_total', 'HTTP requests by route, method and status.',
+                                 ('route', 'method', 'status'))
+HTTP_LATENCY = REGISTRY.histogram('chrono_http_request_duration_seconds',
+                                  'Time from the first before_request hook to the final after_request hook.',
+                                  ('route', 'method'))
+
+# --- Database ---
+DB_QUERIES = REGISTRY.histogram('chrono_db_query_duration_seconds',
+                                'Statement execution time by statement shape (literals and IN lists collapsed).',
+                                ('statement',))
+DB_ERRORS = REGISTRY.counter('chrono_db_errors_total', 'Database errors by operation.', ('operation',))
+DB_CONNECTIONS_OPENED = REGISTRY.counter('chrono_db_connections_opened_total', 'Connections opened to MariaDB.')
+DB_CONNECTIONS_CLOSED = REGISTRY.counter('chrono_db_connections_closed_total', 'Connections closed by the pool.')
+DB_CHECKOUT_WAIT = REGISTRY.histogram('chrono_db_pool_checkout_seconds',
+                                      'Time spent obtaining a pooled connection (including reconnects).')
+SLOW_QUERIES = REGISTRY.counter('chrono_db_slow_queries_total',
+                                'Statements slower than CHRONO_SLOW_QUERY_MS.', ('statement',))
+
+
+_SPACE = re.compile(r'\s+')
+_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))+\s*\)')
+
+
+@lru_cache(maxsize=1024)
+def statement_shape(query):
+    """Normalized statement used as a metric label: one line, literals -> ?, IN (...) lists collapsed."""
+    shape = _SPACE.sub(' ', query).strip()
+    shape = _LITERAL.sub('?', shape)
+    shape = _IN_LIST.sub('(...)', shape)
+    return shape[:200]
+
+
+def observe_query(query, seconds):
+    """Record one executed statement; logs it when it crossed the slow-query threshold."""
+    shape = statement_shape(query)
+    DB_QUERIES.observe(seconds, shape)
+    if SLOW_QUERY_MS and seconds * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.inc(shape)
+        print(f"Slow query ({seconds * 1000:.1f} ms): {shape}", file=sys.stderr)
+
+
+class TimedCursor:
+    """Cursor proxy timing execute()/executemany(); everything else passes straight through."""
+
+    __slots__ = ('_cursor',)
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(query, *args, **kwargs)
+        finally:
+            observe_query(query, time.perf_counter() - start)
+
+    def executemany(self, query, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(query, *args, **kwargs)
+        finally:
+            observe_query(query, time.perf_counter() - start)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def timed_cursor(cursor):
+    """Wrap a DB cursor for query timing (returned unchanged when metrics are off)."""
+    if cursor is None or not METRICS_ENABLED:
+        return cursor
+    return TimedCursor(cursor)
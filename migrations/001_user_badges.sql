@@ -0,0 +1,27 @@
+-- Move badges out of the users.playerBadges JSON text into their own table, so awarding a
+-- badge is a single INSERT IGNORE instead of a read-modify-write of the whole list.
+-- Requires MariaDB 10.6+ (JSON_TABLE). Safe to re-run: existing rows are kept.
+USE chronoquest;
+
+CREATE TABLE IF NOT EXISTS user_badges (
+    user_id INT(11) NOT NULL,
+    badge_id VARCHAR(64) NOT NULL,
+    awarded_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, badge_id),
+    KEY badge_awarded (badge_id, awarded_at),
+    CONSTRAINT user_badges_user FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+);
+
+-- Copy the JSON arrays. The original order is kept by spacing awarded_at one second apart
+-- per position, ending at the time of the migration.
+INSERT IGNORE INTO user_badges (user_id, badge_id, awarded_at)
+SELECT u.id, jt.badge_id, NOW() - INTERVAL (JSON_LENGTH(u.playerBadges) - jt.position) SECOND
+FROM users u,
+     JSON_TABLE(u.playerBadges, '$[*]' COLUMNS (
+         position FOR ORDINALITY,
+         badge_id VARCHAR(64) PATH '$'
+     )) AS jt
+WHERE u.playerBadges IS NOT NULL AND JSON_VALID(u.playerBadges) AND jt.badge_id IS NOT NULL;
+
+-- The application no longer reads or writes users.playerBadges. Once the copy is verified:
+-- ALTER TABLE users DROP COLUMN playerBadges;
@@ -0,0 +1,26 @@
+-- Append-only journal of game steps written by app.py (journal.py builds the records).
+-- One row per step: the first row of a game (seq 0, action 'start') holds its full starting
+-- state, later rows the fields each step changed, so any step can be replayed.
+-- recorded_at is part of the key (partitioning requires it), so two concurrent requests on the
+-- same session can both store their step under the same seq; journal.replay keeps the earliest.
+USE chronoquest;
+
+CREATE TABLE IF NOT EXISTS game_events (
+    game_id CHAR(22) NOT NULL,
+    seq INT(11) NOT NULL,
+    user_id INT(11) NOT NULL,
+    recorded_at DATETIME(3) NOT NULL,
+    action VARCHAR(32) NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (game_id, seq, recorded_at),
+    KEY user_recorded (user_id, recorded_at)
+)
+-- Partitioned by month so old history can be archived or dropped a partition at a time.
+-- Add next month's partition ahead of time by splitting pmax, e.g.:
+--   ALTER TABLE game_events REORGANIZE PARTITION pmax INTO (
+--       PARTITION p2026_12 VALUES LESS THAN ('2027-01-01'), PARTITION pmax VALUES LESS THAN (MAXVALUE));
+PARTITION BY RANGE COLUMNS (recorded_at) (
+    PARTITION p2026_10 VALUES LESS THAN ('2026-11-01'),
+    PARTITION p2026_11 VALUES LESS THAN ('2026-12-01'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
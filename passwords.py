@@ -0,0 +1,141 @@
+"""Password hashing on a dedicated, bounded process pool.
+
+scrypt is deliberately slow and memory-hungry, so it runs in worker processes instead of the
+request threads. At most `workers` hashes run at once and at most `max_queue` more may wait;
+beyond that `PasswordPoolBusy` is raised immediately so the route can answer 503 with a
+Retry-After instead of stalling every thread behind a burst of logins.
+"""
+import os
+import sys
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+# --- Hashing Configuration ---
+# Werkzeug method string for new hashes, e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'.
+# Stored hashes made with different parameters are upgraded on the user's next login.
+PASSWORD_METHOD = os.environ.get('CHRONO_PASSWORD_METHOD', 'scrypt:32768:8:1')
+# Hashes computed in parallel (each scrypt call uses ~32 MiB at the default parameters)
+HASH_WORKERS = int(os.environ.get('CHRONO_HASH_WORKERS', str(min(4, os.cpu_count() or 1))))
+# Hash requests allowed to wait for a worker before new ones are rejected
+HASH_MAX_QUEUE = int(os.environ.get('CHRONO_HASH_MAX_QUEUE', '32'))
+# Seconds a request waits for its hash before giving up
+HASH_TIMEOUT = float(os.environ.get('CHRONO_HASH_TIMEOUT', '10'))
+# Retry-After (seconds) suggested to clients turned away by admission control
+HASH_RETRY_AFTER = 1
+# Workers start from a clean process, never fork(): the pool is created on the first login,
+# while the server's background threads may hold locks a forked child would inherit held
+_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+class PasswordPoolBusy(Exception):
+    """The hash pool is at its queue cap (or a worker died); the caller should retry later."""
+
+
+def normalize_method(method):
+    """Expand a Werkzeug method to its full parameter string ('scrypt' -> 'scrypt:32768:8:1')."""
+    parts = method.split(':')
+    if parts[0] == 'scrypt':
+        defaults = ['scrypt', '32768', '8', '1']
+    elif parts[0] == 'pbkdf2':
+        defaults = ['pbkdf2', 'sha256', str(DEFAULT_PBKDF2_ITERATIONS)]
+    else:
+        return method
+    return ':'.join(parts + defaults[len(parts):])
+
+
+def needs_rehash(pwhash, method=PASSWORD_METHOD):
+    """True if `pwhash` was made with different parameters than `method`."""
+    return normalize_method(pwhash.split('$', 1)[0]) != normalize_method(method)
+
+
+# --- Worker functions (run in the pool's processes) ---
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(pwhash, password, method):
+    """Check a password; if it matches an outdated hash, also return a fresh hash for it."""
+    if not check_password_hash(pwhash, password):
+        return False, None
+    return True, (generate_password_hash(password, method=method) if needs_rehash(pwhash, method) else None)
+
+
+class HashPool:
+    """Process pool with a concurrency limit and a queue-depth cap."""
+
+    def __init__(self, workers=HASH_WORKERS, max_queue=HASH_MAX_QUEUE, timeout=HASH_TIMEOUT):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self.in_flight = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        # A forked server worker must not reuse its parent's pool
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context(_START_METHOD))
+            self._pid = os.getpid()
+            self.in_flight = 0
+        return self._executor
+
+    def _release(self, _future):
+        with self._lock:
+            self.in_flight -= 1
+
+    def run(self, fn, *args):
+        """Run `fn(*args)` on the pool and wait for it; raises PasswordPoolBusy when saturated."""
+        with self._lock:
+            executor = self._get_executor()
+            if self.in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise PasswordPoolBusy()
+            try:
+                future = executor.submit(fn, *args)
+            except BrokenProcessPool:
+                self._executor = None
+                raise PasswordPoolBusy()
+            self.in_flight += 1
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise PasswordPoolBusy()
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); start a fresh pool on the next call
+            print("Password hash worker died; restarting the pool", file=sys.stderr)
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise PasswordPoolBusy()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_pool = HashPool()
+
+
+def hash_password(password):
+    """Hash a new password with PASSWORD_METHOD on the pool."""
+    return _pool.run(_hash, password, PASSWORD_METHOD)
+
+
+def verify_password(pwhash, password):
+    """Return (matches, new_hash). `new_hash` is set when the stored hash should be replaced."""
+    return _pool.run(_verify, pwhash, password, PASSWORD_METHOD)
+
+
+def get_hash_pool():
+    return _pool
@@ -0,0 +1,187 @@
+"""All-pairs distance matrix over the airport catalog and a multi-stop route planner."""
+from array import array
+from functools import lru_cache
+from itertools import combinations
+
+from geo import np, haversine_km, R
+
+# Catalogs larger than this fall back to on-demand distances (an n*n float32 matrix of
+# 70k airports would need ~20 GB); the planner only ever needs a few dozen rows anyway.
+MATRIX_MAX_AIRPORTS = 4000
+# Stop sets up to this size are solved exactly (Held-Karp); larger ones use NN + 2-opt
+EXACT_MAX_STOPS = 9
+# Upper bound on 2-opt improvement passes, which bounds planner latency
+TWO_OPT_MAX_PASSES = 20
+
+
+class DistanceMatrix:
+    """Great-circle distances (km, float32) between every pair of catalog airports.
+
+    Built once per catalog version and shared read-only by every request. For catalogs
+    above MATRIX_MAX_AIRPORTS distances are computed on demand instead of stored.
+    """
+
+    def __init__(self, airports, version=None):
+        located = [a for a in airports if a.get('lat') is not None and a.get('lon') is not None]
+        self.version = version
+        self.icaos = [a['ICAO'] for a in located]
+        self.index = {icao: i for i, icao in enumerate(self.icaos)}
+        self._coords = [(a['lat'], a['lon']) for a in located]
+        self._n = len(located)
+        self._flat = None
+        if self._n <= MATRIX_MAX_AIRPORTS:
+            self._flat = self._build()
+
+    def _build(self):
+        n = self._n
+        if np is not None:
+            lat = np.radians(np.array([c[0] for c in self._coords], dtype=np.float64))
+            lon = np.radians(np.array([c[1] for c in self._coords], dtype=np.float64))
+            a = (np.sin((lat[:, None] - lat[None, :]) / 2) ** 2
+                 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin((lon[:, None] - lon[None, :]) / 2) ** 2)
+            return (R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))).astype(np.float32).ravel()
+        flat = array('f', bytes(4 * n * n))
+        for i in range(n):
+            for j in range(i + 1, n):
+                d = haversine_km(*self._coords[i], *self._coords[j])
+                flat[i * n + j] = d
+                flat[j * n + i] = d
+        return flat
+
+    def __len__(self):
+        return self._n
+
+    def __contains__(self, icao):
+        return icao in self.index
+
+    def nbytes(self):
+        """Memory used by the stored matrix (0 in on-demand mode)."""
+        if self._flat is None:
+            return 0
+        return self._flat.nbytes if np is not None else len(self._flat) * self._flat.itemsize
+
+    def between(self, i, j):
+        """Distance in km between two airport indices."""
+        if self._flat is not None:
+            return float(self._flat[i * self._n + j])
+        return haversine_km(*self._coords[i], *self._coords[j])
+
+    def km(self, icao_a, icao_b):
+        """Distance in km between two ICAO codes (KeyError if either is unknown)."""
+        return self.between(self.index[icao_a], self.index[icao_b])
+
+
+def _path_length(matrix, route):
+    return sum(matrix.between(a, b) for a, b in zip(route, route[1:]))
+
+
+def _held_karp(matrix, start, stops, end):
+    """Exact shortest path start -> all stops -> end (O(2^k * k^2), used for small k)."""
+    k = len(stops)
+    best = {}
+    for i, s in enumerate(stops):
+        best[(1 << i, i)] = (matrix.between(start, s), None)
+    for size in range(2, k + 1):
+        for subset in combinations(range(k), size):
+            mask = 0
+            for i in subset:
+                mask |= 1 << i
+            for last in subset:
+                prev_mask = mask & ~(1 << last)
+                best[(mask, last)] = min(
+                    (best[(prev_mask, p)][0] + matrix.between(stops[p], stops[last]), p)
+                    for p in subset if p != last)
+    full = (1 << k) - 1
+    _, last = min((best[(full, i)][0] + matrix.between(stops[i], end), i) for i in range(k))
+    order = []
+    mask = full
+    while last is not None:
+        order.append(stops[last])
+        mask, last = mask & ~(1 << last), best[(mask, last)][1]
+    return [start] + order[::-1] + [end]
+
+
+def _nearest_neighbour_two_opt(matrix, start, stops, end):
+    """Nearest-neighbour construction improved by a bounded number of 2-opt passes."""
+    remaining = set(stops)
+    route = [start]
+    while remaining:
+        nxt = min(remaining, key=lambda s: matrix.between(route[-1], s))
+        route.append(nxt)
+        remaining.remove(nxt)
+    route.append(end)
+
+    for _ in range(TWO_OPT_MAX_PASSES):
+        improved = False
+        # Endpoints stay fixed: only reverse segments strictly inside the route
+        for i in range(1, len(route) - 2):
+            for j in range(i + 1, len(route) - 1):
+                a, b, c, d = route[i - 1], route[i], route[j], route[j + 1]
+                delta = (matrix.between(a, c) + matrix.between(b, d)
+                         - matrix.between(a, b) - matrix.between(c, d))
+                if delta < -1e-6:
+                    route[i:j + 1] = reversed(route[i:j + 1])
+                    improved = True
+        if not improved:
+            break
+    return route
+
+
+@lru_cache(maxsize=4096)
+def _plan_cached(matrix, start, stops, end):
+    stops = [s for s in stops if s not in (start, end)]
+    if not stops:
+        return (start, end) if start != end else (start,)
+    if len(stops) <= EXACT_MAX_STOPS:
+        route = _held_karp(matrix, start, stops, end)
+    else:
+        route = _nearest_neighbour_two_opt(matrix, start, stops, end)
+    return tuple(route)
+
+
+def plan_route(matrix, start, stops, end='EFHK'):
+    """Return the planned route (list of ICAO codes) from `start` through `stops` to `end`.
+
+    Results are memoized per (matrix version, start, stop set); stop order in the request
+    does not matter. Raises KeyError for ICAO codes not in the matrix.
+    """
+    idx = matrix.index
+    stop_ids = tuple(sorted({idx[s] for s in stops}))
+    route = _plan_cached(matrix, idx[start], stop_ids, idx[end])
+    return [matrix.icaos[i] for i in route]
+
+
+def clear_plan_cache():
+    """Forget memoized plans (call when the matrix is rebuilt so old matrices can be freed)."""
+    _plan_cached.cache_clear()
+
+
+def plan_within_budget(matrix, start, stops, budget, leg_cost, end='EFHK'):
+    """Plan a route whose summed `leg_cost(km)` fits `budget`, dropping stops if necessary.
+
+    Stops are removed one at a time, always the one whose removal saves the most cost.
+    Returns (route, total_cost, dropped_stops).
+    """
+    def cost_of(route):
+        return sum(leg_cost(matrix.km(a, b)) for a, b in zip(route, route[1:]))
+
+    stops = list(dict.fromkeys(stops))
+    dropped = []
+    route = plan_route(matrix, start, stops, end)
+    total = cost_of(route)
+    while total > budget and stops:
+        best = None
+        for s in stops:
+            candidate = plan_route(matrix, start, [t for t in stops if t != s], end)
+            c = cost_of(candidate)
+            if best is None or c < best[0]:
+                best = (c, s, candidate)
+        total, removed, route = best
+        stops.remove(removed)
+        dropped.append(removed)
+    return route, total, dropped
+
+
+def route_length(matrix, route):
+    """Total great-circle length (km) of a route given as ICAO codes."""
+    return _path_length(matrix, [matrix.index[icao] for icao in route])
@@ -0,0 +1,210 @@
+"""On-demand wall-clock sampling profiler for live requests.
+
+While a session is active, the request hooks in app.py `track()` the threads serving the
+requests selected for profiling (a random fraction, optionally narrowed to one route or one
+user). A background thread wakes every `interval` seconds, reads those threads' current
+stacks with sys._current_frames() and counts each distinct stack. The counts are written in
+collapsed-stack format ("root;frame;frame count" per line), which flamegraph.pl and
+speedscope read directly, to `<directory>/chrono-<pid>-<start time>.folded`.
+
+When no session is active the only cost is one attribute check per request.
+"""
+import os
+import sys
+import time
+import random
+import threading
+from collections import Counter
+from datetime import datetime
+
+# --- Profiler Configuration ---
+# Where collapsed-stack files are written
+PROFILE_DIR = os.environ.get('CHRONO_PROFILE_DIR', os.path.join(os.path.dirname(__file__), '.cache', 'profiles'))
+# Defaults for sessions started without explicit settings (e.g. by signal)
+PROFILE_RATE = float(os.environ.get('CHRONO_PROFILE_RATE', '0.1'))
+PROFILE_INTERVAL_MS = float(os.environ.get('CHRONO_PROFILE_INTERVAL_MS', '5'))
+# Sessions stop by themselves after this many seconds
+PROFILE_MAX_DURATION = float(os.environ.get('CHRONO_PROFILE_MAX_DURATION', '300'))
+# Seconds between rewrites of the output file while a session runs
+PROFILE_FLUSH_INTERVAL = 10
+MAX_STACK_DEPTH = 128
+
+
+class SamplingProfiler:
+    """Samples the stacks of tracked request threads and aggregates them per session."""
+
+    def __init__(self, directory=PROFILE_DIR, rng=None):
+        self.directory = directory
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._tracked = {}  # thread id -> root label ("POST /api/main/travel")
+        self._stacks = Counter()
+        self._frame_names = {}  # code object -> "func (file.py:line)"
+        self._thread = None
+        self._stop = threading.Event()
+        # Session settings; `active` is the only thing read on the request path when idle
+        self.active = False
+        self.rate = PROFILE_RATE
+        self.route = None
+        self.user = None
+        self.interval = PROFILE_INTERVAL_MS / 1000
+        self.until = 0
+        self.path = None
+        self.started_at = None
+        self.samples = 0
+        self.requests = 0
+
+    # --- Session control ---
+
+    def start(self, rate=None, route=None, user=None, interval_ms=None, duration=None):
+        """Begin a profiling session (replacing any running one). Returns status()."""
+        self.stop()
+        rate = PROFILE_RATE if rate is None else float(rate)
+        interval_ms = PROFILE_INTERVAL_MS if interval_ms is None else float(interval_ms)
+        duration = PROFILE_MAX_DURATION if duration is None else float(duration)
+        if not 0 < rate <= 1:
+            raise ValueError("rate must be in (0, 1]")
+        if not 1 <= interval_ms <= 1000:
+            raise ValueError("interval_ms must be between 1 and 1000")
+        if not 0 < duration <= PROFILE_MAX_DURATION:
+            raise ValueError(f"duration must be between 0 and {PROFILE_MAX_DURATION:g} seconds")
+
+        os.makedirs(self.directory, exist_ok=True)
+        now = time.time()
+        with self._lock:
+            self.rate, self.route, self.user = rate, route or None, user or None
+            self.interval = interval_ms / 1000
+            self.until = now + duration
+            self.started_at = now
+            stamp = datetime.fromtimestamp(now).strftime('%Y%m%d-%H%M%S')
+            self.path = os.path.join(self.directory, f"chrono-{os.getpid()}-{stamp}.folded")
+            self._stacks = Counter()
+            self._tracked = {}
+            self.samples = self.requests = 0
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, args=(self._stop,), name='profiler', daemon=True)
+            self.active = True
+        self._thread.start()
+        return self.status()
+
+    def stop(self):
+        """End the running session (if any) and write its file. Returns status()."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            self.active = False
+            self._tracked = {}
+            self._stop.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        if thread is not None:
+            self._write()
+        return self.status()
+
+    def toggle(self):
+        """Start a session with the default settings, or stop the running one (signal handler)."""
+        if self.active:
+            self.stop()
+        else:
+            self.start()
+
+    def status(self):
+        return {
+            'active': self.active,
+            'rate': self.rate,
+            'route': self.route,
+            'user': self.user,
+            'intervalMs': self.interval * 1000,
+            'until': self.until if self.active else None,
+            'requests': self.requests,
+            'samples': self.samples,
+            'file': self.path,
+        }
+
+    # --- Request hooks ---
+
+    def wants(self, route, path, user):
+        """Whether a request (url rule, path, username) should be profiled in this session."""
+        if self.route and route != self.route and not path.startswith(self.route):
+            return False
+        if self.user and user != self.user:
+            return False
+        return self.rate >= 1 or self._rng.random() < self.rate
+
+    def track(self, label):
+        with self._lock:
+            if self.active:
+                self._tracked[threading.get_ident()] = label
+                self.requests += 1
+
+    def untrack(self):
+        with self._lock:
+            self._tracked.pop(threading.get_ident(), None)
+
+    # --- Sampling ---
+
+    def _frame_name(self, code):
+        name = self._frame_names.get(code)
+        if name is None:
+            name = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._frame_names[code] = name
+        return name
+
+    def _sample(self):
+        with self._lock:
+            tracked = dict(self._tracked)
+        if not tracked:
+            return
+        frames = sys._current_frames()
+        for ident, label in tracked.items():
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None and len(names) < MAX_STACK_DEPTH:
+                names.append(self._frame_name(frame.f_code))
+                frame = frame.f_back
+            names.append(label)
+            names.reverse()
+            self._stacks[';'.join(names)] += 1
+            self.samples += 1
+
+    def _run(self, stop):
+        next_flush = time.monotonic() + PROFILE_FLUSH_INTERVAL
+        while not stop.wait(self.interval):
+            try:
+                self._sample()
+            except Exception as e:
+                print(f"Profiler sampling failed: {e}", file=sys.stderr)
+            if time.monotonic() >= next_flush:
+                next_flush = time.monotonic() + PROFILE_FLUSH_INTERVAL
+                self._write()
+            if time.time() >= self.until:
+                # Time's up: end the session from inside the sampler thread
+                self.stop()
+                return
+
+    def _write(self):
+        """Rewrite the session file with the stacks counted so far (atomically)."""
+        with self._lock:
+            path, stacks = self.path, list(self._stacks.items())
+        if path is None:
+            return
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as fh:
+                for stack, count in sorted(stacks):
+                    fh.write(f"{stack} {count}\n")
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Error writing profile {path}: {e}", file=sys.stderr)
+
+
+def install_signal_handler(profiler, signum=None):
+    """Toggle `profiler` on a signal (SIGUSR2 by default). Only possible from the main thread."""
+    import signal
+    signum = signum or getattr(signal, 'SIGUSR2', None)
+    if signum is None or threading.current_thread() is not threading.main_thread():
+        return False
+    # Starting or stopping joins the sampler thread, so do it off the signal handler
+    signal.signal(signum, lambda *_: threading.Thread(target=profiler.toggle, daemon=True).start())
+    return True
@@ -0,0 +1,150 @@
+"""Pre-serialized, pre-compressed JSON responses for read-mostly routes, with conditional GET.
+
+A route hands `ResponseCache.respond()` a key and a builder. On a miss the builder's payload
+is serialized once, compressed once per encoding (gzip, and Brotli when installed) and kept
+with a strong ETag; every later request for that key only picks the bytes matching its
+Accept-Encoding, or answers 304 Not Modified when its If-None-Match already names them.
+
+Keys carry whatever the payload depends on (e.g. the catalog version), or are dropped with
+`invalidate()` when the data behind them changes. Entries also expire after `ttl` seconds,
+which bounds how long another worker process can serve a payload this one invalidated.
+
+`fast_jsonify()` is a drop-in for `jsonify()` on hot endpoints: it serializes with orjson
+when that is installed (and CHRONO_FAST_JSON is not 0) and falls back to jsonify otherwise.
+"""
+import os
+import sys
+import gzip
+import json
+import hashlib
+import threading
+from flask import Response, request, jsonify
+
+from usercache import TTLCache
+from assets import accepts_encoding
+
+try:
+    # Optional: 3-10x faster JSON serialization for hot endpoints
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # Optional: Brotli-encoded variants (smaller than gzip); gzip variants are always built
+    import brotli
+except ImportError:
+    brotli = None
+
+# Set CHRONO_FAST_JSON=0 to serialize with the standard library even when orjson is installed
+FAST_JSON = orjson is not None and os.environ.get('CHRONO_FAST_JSON', '1') != '0'
+
+JSON_MIMETYPE = 'application/json'
+# Bodies smaller than this are sent as-is; compressing them saves less than the headers cost
+MIN_COMPRESS_SIZE = 1024
+# Browsers may store the body but must revalidate it (a 304 when unchanged) before each use
+CACHE_CONTROL = 'private, no-cache'
+
+
+def dumps(payload):
+    """Serialize `payload` to compact JSON bytes (orjson when enabled)."""
+    if FAST_JSON:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def fast_jsonify(payload):
+    """jsonify() replacement for hot endpoints; returns a Response like jsonify does."""
+    if FAST_JSON:
+        try:
+            return Response(orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS), mimetype=JSON_MIMETYPE)
+        except TypeError as e:
+            # Something orjson cannot encode (e.g. an int over 64 bits): let Flask's provider try
+            print(f"Warning: orjson could not encode response, using jsonify: {e}", file=sys.stderr)
+    return jsonify(payload)
+
+
+class CachedResponse:
+    """One serialized payload with its compressed variants, ETags and extra headers."""
+
+    __slots__ = ('bodies', 'etags', 'headers')
+
+    def __init__(self, body, headers=None):
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.bodies = {None: body}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            self.bodies['gzip'] = gzip.compress(body, compresslevel=6, mtime=0)
+            if brotli is not None:
+                self.bodies['br'] = brotli.compress(body, quality=5)
+        # Strong ETags name exact bytes, so each content-coding gets its own
+        self.etags = {encoding: digest if encoding is None else f"{digest}-{encoding}" for encoding in self.bodies}
+        self.headers = dict(headers or {})
+
+    def _encoding_for(self, accept_encoding):
+        for encoding in ('br', 'gzip'):
+            if encoding in self.bodies and accepts_encoding(accept_encoding, encoding):
+                return encoding
+        return None
+
+    def response(self):
+        """Build the Response for the current request: 304, or the best-encoded body."""
+        encoding = self._encoding_for(request.headers.get('Accept-Encoding', ''))
+        # Any variant's tag means the client already holds this payload (in some encoding)
+        if request.if_none_match and any(request.if_none_match.contains_weak(t) for t in self.etags.values()):
+            response = Response(status=304)
+        else:
+            response = Response(self.bodies[encoding], mimetype=JSON_MIMETYPE)
+            if encoding is not None:
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(self.etags[encoding])
+        response.headers['Cache-Control'] = CACHE_CONTROL
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers.update(self.headers)
+        return response
+
+
+class ResponseCache:
+    """Bounded LRU of CachedResponse entries with explicit invalidation; thread-safe."""
+
+    def __init__(self, name, maxsize=256, ttl=3600.0):
+        self.name = name
+        self._entries = TTLCache(maxsize, ttl)
+        self._lock = threading.Lock()
+        # Bumped by invalidate()/clear(): a build that started before one is not stored
+        self._generation = 0
+        self.not_modified = 0
+
+    @property
+    def hits(self):
+        return self._entries.hits
+
+    @property
+    def misses(self):
+        return self._entries.misses
+
+    def __len__(self):
+        return len(self._entries)
+
+    def respond(self, key, build):
+        """Serve `key` from the cache, calling `build()` -> (payload, extra headers) on a miss."""
+        entry = self._entries.get(key)
+        if entry is None:
+            generation = self._generation
+            payload, headers = build()
+            entry = CachedResponse(dumps(payload), headers)
+            with self._lock:
+                if generation == self._generation:
+                    self._entries.set(key, entry)
+        response = entry.response()
+        if response.status_code == 304:
+            self.not_modified += 1
+        return response
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            self._entries.invalidate(key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
@@ -0,0 +1,206 @@
+import os
+import time
+import sqlite3
+import secrets
+import threading
+from collections import OrderedDict
+from flask.sessions import SessionInterface, SessionMixin
+from flask.json.tag import TaggedJSONSerializer
+from werkzeug.datastructures import CallbackDict
+
+# Session ids are 32 random bytes, URL-safe base64 encoded (43 characters)
+SID_BYTES = 32
+SID_LENGTH = 43
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session dict stored server-side; the cookie carries only `sid`."""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.expires_at = 0
+        # Set by regenerate(): the id to delete when the session is saved under its new id
+        self.replaced_sid = None
+
+    def regenerate(self):
+        """Move the session to a fresh id (call on login so a pre-set cookie can't be fixated)."""
+        if self.replaced_sid is None and not self.new:
+            self.replaced_sid = self.sid
+        self.sid = new_sid()
+        self.modified = True
+
+
+def new_sid():
+    return secrets.token_urlsafe(SID_BYTES)
+
+
+# --- Stores ---
+# A store maps sid -> (payload bytes, expires_at epoch seconds). Payloads are opaque here;
+# the interface serializes sessions with Flask's tagged JSON so every store holds the same bytes.
+
+class MemorySessionStore:
+    """Bounded, thread-safe in-process LRU of sessions (single worker process)."""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # sid -> (expires_at, payload), least recently used first
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._data[sid]
+                return None
+            self._data.move_to_end(sid)
+            return entry[1], entry[0]
+
+    def save(self, sid, payload, expires_at):
+        with self._lock:
+            self._data[sid] = (expires_at, payload)
+            self._data.move_to_end(sid)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SqliteSessionStore:
+    """Sessions in a local SQLite file shared by every worker process on the host.
+
+    Each thread keeps its own connection (re-opened after fork). WAL mode lets readers run
+    alongside the single writer; expired rows are purged every `purge_interval` seconds.
+    """
+
+    def __init__(self, path, purge_interval=300):
+        self.path = path
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._next_purge = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions ("
+                         "sid TEXT PRIMARY KEY, payload BLOB NOT NULL, expires_at REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires_at)")
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def load(self, sid):
+        row = self._connection().execute(
+            "SELECT payload, expires_at FROM sessions WHERE sid = ? AND expires_at >= ?", (sid, time.time())
+        ).fetchone()
+        return (bytes(row[0]), row[1]) if row else None
+
+    def save(self, sid, payload, expires_at):
+        conn = self._connection()
+        conn.execute("INSERT OR REPLACE INTO sessions (sid, payload, expires_at) VALUES (?, ?, ?)",
+                     (sid, payload, expires_at))
+        now = time.time()
+        if now >= self._next_purge:
+            self._next_purge = now + self.purge_interval
+            conn.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+
+    def delete(self, sid):
+        self._connection().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+# --- Flask integration ---
+
+class ServerSideSessionInterface(SessionInterface):
+    """Keeps session data in `store`; the session cookie holds only an opaque random id.
+
+    Sessions expire after `ttl` seconds without a write. An unmodified session is written back
+    (extending its expiry) only once less than half its lifetime is left, so read-only
+    requests cost a single store lookup.
+    """
+
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, ttl=86400):
+        self.store = store
+        self.ttl = ttl
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and len(sid) == SID_LENGTH:
+            entry = self.store.load(sid)
+            if entry is not None:
+                payload, expires_at = entry
+                try:
+                    data = self.serializer.loads(payload.decode('utf-8'))
+                except ValueError:
+                    data = None
+                if data is not None:
+                    session = ServerSideSession(data, sid=sid)
+                    session.expires_at = expires_at
+                    return session
+        return ServerSideSession(sid=new_sid(), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.replaced_sid:
+            self.store.delete(session.replaced_sid)
+
+        if not session:
+            # Emptied (e.g. logout): drop the stored record and the cookie
+            if not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        response.vary.add('Cookie')
+
+        now = time.time()
+        refresh = session.expires_at - now < self.ttl / 2
+        if not (session.modified or session.new or refresh):
+            return
+
+        payload = self.serializer.dumps(dict(session)).encode('utf-8')
+        self.store.save(session.sid, payload, now + self.ttl)
+        if session.new or session.replaced_sid:
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+
+def make_session_interface(backend, ttl=86400, max_sessions=10000, path=None):
+    """Build the session interface for CHRONO_SESSION_BACKEND: 'memory' or 'sqlite'."""
+    if backend == 'memory':
+        return ServerSideSessionInterface(MemorySessionStore(max_sessions), ttl)
+    if backend == 'sqlite':
+        return ServerSideSessionInterface(SqliteSessionStore(path), ttl)
+    raise ValueError(f"Unknown session backend {backend!r}")
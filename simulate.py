@@ -0,0 +1,255 @@
+"""Headless Monte Carlo simulator for balancing ChronoQuest.
+
+Usage:
+    python simulate.py --games 100000 --policy greedy --workers 8 --seed 1
+    python simulate.py --games 20000 --cost-mode distance --event-config weights.json --json report.json
+
+Every game runs the same engine functions as the web routes (engine.new_game_state,
+engine.travel, engine.buy_credits, engine.buy_range) with its own random.Random(seed + i),
+so results do not depend on the worker count. Policies draw their choices from a separate
+generator (policy_rng), so the rules consume exactly the random stream the web path does:
+setting app.GAME_RNG to random.Random(seed + i) and replaying the same actions over HTTP
+gives the same game (checked by `python -m benchmarks.sim_parity`). Games are spread over a process pool; per-game results are aggregated with NumPy when
+it is installed.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import engine
+from badges import BadgeEngine, snapshot as badge_snapshot, changed_fields
+from events import EventEngine
+from geo import np
+from planner import DistanceMatrix
+
+BASE = Path(__file__).parent
+OUTCOMES = (engine.WIN, engine.LOSE, 'stuck', 'timeout')
+
+POLICIES = {}
+
+
+def policy(name):
+    """Register `fn(gs, world, rng) -> action` as a player policy.
+
+    Actions: ('travel', icao), ('buy_range', credits), ('buy_credits', fluxfire).
+    """
+    def register(fn):
+        POLICIES[name] = fn
+        return fn
+    return register
+
+
+class World:
+    """Static data a simulated game needs: airports, distances and the rule engines."""
+
+    def __init__(self, cost_mode='random', energy_per_km=engine.DEFAULT_ENERGY_PER_KM, event_config=None):
+        with open(BASE / 'airport-data.json', encoding='utf-8') as f:
+            airports = json.load(f)
+        self.icaos = [a['ICAO'] for a in airports if a['ICAO'] != engine.START_AIRPORT]
+        self.distances = DistanceMatrix(airports)
+        self.event_engine = EventEngine.from_file(event_config) if event_config else EventEngine()
+        self.badge_engine = BadgeEngine.from_file(BASE / 'badges.json')
+        if cost_mode == 'distance':
+            self.cost_fn = lambda a, b, rng: engine.energy_cost_for_km(self.distances.km(a, b), energy_per_km)
+        else:
+            self.cost_fn = engine.random_travel_cost
+
+
+# --- Policies ---
+
+def _random_destination(gs, world, rng):
+    while True:
+        icao = rng.choice(world.icaos)
+        if icao != gs.current_location:
+            return icao
+
+
+@policy('random')
+def random_policy(gs, world, rng):
+    """Wander randomly; top up range when low; go home as soon as the game can be won."""
+    if engine.can_win(gs):
+        return ('travel', engine.START_AIRPORT)
+    if gs.energy < 200 and gs.credits > 100:
+        return ('buy_range', gs.credits - 100)
+    if gs.energy == 0 and gs.credits > 0:
+        return ('buy_range', gs.credits)
+    return ('travel', _random_destination(gs, world, rng))
+
+
+@policy('greedy')
+def greedy_policy(gs, world, rng):
+    """Hop to the nearest airport (cheapest in distance mode) and spend surplus fluxfire on credits."""
+    if engine.can_win(gs):
+        return ('travel', engine.START_AIRPORT)
+    surplus = gs.fluxfire - gs.required_flux
+    if surplus > 0 and gs.credits < 200:
+        return ('buy_credits', surplus)
+    if gs.energy < 250 and gs.credits > 100:
+        return ('buy_range', gs.credits - 50)
+    if gs.energy == 0 and gs.credits > 0:
+        return ('buy_range', gs.credits)
+    here = gs.current_location
+    nearby = sorted((i for i in world.icaos if i != here), key=lambda i: world.distances.km(here, i))
+    return ('travel', rng.choice(nearby[:3]))
+
+
+@policy('hoarder')
+def hoarder_policy(gs, world, rng):
+    """Never buys anything; shows how far the starting resources carry a player."""
+    if engine.can_win(gs):
+        return ('travel', engine.START_AIRPORT)
+    return ('travel', _random_destination(gs, world, rng))
+
+
+# --- Simulation ---
+
+def policy_rng(seed):
+    """The policy's own generator for game `seed`, independent of the rules' random.Random(seed)."""
+    return random.Random(f"policy:{seed}")
+
+
+def play_game(seed, policy_name, world, max_steps=1000, trace=None):
+    """Play one game to completion. Returns (outcome, travels, steps, earned badge ids).
+
+    `trace`, if given, receives one (action, amount, outcome, state dict) entry per step.
+    """
+    rng = random.Random(seed)
+    choices = policy_rng(seed)
+    choose = POLICIES[policy_name]
+    gs = engine.new_game_state('simulator', rng)
+    profile = {'playerBadges': [], 'playerHowManyTimesPlayed': 0}
+
+    for step in range(1, max_steps + 1):
+        action, amount = choose(gs, world, choices)
+        before = badge_snapshot(gs)
+        events, outcome = (), None
+        if action == 'travel':
+            events, outcome = engine.travel(gs, amount, rng, world.cost_fn, world.event_engine)
+        elif action == 'buy_range':
+            engine.buy_range(gs, amount)
+        elif action == 'buy_credits':
+            engine.buy_credits(gs, amount)
+        if trace is not None:
+            trace.append((action, amount, outcome, gs.to_dict()))
+        if outcome == engine.NO_ENERGY:
+            # The policy cannot (or will not) refuel: the web player would be stuck too
+            return 'stuck', gs.stats['travels'], step, profile['playerBadges']
+
+        final = outcome if outcome in (engine.WIN, engine.LOSE) else None
+        rules = world.badge_engine.candidates(final, changed_fields(before, gs))
+        if rules:
+            earned, _ = world.badge_engine.evaluate(rules, gs, events, lambda: profile)
+            profile['playerBadges'].extend(earned)
+        if final:
+            return final, gs.stats['travels'], step, profile['playerBadges']
+    return 'timeout', gs.stats['travels'], max_steps, profile['playerBadges']
+
+
+def _run_chunk(args):
+    """Worker entry point: play games [start, stop) and return compact per-game columns."""
+    start, stop, base_seed, policy_name, world_kwargs, max_steps = args
+    world = World(**world_kwargs)
+    outcomes, travels, steps = bytearray(), [], []
+    badge_counts = Counter()
+    for i in range(start, stop):
+        outcome, n_travels, n_steps, earned = play_game(base_seed + i, policy_name, world, max_steps)
+        outcomes.append(OUTCOMES.index(outcome))
+        travels.append(n_travels)
+        steps.append(n_steps)
+        badge_counts.update(earned)
+    return bytes(outcomes), travels, steps, badge_counts
+
+
+def _percentiles(values, points=(10, 50, 90, 99)):
+    if not values:
+        return {}
+    if np is not None:
+        return {f"p{p}": float(v) for p, v in zip(points, np.percentile(np.asarray(values), points))}
+    ordered = sorted(values)
+    return {f"p{p}": float(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]) for p in points}
+
+
+def _histogram(values, bins=20):
+    if not values:
+        return []
+    if np is not None:
+        counts, edges = np.histogram(np.asarray(values), bins=bins)
+        return [{'from': float(lo), 'to': float(hi), 'games': int(c)} for c, lo, hi in zip(counts, edges, edges[1:])]
+    lo, hi = min(values), max(values)
+    width = max(1, (hi - lo) / bins)
+    counts = Counter(min(bins - 1, int((v - lo) / width)) for v in values)
+    return [{'from': lo + b * width, 'to': lo + (b + 1) * width, 'games': counts.get(b, 0)} for b in range(bins)]
+
+
+def simulate(games, policy_name='random', seed=0, workers=None, max_steps=1000, **world_kwargs):
+    """Play `games` games across a process pool and return the aggregated report dict."""
+    workers = workers or os.cpu_count() or 1
+    chunk = max(1, min(5000, games // (workers * 4) or 1))
+    tasks = [(start, min(games, start + chunk), seed, policy_name, world_kwargs, max_steps)
+             for start in range(0, games, chunk)]
+
+    started = time.perf_counter()
+    outcomes, travels, steps = bytearray(), [], []
+    badge_counts = Counter()
+    if workers == 1:
+        results = map(_run_chunk, tasks)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(_run_chunk, tasks)
+    for chunk_outcomes, chunk_travels, chunk_steps, chunk_badges in results:
+        outcomes += chunk_outcomes
+        travels += chunk_travels
+        steps += chunk_steps
+        badge_counts.update(chunk_badges)
+    if workers != 1:
+        pool.shutdown()
+    elapsed = time.perf_counter() - started
+
+    counts = Counter(outcomes)
+    won = [t for o, t in zip(outcomes, travels) if o == 0]
+    lost = [t for o, t in zip(outcomes, travels) if o == 1]
+    return {
+        'games': games,
+        'policy': policy_name,
+        'seed': seed,
+        'workers': workers,
+        'elapsed_s': round(elapsed, 3),
+        'games_per_minute': round(games / elapsed * 60) if elapsed else None,
+        'outcomes': {name: counts.get(i, 0) for i, name in enumerate(OUTCOMES)},
+        'win_rate': counts.get(0, 0) / games if games else 0.0,
+        'travels_to_win': _percentiles(won),
+        'travels_to_lose': _percentiles(lost),
+        'game_length_histogram': _histogram(travels),
+        'badge_rates': {b: n / games for b, n in sorted(badge_counts.items())},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Headless ChronoQuest Monte Carlo simulator.')
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--policy', choices=sorted(POLICIES), default='random')
+    parser.add_argument('--seed', type=int, default=0, help='game i uses random.Random(seed + i)')
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: all cores)')
+    parser.add_argument('--max-steps', type=int, default=1000)
+    parser.add_argument('--cost-mode', choices=('random', 'distance'), default='random')
+    parser.add_argument('--energy-per-km', type=float, default=engine.DEFAULT_ENERGY_PER_KM)
+    parser.add_argument('--event-config', help='JSON event weights file (see events.DEFAULT_PHASES)')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args(argv)
+
+    report = simulate(args.games, args.policy, args.seed, args.workers, args.max_steps,
+                      cost_mode=args.cost_mode, energy_per_km=args.energy_per_km, event_config=args.event_config)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.json:
+        Path(args.json).write_text(text + '\n', encoding='utf-8')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,9 @@
 const API_BASE = ''; // same origin
 
+// Fingerprinted image URLs from the asset build (see assets.py); plain /static/ paths without one
+const ASSET_URLS = window.CHRONO_ASSETS || {};
+function assetUrl(path){ return ASSET_URLS[path] || '../static/' + path; }
+
 let GAME_STATE = {
   playerName: '',
   credits: 1000,
@@ -87,8 +91,8 @@ function initMap(){
     const lon = a.lon || (Math.random() * 40);
 
     let iconUrl = (a.ICAO === 'EFHK')
-      ? '../static/img/starting-airport.png' // EFHK always starting-airport
-      : '../static/img/black-dot.png';
+      ? assetUrl('img/starting-airport.png') // EFHK always starting-airport
+      : assetUrl('img/black-dot.png');
 
     const icon = L.icon({ iconUrl, iconSize: [32,32], iconAnchor: [16,16] });
     const marker = L.marker([lat, lon], { icon }).addTo(map);
@@ -103,7 +107,7 @@ function markCurrentLocation(icao){
 
   if(markers[icao]){
     markers[icao].setIcon(L.icon({
-      iconUrl:'../static/img/country-pin.png',
+      iconUrl:assetUrl('img/country-pin.png'),
       iconSize:[32,32],
       iconAnchor:[16,16]
     }));
@@ -156,7 +160,7 @@ async function handleTravel(a){
   // revert old location marker (except EFHK)
   if(oldLocation && oldLocation !== 'EFHK' && markers[oldLocation]){
     markers[oldLocation].setIcon(L.icon({
-      iconUrl:'../static/img/black-dot.png',
+      iconUrl:assetUrl('img/black-dot.png'),
       iconSize:[32,32],
       iconAnchor:[16,16]
     }));
@@ -165,7 +169,7 @@ async function handleTravel(a){
   // mark new location (except EFHK) with a highlighted pin
   if(a.ICAO !== 'EFHK' && markers[a.ICAO]){
     markers[a.ICAO].setIcon(L.icon({
-      iconUrl:'../static/img/country-pin.png',
+      iconUrl:assetUrl('img/country-pin.png'),
       iconSize:[32,32],
       iconAnchor:[16,16]
     }));
@@ -180,8 +184,8 @@ async function handleTravel(a){
     if (onlyNothing) html += `<p>😐 Nothing happened at this airport.</p>`;
     else data.events.forEach(ev => {
       if (ev.type==='nothing') return;
-      if (ev.type==='shard') html+=`<p>✨ You found ChronoShard ${ev.shard}!</p><img src="../static/img/chronoshard${ev.shard}.png" style="max-width:80px;">`;
-      if (ev.type==='fluxfire') html+=`<p>🔥 You found Fluxfire!</p><img src="../static/img/fluxfire.png" style="max-width:80px;">`;
+      if (ev.type==='shard') html+=`<p>✨ You found ChronoShard ${ev.shard}!</p><img src="${assetUrl(`img/chronoshard${ev.shard}.png`)}" style="max-width:80px;">`;
+      if (ev.type==='fluxfire') html+=`<p>🔥 You found Fluxfire!</p><img src="${assetUrl('img/fluxfire.png')}" style="max-width:80px;">`;
       if (ev.type==='bandit') html+=`<p>💀 Bandits stole ${ev.amount} ${ev.subtype==='credits'?'credits':'range'}.</p>`;
       if (ev.type==='credits') html+=`<p>💰 Gained ${ev.amount} credits.</p>`;
       if (ev.type==='range') html+=`<p>🔋 Gained ${ev.amount} range.</p>`;
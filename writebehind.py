@@ -0,0 +1,103 @@
+import os
+import sys
+import atexit
+import threading
+
+
+class WriteBehindBuffer:
+    """Coalescing write-behind buffer for per-key values (e.g. a user's saved game state).
+
+    `put()` only records the latest value for a key in memory; a background thread hands
+    every dirty entry to `writer` in batches at most `max_staleness` seconds later. `flush()`
+    forces a synchronous write of some or all keys. With `max_staleness <= 0` the buffer is
+    write-through and every `put()` is flushed immediately.
+
+    `writer(items)` receives a list of (key, value) pairs and returns True on success; on
+    failure the entries are re-queued unless a newer value for the key arrived meanwhile.
+    """
+
+    def __init__(self, writer, max_staleness=2.0, batch_size=100, name='write-behind'):
+        self._writer = writer
+        self.max_staleness = max_staleness
+        self.batch_size = max(1, batch_size)
+        self.name = name
+        self._dirty = {}  # key -> latest value (insertion order = oldest first)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # serializes writers so batches land in order
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = os.getpid()
+        atexit.register(self.stop)
+
+    def put(self, key, value):
+        """Mark `key` dirty with `value`, replacing any value still waiting to be written."""
+        with self._lock:
+            self._dirty.pop(key, None)
+            self._dirty[key] = value
+        if self.max_staleness <= 0:
+            self.flush([key])
+        else:
+            self._ensure_thread()
+
+    def pending(self, key):
+        """Return (True, value) if `key` has an unwritten value, else (False, None)."""
+        with self._lock:
+            if key in self._dirty:
+                return True, self._dirty[key]
+            return False, None
+
+    def __len__(self):
+        """Number of keys waiting to be written."""
+        return len(self._dirty)
+
+    def flush(self, keys=None):
+        """Synchronously write the given keys (or everything dirty). Returns True on success."""
+        with self._write_lock:
+            with self._lock:
+                if keys is None:
+                    items = list(self._dirty.items())
+                    self._dirty.clear()
+                else:
+                    items = [(k, self._dirty.pop(k)) for k in keys if k in self._dirty]
+            ok = True
+            for start in range(0, len(items), self.batch_size):
+                batch = items[start:start + self.batch_size]
+                if not self._write(batch):
+                    ok = False
+                    self._requeue(batch)
+            return ok
+
+    def _write(self, batch):
+        try:
+            return bool(self._writer(batch))
+        except Exception as e:
+            print(f"Error: {self.name} flush failed: {e}", file=sys.stderr)
+            return False
+
+    def _requeue(self, batch):
+        with self._lock:
+            for key, value in batch:
+                # A newer value supersedes the failed one; otherwise retry on the next tick
+                self._dirty.setdefault(key, value)
+
+    def _ensure_thread(self):
+        if self._pid != os.getpid():
+            # Forked worker: the parent's flusher thread does not exist here
+            self._thread = None
+            self._pid = os.getpid()
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._wakeup.clear()
+                    self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._wakeup.wait(self.max_staleness):
+            if self._dirty:
+                self.flush()
+
+    def stop(self):
+        """Stop the flusher thread and write everything still buffered (used at shutdown)."""
+        self._wakeup.set()
+        self.flush()